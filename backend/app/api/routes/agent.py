@@ -1,11 +1,19 @@
-from fastapi import APIRouter, HTTPException
+import asyncio
+from fastapi import APIRouter, Header, HTTPException
+from pydantic import BaseModel, Field
 from datetime import datetime
 from bson import ObjectId
+from app.core import idempotency, versions
 from app.core.db import db
-from app.services.ai_text import generate_agent_critique
-from typing import Dict, Any
+from app.core.streaming import sse_response
+from app.services import critique as critique_engine
+from app.services.kpi import post_kpis
+from app.services import admission, media_catalog
+from app.services.caption_index import caption_index
+from app.services.hashtag_index import hashtag_index
+from app.services.persona_cache import persona_cache
+from typing import List, Optional
 
-from urllib.parse import urlparse
 
 from app.services.ai_image import (
     generate_openai_img2img,
@@ -25,100 +33,75 @@ def _generate_image(prompt: str) -> str:
             from app.services.ai_image import create_image as _impl
     return _impl(prompt)
 
-def _resolve_init_path_from_persona(p: dict | None) -> str | None:
-    """
-    Persona portrait → local file path for img2img.
-    - First try uploaded filename
-    - Then ref_image_url if it points into /uploads/…
-    """
-    if not p:
-        return None
-    if p.get("filename"):
-        return f"/app/uploads/characters/{p['filename']}"
-    if p.get("ref_image_url"):
-        parsed = urlparse(p["ref_image_url"])
-        if parsed.path.startswith("/uploads/"):
-            return "/app" + parsed.path
-    return None
-
 # ---- KPI segéd
-def _kpis(m: dict) -> dict:
-    reach = max(1, int(m.get("reach") or 0))
-    likes = int(m.get("likes") or 0)
-    comments = int(m.get("comments") or 0)
-    impressions = int(m.get("impressions") or 0)
-
-    like_rate = likes / reach
-    comment_rate = comments / reach
-    # engagement rate itt a két mutató (kérésed szerint csak 4 KPI-t tartunk)
-    eng_rate = (likes + comments) / reach
-
-    # egyszerű score (arány alapú, 0..100)
-    like_norm = min(like_rate, 0.08) / 0.08
-    comm_norm = min(comment_rate, 0.02) / 0.02
-    score = round(100 * (0.65 * like_norm + 0.35 * comm_norm))
-
-    return {
-        "reach": reach,
-        "impressions": impressions,
-        "likes": likes,
-        "comments": comments,
-        "likeRate": round(like_rate, 4),
-        "commentRate": round(comment_rate, 4),
-        "engagementRate": round(eng_rate, 4),
-        "score": score,
-    }
+_kpis = post_kpis  # régi név; a számítás a services/kpi.py-ban él
 
-# ---- /critique: LLM készít személyre szabott tippeket + image intents
-@router.post("/critique/{post_id}")
-def critique_post(post_id: str):
+# ---- szinkron (pymongo) segédek: az async route-ok asyncio.to_thread-del hívják,
+# hogy a Mongo-körút ne az event loopot fogja
+def _load_post(post_id: str) -> dict:
     try:
         oid = ObjectId(post_id)
     except Exception:
         raise HTTPException(400, "Invalid post id")
-
     post = db.feed_posts.find_one({"_id": oid})
     if not post:
         raise HTTPException(404, "Post not found")
+    return post
+
+def _save_agent(oid: ObjectId, record: dict) -> None:
+    db.feed_posts.update_one({"_id": oid}, {"$set": {"agent": record}})
+    versions.bump("feed_posts")
+
+# ---- /critique/batch: sok poszt párhuzamosan (limitálva), egyetlen bulk_write
+# (a /critique/{post_id} elé kell regisztrálni, különben az nyelné el a 'batch' path-t)
+class CritiqueBatchReq(BaseModel):
+    postIds: List[str] = Field(default_factory=list)
+    missingOnly: bool = False   # minden poszt, aminek még nincs `agent` rekordja
+    limit: int = Field(default=100, ge=1, le=1000)
+
+def _batch_posts(body: CritiqueBatchReq) -> tuple[List[dict], List[str]]:
+    if body.missingOnly:
+        posts = list(db.feed_posts.find({"agent": {"$exists": False}}).sort("publishedAt", -1).limit(body.limit))
+        return posts, []
+    if not body.postIds:
+        raise HTTPException(400, "Provide 'postIds' or set 'missingOnly'")
+    try:
+        oids = [ObjectId(x) for x in body.postIds[: body.limit]]
+    except Exception:
+        raise HTTPException(400, "Invalid post id")
+    posts = list(db.feed_posts.find({"_id": {"$in": oids}}))
+    found = {p["_id"] for p in posts}
+    return posts, [str(o) for o in oids if o not in found]
 
-    k = _kpis(post.get("metrics") or {})
-    payload = {
-        "title": post.get("title") or "",
-        "caption": post.get("caption") or "",
-        "hashtags": post.get("hashtags") or [],
-        "category": post.get("category") or "lifestyle",
-        "personaId": post.get("personaId") or "",
-        "kpis": k,
-    }
+@router.post("/critique/batch")
+async def critique_batch(body: CritiqueBatchReq):
+    posts, missing = await asyncio.to_thread(_batch_posts, body)
+    records, errors = await critique_engine.critique_many(posts)
+    return {"count": len(records), "results": records, "errors": errors, "missing": missing}
 
-    # LLM-ből strukturált válasz (nem if-else)
-    agent = generate_agent_critique(payload)
-
-    # kiegészítjük fix mezőkkel és mentjük
-    agent_record: Dict[str, Any] = {
-        "score": k["score"],
-        "kpis": {"likeRate": k["likeRate"], "commentRate": k["commentRate"], "engagementRate": k["engagementRate"]},
-        "insights": agent.get("insights", []),
-        "recommendations": agent.get("recommendations", []),
-        "nextDraftConfig": agent.get("nextDraftConfig", {}),
-        "version": "v2",
-        "createdAt": datetime.utcnow().isoformat(),
-    }
-    db.feed_posts.update_one({"_id": oid}, {"$set": {"agent": agent_record}})
+# ---- /critique: LLM készít személyre szabott tippeket + image intents
+@router.post("/critique/{post_id}")
+async def critique_post(post_id: str):
+    post = await asyncio.to_thread(_load_post, post_id)
+    agent_record = await critique_engine.critique(post)
+    await asyncio.to_thread(_save_agent, post["_id"], agent_record)
     return agent_record
 
+# ---- /critique/{id}/stream: ugyanaz SSE-n, az insightok érkezés közben jönnek
+@router.post("/critique/{post_id}/stream")
+async def critique_post_stream(post_id: str):
+    post = await asyncio.to_thread(_load_post, post_id)
+    return sse_response(critique_engine.critique_stream(post))
+
 # ---- /apply: létrehoz egy új draftot és képet generál az intents alapján
 @router.post("/apply/{post_id}")
-async def apply_recommendations(post_id: str):
-    # 1) Feed post betöltése
-    try:
-        oid = ObjectId(post_id)
-    except Exception:
-        raise HTTPException(400, "Invalid post id")
+async def apply_recommendations(post_id: str, idempotency_key: Optional[str] = Header(None, alias=idempotency.HEADER)):
+    gate = admission.gates["agent"]
+    return await idempotency.run(idempotency_key, f"agent.apply.{post_id}", {}, lambda: gate.run(lambda: _apply(post_id)))
 
-    post = db.feed_posts.find_one({"_id": oid})
-    if not post:
-        raise HTTPException(404, "Post not found")
+async def _apply(post_id: str) -> dict:
+    # 1) Feed post betöltése
+    post = await asyncio.to_thread(_load_post, post_id)
 
     agent = post.get("agent") or {}
     cfg = (agent.get("nextDraftConfig") or {}).copy()
@@ -136,12 +119,7 @@ async def apply_recommendations(post_id: str):
     overlay = intent.get("textOverlay", "none")
 
     # 4) Persona + topic alap prompt (ugyanúgy, mint draftnál)
-    persona = None
-    if post.get("personaId"):
-        try:
-            persona = db.personas.find_one({"_id": ObjectId(post["personaId"])})
-        except Exception:
-            persona = None
+    persona = persona_cache.get(post.get("personaId"))
 
     base_positive, _ = build_image_prompt_from_persona(
         persona,
@@ -157,7 +135,7 @@ async def apply_recommendations(post_id: str):
     prompt = f"{base_positive}, {extra_bits}"
 
     # 5) Persona portré → init image path
-    init_path = _resolve_init_path_from_persona(persona)
+    init_path = persona_cache.init_path(post.get("personaId"))
 
     # 6) Új kép generálása OpenAI img2img-gel
     new_image_url = post.get("imageUrl")
@@ -168,6 +146,7 @@ async def apply_recommendations(post_id: str):
                 prompt=prompt,
                 size="1024x1024",
                 pad_to_portrait=True,
+                persona_id=post.get("personaId"),
             )
         except Exception as e:
             # fallback: marad a régi kép
@@ -184,7 +163,12 @@ async def apply_recommendations(post_id: str):
         "status": "draft",
         "createdAt": datetime.utcnow(),
     }
-    ins = db.drafts.insert_one(draft_doc)
-    draft_doc["id"] = str(ins.inserted_id)
+    await asyncio.to_thread(db.drafts.insert_one, draft_doc)
+    await asyncio.to_thread(versions.bump, "drafts")
+    caption_index.upsert(draft_doc)
+    hashtag_index.upsert_draft(draft_doc)
+    if new_image_url != post.get("imageUrl"):
+        media_catalog.attach(new_image_url, draftId=str(draft_doc["_id"]))
+    draft_doc["id"] = str(draft_doc.pop("_id"))
     return draft_doc
 
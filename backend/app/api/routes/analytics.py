@@ -1,9 +1,12 @@
 from typing import List
 from datetime import datetime, timedelta, timezone
 from bson import ObjectId
-from fastapi import APIRouter
+from fastapi import APIRouter, Request
 
+from app.core import versions
 from app.core.db import db
+from app.core.serialization import FastJSONResponse
+from app.services.kpi import cached_feed_report
 
 router = APIRouter()
 
@@ -14,7 +17,12 @@ def _last_days(n: int = 7):
 
 
 @router.get("/analytics")
-def analytics():
+def analytics(request: Request):
+    # a perDay ablak naponta csúszik, ezért a dátum is az ETag része
+    tag, not_modified = versions.conditional(request, "drafts", extra=_last_days(1)[0])
+    if not_modified:
+        return not_modified
+
     # --- BY CATEGORY: dinamikusan, a draftokból kiolvasva ---
     # ha nincs category mező, "uncategorized" néven jelenik meg
     by_cat = list(
@@ -80,9 +88,21 @@ def analytics():
     # Összes draft száma – minden státuszra
     total = sum(x["count"] for x in by_status)
 
-    return {
+    return FastJSONResponse({
         "total": total,
         "byCategory": by_cat,
         "byStatus": by_status,
         "perDay": per_day,
-    }
+    }, headers=versions.etag_headers(tag))
+
+
+@router.get("/analytics/feed")
+def feed_analytics(request: Request):
+    """
+    Feed-szintű KPI-k (arányok, score, percentilisek, kategória / persona eloszlások)
+    egy vektorizált menetben; cache-elve, amíg a feed_posts nem változik.
+    """
+    tag, not_modified = versions.conditional(request, "feed_posts")
+    if not_modified:
+        return not_modified
+    return FastJSONResponse(cached_feed_report(), headers=versions.etag_headers(tag))
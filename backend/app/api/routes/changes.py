@@ -0,0 +1,65 @@
+# backend/app/api/routes/changes.py
+# Élő változás-események: WebSocket vagy SSE (EventSource), ugyanabból a hubból.
+#   ?collections=drafts,feed_posts   (alapból mind)
+#   ?since=<token>                   (vagy SSE-nél a Last-Event-ID fejléc) → folytatás
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+
+from app.core.serialization import dumps
+from app.services.changes import COLLECTIONS, hub
+
+router = APIRouter(tags=["changes"])
+
+_DEFAULT = ",".join(COLLECTIONS)
+
+
+def _collections(raw: str) -> set:
+    colls = {c.strip() for c in (raw or "").split(",") if c.strip()}
+    unknown = colls - set(COLLECTIONS)
+    if unknown or not colls:
+        raise HTTPException(400, f"collections must be a subset of {', '.join(COLLECTIONS)}")
+    return colls
+
+
+def _hello() -> str:
+    return dumps({"event": "hello", "mode": hub.mode, "token": hub.latest_token}).decode()
+
+
+@router.get("/changes/stream")
+async def changes_stream(request: Request, collections: str = _DEFAULT, since: Optional[str] = None):
+    """SSE: minden frame id-ja a token, így az EventSource magától folytat újracsatlakozáskor."""
+    colls = _collections(collections)
+    since = since or request.headers.get("last-event-id")
+
+    async def body():
+        yield f"retry: 3000\nevent: hello\ndata: {_hello()}\n\n"
+        async for ev in hub.subscribe(colls, since):
+            if ev is None:
+                yield ": ping\n\n"
+                continue
+            head = f"id: {ev.token}\n" if ev.token else ""
+            yield f"{head}event: {ev.name}\ndata: {ev.json}\n\n"
+
+    return StreamingResponse(
+        body(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.websocket("/changes/ws")
+async def changes_ws(ws: WebSocket, collections: str = _DEFAULT, since: Optional[str] = None):
+    try:
+        colls = _collections(collections)
+    except HTTPException as e:
+        await ws.close(code=1008, reason=str(e.detail))
+        return
+    await ws.accept()
+    try:
+        await ws.send_text(_hello())
+        async for ev in hub.subscribe(colls, since):
+            await ws.send_text(ev.json if ev is not None else '{"event":"ping"}')
+    except WebSocketDisconnect:
+        pass
@@ -4,10 +4,9 @@ from zipfile import ZipFile
 from uuid import uuid4
 from typing import List, Optional, Literal
 from datetime import datetime, timedelta
-from urllib.parse import urlparse
 from random import randint
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, BackgroundTasks, Depends, Header, HTTPException, Query, Request
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 from bson import ObjectId
@@ -15,9 +14,28 @@ from bson import ObjectId
 from app.core.settings import settings
 from app.core.db import db
 from app.core.files import UPLOAD_DIR
-
-from app.services.ai_text import gen_caption_and_tags, guess_category
-from app.services.ai_image import generate_openai_img2img, build_image_prompt_from_persona
+from app.core import idempotency, versions
+from app.core.admin import require_admin
+from app.core.serialization import FastJSONResponse, model_shape, project_many
+from app.core.streaming import sse_response
+
+from app.services.ai_text import (
+    DEFAULT_STYLE_HINT,
+    gen_caption_and_tags,
+    stream_caption_and_tags,
+    guess_category,
+)
+from app.services.caption_index import caption_index
+from app.services.hashtag_index import hashtag_index
+from app.services import admission, content_calendar, image_upgrade, media_catalog
+from app.services.persona_cache import persona_cache
+from app.services.kpi import CATEGORY_REACH, DEFAULT_REACH, persona_bias, stored_kpis, top_posts
+from app.services.ai_image import (
+    generate_openai_img2img,
+    generate_placeholder_img,
+    build_image_prompt_from_persona,
+)
+from app.services.breaker import CircuitOpenError
 
 router = APIRouter(tags=["drafts"])
 
@@ -44,6 +62,11 @@ class Idea(BaseModel):
         "education","technology","finance","health","fitness",
         "travel","food","lifestyle","career","productivity"
     ]
+    # előre legyártott jelöltnél (idea_queue): ideaId-vel a POST /drafts ezt veszi át
+    personaId: Optional[str] = None
+    caption: Optional[str] = None
+    hashtags: List[str] = Field(default_factory=list)
+    previewUrl: Optional[str] = None
 
 class DraftCreate(BaseModel):
     ideaId: Optional[str] = None
@@ -56,6 +79,7 @@ class DraftCreate(BaseModel):
     hashtags: List[str] = Field(default_factory=list)
     customText: Optional[str] = None
     personaId: str
+    reuseSimilar: bool = True   # közel azonos korábbi téma captionje újrahasznosítható (nincs LLM-hívás)
 
 
 class Draft(DraftCreate):
@@ -63,6 +87,12 @@ class Draft(DraftCreate):
     status: Literal["draft","approved"] = "draft"
     previewUrl: Optional[str] = None
     filename: Optional[str] = None
+    imageStatus: Optional[str] = None   # "placeholder" ha az images upstream nem volt elérhető
+    fullImageUrl: Optional[str] = None  # teljes felbontás (preview-first esetén később készül)
+    fullImageStatus: Optional[str] = None   # "pending" | "running" | "done" | "failed"
+    reusedFrom: Optional[str] = None    # draft id, ha a caption a hasonlósági indexből jött
+
+_DRAFT_SHAPE = model_shape(Draft)
 
 def _serialize(doc: dict) -> dict:
     doc["id"] = str(doc.pop("_id"))
@@ -84,61 +114,145 @@ def infer_category(doc: dict) -> str:
             best = (cat, score)
     return best[0]
 
+_STATIC_IDEAS = [
+    {"id": "i1", "title": "Leg day routine", "category": "fitness"},
+    {"id": "i2", "title": "High-protein breakfast bowl", "category": "food"},
+    {"id": "i3", "title": "Active rest day walk", "category": "lifestyle"},
+]
+_IDEA_SHAPE = model_shape(Idea)
+
 @router.get("/ideas", response_model=List[Idea])
-def list_ideas():
-    return [
-        {"id": "i1", "title": "Leg day routine", "category": "workout"},
-        {"id": "i2", "title": "High-protein breakfast bowl", "category": "meal"},
-        {"id": "i3", "title": "Active rest day walk", "category": "lifestyle"},
-    ]
+def list_ideas(request: Request, personaId: Optional[str] = None, limit: int = Query(50, ge=1, le=200)):
+    """Az éjszakai batch kész jelöltjei (legfrissebb elöl); üres sor esetén a régi statikus lista."""
+    tag, not_modified = versions.conditional(request, "idea_queue", extra=f"{personaId}|{limit}")
+    if not_modified:
+        return not_modified
+    docs = [_serialize(d) for d in content_calendar.list_queued(personaId, limit)]
+    return FastJSONResponse(project_many(docs or _STATIC_IDEAS, _IDEA_SHAPE), headers=versions.etag_headers(tag))
+
+@router.post("/ideas/generate", status_code=202, dependencies=[Depends(require_admin)])
+def generate_ideas(
+    background: BackgroundTasks,
+    perPersona: Optional[int] = Query(None, ge=1, le=50),
+    concurrency: Optional[int] = Query(None, ge=1, le=16),
+):
+    """
+    Kézi batch-futtatás (admin; ugyanaz, mint az ütemezett) a háttérben – 202 azonnal.
+    Ha már fut egy, a lease miatt kimarad; az eredmény a logban, a jelöltek a GET /ideas-ben.
+    """
+    background.add_task(content_calendar.run_logged, per_persona=perPersona, concurrency=concurrency)
+    return {"accepted": True}
 
 @router.get("/drafts", response_model=List[Draft])
-def get_drafts():
-    return [_serialize(d) for d in db.drafts.find().sort("_id", -1)]
+def get_drafts(request: Request):
+    tag, not_modified = versions.conditional(request, "drafts")
+    if not_modified:
+        return not_modified
+    # megbízható DB adat: Draft alakra vetítve, validáció nélkül, orjson-nal
+    docs = (_serialize(d) for d in db.drafts.find().sort("_id", -1))
+    return FastJSONResponse(project_many(docs, _DRAFT_SHAPE), headers=versions.etag_headers(tag))
 
 def _load_persona_or_404(persona_id: str) -> dict:
-    """Persona betöltése vagy 400 (rossz ID / nem létezik)."""
-    try:
-        p = db.personas.find_one({"_id": ObjectId(persona_id)})
-    except Exception:
-        p = None
+    """Persona betöltése (cache-ből) vagy 400 (rossz ID / nem létezik)."""
+    p = persona_cache.get(persona_id)
     if not p:
         raise HTTPException(400, "personaId is invalid or not found")
     return p
 
-def _resolve_init_path_from_persona(p: dict) -> str | None:
+class CaptionReq(BaseModel):
+    title: str
+    category: str = "lifestyle"
+    customText: Optional[str] = None
+
+@router.post("/drafts/caption/stream")
+async def stream_caption(body: CaptionReq):
     """
-    Persona portré → lokális útvonal feloldása.
-    - Előny: feltöltött filename
-    - Alternatíva: ref_image_url (ha /uploads/...-ra mutat)
+    Caption + hashtagek SSE-n, ahogy az LLM írja (caption delta / hashtag / done).
+    A kész caption+hashtags a POST /drafts-nak átadható, ott így nincs újabb LLM-hívás.
     """
-    if p.get("filename"):
-        return f"/app/uploads/characters/{p['filename']}"
-    if p.get("ref_image_url"):
-        parsed = urlparse(p["ref_image_url"])
-        if parsed.path.startswith("/uploads/"):
-            return "/app" + parsed.path
-    return None
+    return sse_response(stream_caption_and_tags(
+        topic=body.title,
+        category=body.category,
+        custom_text=body.customText or DEFAULT_STYLE_HINT,
+    ))
+
+@router.get("/drafts/similar")
+def similar_captions(
+    title: str,
+    category: str = "lifestyle",
+    customText: Optional[str] = None,
+    limit: int = Query(3, ge=1, le=20),
+):
+    """Korábbi, közel azonos témájú captionök (felajánlás; a POST /drafts magától is újrahasznosít)."""
+    return {"items": caption_index.lookup(title, category, customText or DEFAULT_STYLE_HINT, limit=limit)}
+
+@router.get("/drafts/hashtags")
+def suggest_hashtags(
+    title: str,
+    category: str = "lifestyle",
+    exclude: List[str] = Query(default_factory=list),
+    limit: int = Query(10, ge=1, le=30),
+):
+    """Hashtag javaslat a helyi indexből (együttes előfordulás + kategória, engagementtel súlyozva)."""
+    return {"items": hashtag_index.suggest(title, category, limit=limit, exclude=exclude)}
 
 @router.post("/drafts", response_model=Draft)
-async def create_draft(body: DraftCreate):
+async def create_draft(body: DraftCreate, idempotency_key: Optional[str] = Header(None, alias=idempotency.HEADER)):
+    # dupla kattintás / retry ugyanazzal a kulccsal: nincs második generálás és második draft
+    # admission a munka köré: a kulcsra váró ismétlés nem foglal helyet
+    gate = admission.gates["drafts"]
+    return await idempotency.run(idempotency_key, "drafts.create", body, lambda: gate.run(lambda: _create_draft(body)))
+
+async def _create_draft(body: DraftCreate) -> Draft:
     persona = _load_persona_or_404(body.personaId)
 
+    # 0) Előre legyártott jelölt (idea_queue): nincs LLM- és képhívás
+    queued = content_calendar.claim(body.ideaId, body.personaId) if body.ideaId else None
+    if queued and queued.get("previewUrl"):
+        doc = body.model_dump(exclude={"reuseSimilar"})
+        doc.update({
+            "caption": (body.caption or "").strip() or queued["caption"],
+            "hashtags": list(body.hashtags or []) or queued["hashtags"],
+            "status": "draft",
+            "previewUrl": queued["previewUrl"],
+            "fullImageUrl": queued["previewUrl"],   # az éjszakai batch teljes minőségben generál
+            "category": queued["category"],
+            "requestedCategory": body.category,   # caption_index ezzel hasonlít
+            "imageStatus": queued.get("imageStatus"),
+            "reusedFrom": queued.get("reusedFrom"),
+        })
+        db.drafts.insert_one(doc)
+        versions.bump("drafts")
+        caption_index.upsert(doc)
+        hashtag_index.upsert_draft(doc)
+        return Draft(id=str(doc.pop("_id")), **doc)
+
     # 1) Caption + hashtags (AI → fallback); NINCS több brand_tag
     caption = (body.caption or "").strip()
     hashtags = list(body.hashtags or [])
+    reused_from = None
+    if (not caption or not hashtags) and body.reuseSimilar and settings.CAPTION_REUSE_ENABLED:
+        hits = caption_index.lookup(body.title, body.category, body.customText or DEFAULT_STYLE_HINT, limit=1)
+        if hits:
+            caption = caption or hits[0]["caption"]
+            hashtags = hashtags or hits[0]["hashtags"]
+            reused_from = hits[0]["draftId"]
+    if caption and not hashtags:
+        # kész caption mellé a hashtagek a helyi indexből (nincs LLM-hívás)
+        hashtags = hashtag_index.hashtags_for(body.title, body.category)
     if not caption or not hashtags:
         try:
             cap, tags = await gen_caption_and_tags(
                 topic=body.title,
                 category=body.category,
-                custom_text=body.customText or "friendly, concise",
+                custom_text=body.customText or DEFAULT_STYLE_HINT,
             )
             caption = caption or cap
             hashtags = hashtags or tags  # gen_caption_and_tags már hozzáadja az 'ai_generated'-et
         except Exception:
             caption = caption or "Quick tip inside."
-            hashtags = hashtags or ["daily","ideas","trending","ai_generated"]
+            hashtags = hashtags or hashtag_index.hashtags_for(body.title, body.category) \
+                or ["daily","ideas","trending","ai_generated"]
             
     # garantáljuk az ai_generated taget
     if "ai_generated" not in [h.lower() for h in (hashtags or [])]:
@@ -149,7 +263,7 @@ async def create_draft(body: DraftCreate):
     category = infer_category(draft_probe)
 
     # 3) Persona portré → init_path (img2img-hez kötelező)
-    init_path = _resolve_init_path_from_persona(persona)
+    init_path = persona_cache.init_path(body.personaId)
     if not init_path:
         raise HTTPException(400, "Persona portrait not found; cannot run img2img.")
 
@@ -160,25 +274,47 @@ async def create_draft(body: DraftCreate):
         trend_tags=hashtags
     )
 
-    # 5) OpenAI img2img
-    _, url = await generate_openai_img2img(
-        init_image_path=init_path,
-        prompt=positive,
-        size="1024x1024",
-        pad_to_portrait=True,
-    )
+    # 5) OpenAI img2img (nyitott breaker → azonnali placeholder a portréból);
+    #    preview-first: gyors kis előnézet, a teljes felbontás jóváhagyáskor / kérésre
+    preview_first = settings.IMAGE_PREVIEW_FIRST
+    image_status = None
+    try:
+        _, url = await generate_openai_img2img(
+            init_image_path=init_path,
+            prompt=positive,
+            size="1024x1024",
+            pad_to_portrait=True,
+            persona_id=body.personaId,
+            **(image_upgrade.preview_options() if preview_first else {}),
+        )
+    except CircuitOpenError:
+        _, url = generate_placeholder_img(init_path, persona_id=body.personaId)
+        image_status = "placeholder"
 
     # 6) Mentés – KATEGÓRIÁVAL együtt
-    doc = body.model_dump()
+    doc = body.model_dump(exclude={"reuseSimilar"})
     doc.update({
         "caption": caption,
         "hashtags": hashtags,
         "status": "draft",
         "previewUrl": url,
         "category": category,   # <-- itt kerül be
+        "requestedCategory": body.category,   # caption_index ezzel hasonlít (nem a kikövetkeztetettel)
+        "imageStatus": image_status,
+        "reusedFrom": reused_from,
+        "fullImageUrl": None if preview_first else url,
+        "fullImageStatus": "pending" if preview_first else None,
+        "imagePrompt": positive,   # a teljes felbontású kép ugyanebből készül
     })
-    res = db.drafts.insert_one(doc)
-    return Draft(id=str(res.inserted_id), **doc)
+    db.drafts.insert_one(doc)
+    versions.bump("drafts")
+    caption_index.upsert(doc)   # insert_one beírta az _id-t
+    hashtag_index.upsert_draft(doc)
+    media_catalog.attach(url, draftId=str(doc["_id"]))
+    if preview_first and settings.IMAGE_UPGRADE_EAGER:
+        image_upgrade.schedule(str(doc["_id"]))
+    doc.pop("imagePrompt")
+    return Draft(id=str(doc.pop("_id")), **doc)
 
 @router.patch("/drafts/{draft_id}", response_model=Draft)
 def patch_draft(draft_id: str, body: dict):
@@ -193,41 +329,95 @@ def patch_draft(draft_id: str, body: dict):
     )
     if not doc:
         raise HTTPException(404, "Draft not found")
+    versions.bump("drafts")
+    caption_index.upsert(doc)
+    hashtag_index.upsert_draft(doc)
     return Draft(**_serialize(doc))
 
 @router.post("/drafts/{draft_id}/approve", response_model=Draft)
-def approve_draft(draft_id: str):
+def approve_draft(draft_id: str, background: BackgroundTasks):
     doc = db.drafts.find_one_and_update(
         {"_id": ObjectId(draft_id)}, {"$set": {"status": "approved"}}, return_document=True
     )
     if not doc:
         raise HTTPException(404, "Draft not found")
+    versions.bump("drafts")
 
     category = infer_category(doc)
     persona_hint = doc.get("personaId") or ""
-    metrics = _simulate_metrics(category, persona_hint)
+    # a like-rate szorzó a persona NEVÉBŐL jön (mint a synth generátorban), nem az id-ből
+    persona = persona_cache.get(persona_hint) or {}
+    metrics = _simulate_metrics(category, persona.get("name") or "")
 
     exists = db.feed_posts.find_one({"draftId": str(doc["_id"])})
     if not exists:
-        db.feed_posts.insert_one({
+        post = {
             "draftId": str(doc["_id"]),
             "title": doc.get("title"),
             "caption": doc.get("caption"),
             "hashtags": doc.get("hashtags", []),
-            "imageUrl": doc.get("previewUrl"),
+            "imageUrl": doc.get("fullImageUrl") or doc.get("previewUrl"),
             "personaId": persona_hint,
             "category": category,
             "publishedAt": datetime.utcnow(),
             "metrics": metrics,   # csak a 4 KPI lesz benne
-        })
+            "kpis": stored_kpis(metrics),
+        }
+        db.feed_posts.insert_one(post)
+        versions.bump("feed_posts")
+        hashtag_index.upsert_post(post)
+
+    # preview-first draft: a teljes felbontású kép most készül (a feed poszt is megkapja)
+    if doc.get("fullImageStatus") in ("pending", "failed"):
+        background.add_task(image_upgrade.upgrade, str(doc["_id"]))
 
     return Draft(**_serialize(doc))
 
+@router.post("/drafts/{draft_id}/image/full", response_model=Draft)
+async def full_image(
+    draft_id: str,
+    wait: bool = False,
+    idempotency_key: Optional[str] = Header(None, alias=idempotency.HEADER),
+):
+    """Teljes felbontású kép kérésre: háttérben (a változás-eseményekből látszik), vagy wait=true-val megvárva."""
+    try:
+        oid = ObjectId(draft_id)
+    except Exception:
+        raise HTTPException(400, "Invalid draft id")
+    d = db.drafts.find_one({"_id": oid})
+    if not d:
+        raise HTTPException(404, "Draft not found")
+    if d.get("fullImageStatus") in ("pending", "failed", "running"):
+        if wait:
+            # fizetős generálás a kérésen belül: admission + Idempotency-Key, mint a POST /drafts-nál
+            gate = admission.gates["images"]
+            return await idempotency.run(
+                idempotency_key, f"drafts.image.full.{draft_id}", {},
+                lambda: gate.run(lambda: _full_image_wait(draft_id)),
+            )
+        image_upgrade.schedule(draft_id)
+        d = db.drafts.find_one({"_id": oid})
+    d.pop("imagePrompt", None)
+    return Draft(**_serialize(d))
+
+async def _full_image_wait(draft_id: str) -> Draft:
+    # ha már fut (másik kérés / worker), a claim nem sikerül: megvárjuk azt
+    await image_upgrade.upgrade(draft_id)
+    await image_upgrade.wait_done(draft_id)
+    d = db.drafts.find_one({"_id": ObjectId(draft_id)})
+    if not d:
+        raise HTTPException(404, "Draft not found")
+    d.pop("imagePrompt", None)
+    return Draft(**_serialize(d))
+
 @router.delete("/drafts/{draft_id}")
 def delete_draft(draft_id: str):
     ok = db.drafts.delete_one({"_id": ObjectId(draft_id)}).deleted_count
     if not ok:
         raise HTTPException(404, "Draft not found")
+    versions.bump("drafts")
+    caption_index.remove(draft_id)
+    hashtag_index.remove_draft(draft_id)
     return {"ok": True}
 
 @router.post("/drafts/{draft_id}/regen_caption", response_model=Draft)
@@ -240,7 +430,7 @@ async def regen_caption(draft_id: str):
         cap, tags = await gen_caption_and_tags(
             topic=d.get("title",""),
             category=d.get("category","lifestyle"),
-            custom_text=d.get("customText") or "friendly, concise",
+            custom_text=d.get("customText") or DEFAULT_STYLE_HINT,
         )
     except Exception:
         cap = (d.get("title") or "New post") + " — save it!"
@@ -258,6 +448,9 @@ async def regen_caption(draft_id: str):
         {"$set": {"caption": cap, "hashtags": tags, "category": category}},
         return_document=True
     )
+    versions.bump("drafts")
+    caption_index.upsert(doc)
+    hashtag_index.upsert_draft(doc)
     return Draft(**_serialize(doc))
 
 # A régi regen_image / ai_photo endpointok érintetlenek maradnak; nem hívódnak, így nem zavarják a működést.
@@ -298,29 +491,14 @@ def export_draft_zip(draft_id: str):
         headers={"Content-Disposition": f'attachment; filename="manual_post_kit_{draft_id}.zip"'}
     )
 
-def _simulate_metrics(category: str, persona_hint: str = "") -> dict:
-    cat_base = {
-    "fitness": (1800, 4800),
-    "food": (1200, 3500),
-    "lifestyle": (900, 3000),
-    "finance": (800, 2500),
-    "travel": (1500, 4200),
-    "technology": (1000, 3200),
-    "education": (900, 2800),
-    "career": (900, 2600),
-    "productivity": (1100, 3200),
-    "health": (950, 3000),
-}.get((category or "lifestyle").lower(), (900, 2800))
-
+def _simulate_metrics(category: str, persona_name: str = "") -> dict:
+    # ugyanaz a modell, mint a synth generátorban (tömeges, seedelt változat)
+    cat_base = CATEGORY_REACH.get((category or "lifestyle").lower(), DEFAULT_REACH)
 
     reach = random.randint(*cat_base)
     impressions = int(reach * random.uniform(1.2, 1.6))
 
-    bias = 1.0
-    p = (persona_hint or "").lower()
-    if any(k in p for k in ["coach","fit","gym"]): bias = 1.15
-    elif any(k in p for k in ["food","chef"]):     bias = 1.25
-    elif any(k in p for k in ["crypto","fin"]):    bias = 0.90
+    bias = persona_bias(persona_name)
 
     like_rate = random.uniform(0.02, 0.06) * bias
     comment_rate = random.uniform(0.002, 0.015)
@@ -336,13 +514,37 @@ def _simulate_metrics(category: str, persona_hint: str = "") -> dict:
     }
 
 @router.get("/feed")
-def list_feed_posts():
+def list_feed_posts(request: Request):
     """Lista a feedben lévő posztokról (legújabb elöl)."""
+    tag, not_modified = versions.conditional(request, "feed_posts")
+    if not_modified:
+        return not_modified
     posts = []
     for p in db.feed_posts.find().sort("publishedAt", -1):
         p["id"] = str(p.pop("_id"))  # kliensnek szebb string ID
         posts.append(p)
-    return {"items": posts}
+    # datetime / agent rekord jsonable_encoder nélkül
+    return FastJSONResponse({"items": posts}, headers=versions.etag_headers(tag))
+
+
+@router.get("/feed/top")
+def top_feed_posts(
+    request: Request,
+    by: Literal["score", "likeRate", "commentRate"] = "score",
+    personaId: Optional[str] = None,
+    category: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    limit: int = Query(10, ge=1, le=100),
+):
+    """Top-N feed poszt a mentett kpis alapján (indexből, újraszámolás nélkül)."""
+    tag, not_modified = versions.conditional(
+        request, "feed_posts", extra=f"{by}|{personaId}|{category}|{since}|{until}|{limit}"
+    )
+    if not_modified:
+        return not_modified
+    items = top_posts(by, persona_id=personaId, category=category, since=since, until=until, limit=limit)
+    return FastJSONResponse({"by": by, "items": items}, headers=versions.etag_headers(tag))
 
 
 @router.delete("/feed/{post_id}")
@@ -356,4 +558,6 @@ def delete_feed_post(post_id: str):
     res = db.feed_posts.delete_one({"_id": oid})
     if not res.deleted_count:
         raise HTTPException(404, "Feed post not found")
+    versions.bump("feed_posts")
+    hashtag_index.remove_post(oid)
     return {"ok": True}
@@ -1,7 +1,56 @@
-from fastapi import APIRouter
+import asyncio, os, time
+
+from fastapi import APIRouter, Request
+from fastapi.responses import JSONResponse
+
+from app.core import db as mongo
+from app.core.files import UPLOAD_DIR
+from app.core.resources import worker_info
+from app.services import admission, breaker
 
 router = APIRouter(tags=["health"])
 
 @router.get("/healthz")
 def healthz():
-    return {"ok": True}
\ No newline at end of file
+    return {"ok": True, "upstreams": breaker.status(), "admission": admission.status()}
+
+
+async def _check(fn, timeout: float) -> dict:
+    try:
+        ms = await asyncio.wait_for(asyncio.to_thread(fn), timeout)
+        return {"ok": True, "latencyMs": round(ms, 2)}
+    except asyncio.TimeoutError:
+        return {"ok": False, "error": f"timeout after {timeout:.1f}s"}
+    except Exception as e:
+        return {"ok": False, "error": str(e)[:200]}
+
+
+def _uploads_writable() -> float:
+    started = time.perf_counter()
+    if not os.access(UPLOAD_DIR, os.W_OK):
+        raise RuntimeError(f"{UPLOAD_DIR} is not writable")
+    return (time.perf_counter() - started) * 1000
+
+
+@router.get("/readyz")
+async def readyz(request: Request):
+    """
+    Readiness (a load balancer ide küldhet forgalmat?): függőségek elérése + késleltetés.
+    A /healthz csak azt mondja meg, hogy a process él.
+    """
+    timeout = request.app.state.settings.READY_TIMEOUT_SECONDS
+    mongo_check, disk_check = await asyncio.gather(
+        _check(mongo.ping, timeout), _check(_uploads_writable, timeout)
+    )
+    checks = {"mongo": mongo_check, "uploads": disk_check}
+    ready = all(c["ok"] for c in checks.values())
+    return JSONResponse(
+        {
+            "ready": ready,
+            "checks": checks,
+            "upstreams": breaker.status(),   # nyitott breaker mellett is kiszolgálunk (fallback)
+            "admission": admission.status(),
+            "worker": worker_info(request.app.state.pools),
+        },
+        status_code=200 if ready else 503,
+    )
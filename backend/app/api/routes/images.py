@@ -1,12 +1,13 @@
 # backend/app/api/routes/images.py
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Header, HTTPException
 from pydantic import BaseModel
 from typing import List, Tuple, Optional
+from ...core import idempotency
 from ...services.ai_image import build_prompt, generate_openai_img2img
-from ...core.db import db
-from bson import ObjectId
+from ...services import admission
+from ...services.breaker import CircuitOpenError
+from ...services.persona_cache import persona_cache
 import uuid
-from urllib.parse import urlparse
 
 router = APIRouter(prefix="/api/images", tags=["images"])
 
@@ -26,32 +27,6 @@ class ImageRespItem(BaseModel):
 class ImageResp(BaseModel):
     images: List[ImageRespItem]
 
-# --- Segéd: persona portré → konténerbeli lokális útvonal ---
-def _resolve_init_path(p: dict) -> Optional[str]:
-    """
-    Magyar magyarázat:
-    - Előnyben a feltöltött fájl (filename → /uploads/characters/...).
-    - Ha csak URL van, és az /uploads/...-ra mutat, konténerben /app + path.
-    - Kezeli az új (ref_image_url) és a régi (imageUrl) mezőket is, hogy visszafelé kompatibilis legyen.
-    """
-    # Új séma: belső mentett fájlnév
-    if p.get("filename"):
-        return f"/app/uploads/characters/{p['filename']}"
-
-    # Új séma: ref_image_url
-    if p.get("ref_image_url"):
-        parsed = urlparse(p["ref_image_url"])
-        if parsed.path.startswith("/uploads/"):
-            return "/app" + parsed.path
-
-    # Régi séma: imageUrl
-    if p.get("imageUrl"):
-        parsed = urlparse(p["imageUrl"])
-        if parsed.path.startswith("/uploads/"):
-            return "/app" + parsed.path
-
-    return None
-
 # --- Segéd: prompt + init_path feloldása ---
 def _resolve_prompt_and_init_path(req: ImageReq) -> Tuple[str, Optional[str]]:
     """
@@ -60,7 +35,7 @@ def _resolve_prompt_and_init_path(req: ImageReq) -> Tuple[str, Optional[str]]:
       (Ez az endpoint kifejezetten persona+topic img2img.)
     """
     if not req.prompt and req.personaId and req.topic:
-        p = db.personas.find_one({"_id": ObjectId(req.personaId)})
+        p = persona_cache.get(req.personaId)
         if not p:
             raise HTTPException(status_code=400, detail="personaId not found")
 
@@ -70,7 +45,7 @@ def _resolve_prompt_and_init_path(req: ImageReq) -> Tuple[str, Optional[str]]:
             topic=req.topic,
             trend_tags=(req.trendTags or []),
         )
-        init_path = _resolve_init_path(p)
+        init_path = persona_cache.init_path(req.personaId)
         if not init_path:
             raise HTTPException(400, "Persona portrait not found; cannot run img2img.")
         return pos, init_path
@@ -83,7 +58,11 @@ def _resolve_prompt_and_init_path(req: ImageReq) -> Tuple[str, Optional[str]]:
 
 # --- FŐ ENDPOINT: OpenAI img2img 256x256 + 4:5 padosítás (olcsó mód) ---
 @router.post("/generate", response_model=ImageResp)
-async def generate_image(req: ImageReq):
+async def generate_image(req: ImageReq, idempotency_key: Optional[str] = Header(None, alias=idempotency.HEADER)):
+    gate = admission.gates["images"]
+    return await idempotency.run(idempotency_key, "images.generate", req, lambda: gate.run(lambda: _generate(req)))
+
+async def _generate(req: ImageReq) -> ImageResp:
     """
     Magyar magyarázat:
     - Persona + topic alapján építünk promptot.
@@ -94,12 +73,17 @@ async def generate_image(req: ImageReq):
 
     results: List[ImageRespItem] = []
     for _ in range(min(req.count or 1, 3)):
-        _img_id, url = await generate_openai_img2img(
-            init_image_path=init_path,
-            prompt=prompt,
-            size="1024x1024",       # olcsó
-            pad_to_portrait=True, # 4:5 padosítás (1024x1280)
-        )
+        try:
+            _img_id, url = await generate_openai_img2img(
+                init_image_path=init_path,
+                prompt=prompt,
+                size="1024x1024",       # olcsó
+                pad_to_portrait=True, # 4:5 padosítás (1024x1280)
+                persona_id=req.personaId,
+            )
+        except CircuitOpenError as e:
+            raise HTTPException(503, "Image generation temporarily unavailable",
+                                headers={"Retry-After": str(int(e.retry_in) + 1)})
         results.append(ImageRespItem(id=str(uuid.uuid4()), url=url))
 
     return ImageResp(images=results)
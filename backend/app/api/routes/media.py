@@ -0,0 +1,59 @@
+# backend/app/api/routes/media.py
+from datetime import datetime
+from typing import Literal, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+
+from app.core import versions
+from app.core.admin import require_admin
+from app.core.serialization import FastJSONResponse
+from app.services import media_catalog, media_gc
+
+router = APIRouter(prefix="/media", tags=["media"])
+
+
+@router.get("")
+def list_media(
+    request: Request,
+    personaId: Optional[str] = None,
+    kind: Optional[Literal["generated", "placeholder", "upload"]] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+):
+    """
+    Galéria a médiakatalógusból (legújabb elöl), fájlrendszer-bejárás nélkül.
+    Lapozás: a válasz nextCursor-ját add vissza cursor-ként; null = nincs több.
+    Válasz: { items: [{ id, url, personaId, draftId, promptHash, kind, width, height, bytes, createdAt }], nextCursor }
+    """
+    tag, not_modified = versions.conditional(
+        request, "media", extra=f"{personaId}|{kind}|{since}|{until}|{cursor}|{limit}"
+    )
+    if not_modified:
+        return not_modified
+    try:
+        docs, nxt = media_catalog.page(
+            persona_id=personaId, kind=kind, since=since, until=until, cursor=cursor, limit=limit
+        )
+    except ValueError:
+        raise HTTPException(400, "Invalid cursor")
+    for d in docs:
+        d["id"] = d.pop("_id")
+    return FastJSONResponse({"items": docs, "nextCursor": nxt}, headers=versions.etag_headers(tag))
+
+
+@router.post("/gc", dependencies=[Depends(require_admin)])
+def media_gc_run(
+    dryRun: bool = True,
+    graceSeconds: Optional[float] = Query(None, ge=0),
+    maxDelete: Optional[int] = Query(None, ge=1),
+):
+    """
+    Árva médiafájlok takarítása (alapból dry run: csak jelentés).
+    Válasz: { dryRun, dirs: {images, characters}, orphans, deleted, reclaimedBytes, sample, seconds }
+    """
+    try:
+        return media_gc.collect(dry_run=dryRun, grace_seconds=graceSeconds, max_delete=maxDelete)
+    except media_gc.UnknownBaseURL as e:
+        raise HTTPException(409, str(e))
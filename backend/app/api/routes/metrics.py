@@ -0,0 +1,78 @@
+# backend/app/api/routes/metrics.py
+# Feed post metrikák idősora: batch ingest + KPI trend posztra / personára.
+from datetime import datetime
+from typing import List, Literal, Optional
+
+from bson import ObjectId
+from fastapi import APIRouter, Depends, HTTPException, Query
+from pydantic import BaseModel, Field
+
+from app.core.admin import require_admin
+from app.core.db import db
+from app.core.serialization import FastJSONResponse
+from app.core.settings import settings
+from app.services import feed_metrics
+
+router = APIRouter(prefix="/metrics", tags=["metrics"])
+
+Bucket = Literal["1h", "6h", "1d", "1w"]
+
+
+class MetricSample(BaseModel):
+    postId: str
+    ts: datetime
+    impressions: int = Field(0, ge=0)
+    reach: int = Field(0, ge=0)
+    likes: int = Field(0, ge=0)
+    comments: int = Field(0, ge=0)
+
+
+class IngestIn(BaseModel):
+    samples: List[MetricSample]
+
+
+@router.post("/ingest", dependencies=[Depends(require_admin)])
+def ingest(body: IngestIn):
+    """Minták batchben; a poszt metrics/kpis mezője a legújabb mintára frissül."""
+    if not body.samples:
+        raise HTTPException(400, "No samples")
+    if len(body.samples) > settings.FEED_METRICS_MAX_BATCH:
+        raise HTTPException(413, f"At most {settings.FEED_METRICS_MAX_BATCH} samples per request")
+    return feed_metrics.ingest([s.model_dump() for s in body.samples])
+
+
+def _window(since: Optional[datetime], until: Optional[datetime]) -> None:
+    if since and until and since >= until:
+        raise HTTPException(400, "since must be earlier than until")
+
+
+@router.get("/posts/{post_id}")
+def post_trend(
+    post_id: str,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    bucket: Bucket = "1h",
+):
+    """KPI trend egy posztra (alapból az utolsó 7 nap)."""
+    _window(since, until)
+    try:
+        oid = ObjectId(post_id)
+    except Exception:
+        raise HTTPException(400, "Invalid post id")
+    if not db.feed_posts.find_one({"_id": oid}, {"_id": 1}):
+        raise HTTPException(404, "Post not found")
+    points = feed_metrics.trend(post_id=post_id, since=since, until=until, bucket=bucket)
+    return FastJSONResponse({"postId": post_id, "bucket": bucket, "points": points})
+
+
+@router.get("/personas/{persona_id}")
+def persona_trend(
+    persona_id: str,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    bucket: Bucket = Query("1d"),
+):
+    """KPI trend egy persona összes posztjára (bucketenként a posztok utolsó mintáinak összege)."""
+    _window(since, until)
+    points = feed_metrics.trend(persona_id=persona_id, since=since, until=until, bucket=bucket)
+    return FastJSONResponse({"personaId": persona_id, "bucket": bucket, "points": points})
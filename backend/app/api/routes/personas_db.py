@@ -1,12 +1,16 @@
-from fastapi import APIRouter, HTTPException, UploadFile, File, Form
+from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Request
 from pydantic import BaseModel
 from typing import Optional
 import os
 from bson import ObjectId
 
+from app.core import versions
 from app.core.db import db
+from app.core.serialization import FastJSONResponse
 from app.core.settings import settings
 from app.core.files import CHAR_DIR, save_upload
+from app.services import media_catalog
+from app.services.persona_cache import persona_cache
 
 router = APIRouter(tags=["personas"])
 
@@ -32,9 +36,13 @@ def _s(doc: dict) -> PersonaOut:
     )
 
 @router.get("/personas", response_model=list[PersonaOut])
-def list_personas():
-    """Az összes persona lekérdezése (legújabb elöl)."""
-    return [_s(d) for d in db.personas.find().sort("_id", -1)]
+def list_personas(request: Request):
+    """Az összes persona lekérdezése (legújabb elöl). ETag: változatlan listára 304."""
+    tag, not_modified = versions.conditional(request, "personas")
+    if not_modified:
+        return not_modified
+    items = [_s(d).model_dump() for d in db.personas.find().sort("_id", -1)]
+    return FastJSONResponse(items, headers=versions.etag_headers(tag))
 
 @router.post("/personas", response_model=PersonaOut)
 async def create_persona(
@@ -67,6 +75,8 @@ async def create_persona(
         "bg": bg,
     }
     res = db.personas.insert_one(doc)
+    versions.bump("personas")
+    media_catalog.attach(fname, personaId=str(res.inserted_id))
     doc["_id"] = res.inserted_id
     return _s(doc)
 
@@ -88,6 +98,8 @@ def update_persona(persona_id: str, body: dict):
     )
     if not doc:
         raise HTTPException(404, "Persona nem található.")
+    versions.bump("personas")
+    persona_cache.invalidate(persona_id)
     return _s(doc)
 
 @router.delete("/personas/{persona_id}")
@@ -106,6 +118,11 @@ def delete_persona(persona_id: str):
                 os.remove(p)
             except OSError:
                 pass
+        # a katalógus-bejegyzést is: a media_gc csak a még létező fájlokat járja be
+        if db.media.delete_one({"_id": fn}).deleted_count:
+            versions.bump("media")
 
     db.personas.delete_one({"_id": ObjectId(persona_id)})
+    versions.bump("personas")
+    persona_cache.invalidate(persona_id)
     return {"ok": True}
@@ -0,0 +1,46 @@
+# backend/app/api/routes/traces.py
+from datetime import datetime
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+
+from app.core.admin import require_admin
+from app.core.db import db
+from app.core.serialization import FastJSONResponse
+
+router = APIRouter(prefix="/traces", tags=["traces"], dependencies=[Depends(require_admin)])
+
+_LIST_FIELDS = {"method": 1, "path": 1, "status": 1, "totalMs": 1, "mongoMs": 1, "httpMs": 1,
+                "otherMs": 1, "reason": 1, "createdAt": 1}
+
+
+@router.get("")
+def list_traces(
+    path: Optional[str] = None,
+    minMs: float = Query(0, ge=0),
+    since: Optional[datetime] = None,
+    limit: int = Query(50, ge=1, le=500),
+):
+    """Tárolt (lassú / profilozott) kérések összesítője, legújabb elöl."""
+    q: dict = {}
+    if path:
+        q["path"] = path
+    if minMs:
+        q["totalMs"] = {"$gte": minMs}
+    if since:
+        q["createdAt"] = {"$gte": since}
+    items = []
+    for d in db.traces.find(q, _LIST_FIELDS).sort("createdAt", -1).limit(limit):
+        d["id"] = d.pop("_id")
+        items.append(d)
+    return FastJSONResponse({"items": items})
+
+
+@router.get("/{trace_id}")
+def get_trace(trace_id: str):
+    """Teljes trace: Mongo parancsok, kimenő HTTP hívások, profil (folded stackek)."""
+    d = db.traces.find_one({"_id": trace_id})
+    if not d:
+        raise HTTPException(404, "Trace not found")
+    d["id"] = d.pop("_id")
+    return FastJSONResponse(d)
@@ -1,6 +1,8 @@
 from typing import Optional
 from datetime import datetime
-from fastapi import APIRouter, Query
+from fastapi import APIRouter, Query, Request
+from app.core import versions
+from app.core.serialization import FastJSONResponse
 from app.core.settings import settings
 from app.services.trends import get_trends
 
@@ -8,6 +10,7 @@ router = APIRouter()
 
 @router.get("/trends")
 def trends(
+    request: Request,
     geo: str = Query(default=settings.TRENDS_GEO),
     window: str = Query(default=settings.TRENDS_WINDOW, pattern="^(7d|30d|90d)$"),
     seed: Optional[str] = Query(default=None, description="(Ignored)"),
@@ -19,9 +22,12 @@ def trends(
       { geo, window, keywords: [...], fetchedAt }
     """
     payload = get_trends(geo=geo, window=window)
-    return {
+    body = {
         "geo": payload.get("geo", geo),
         "window": payload.get("window", window),
         "keywords": payload.get("keywords", [])[:25],
         "fetchedAt": payload.get("fetchedAt", datetime.utcnow().isoformat() + "Z"),
     }
+    # a cache-elt payload 24h-ig változatlan: a fetchedAt azonosítja
+    tag = versions.tag_of("trends", body["geo"], body["window"], body["fetchedAt"])
+    return versions.not_modified(request, tag) or FastJSONResponse(body, headers=versions.etag_headers(tag))
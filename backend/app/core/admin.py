@@ -0,0 +1,19 @@
+# Admin-only endpoints: X-Admin-Token header compared with settings.ADMIN_TOKEN.
+import hmac
+from typing import Optional
+
+from fastapi import Header, HTTPException
+
+from app.core.settings import settings
+
+
+def require_admin(x_admin_token: Optional[str] = Header(None)) -> None:
+    """FastAPI dependency; with no ADMIN_TOKEN configured the admin endpoints are disabled."""
+    if not settings.ADMIN_TOKEN:
+        raise HTTPException(403, "Admin endpoints are disabled (ADMIN_TOKEN not set)")
+    # bytes: compare_digest on str raises TypeError for non-ASCII input; the header arrives
+    # latin-1 decoded, so encoding it back gives the raw bytes the client sent
+    if not x_admin_token or not hmac.compare_digest(
+        x_admin_token.encode("latin-1", errors="replace"), settings.ADMIN_TOKEN.encode()
+    ):
+        raise HTTPException(401, "Invalid admin token")
@@ -1,20 +1,167 @@
 # Simple Mongo client. Use one per process.
-from pymongo import MongoClient, ASCENDING
-from app.core.settings import settings
-
-client = MongoClient(settings.MONGO_URI)
-db = client[settings.MONGO_DB]
-
-# Ensure TTL index for trends cache (expires after TRENDS_TTL_SECONDS)
-try:
-    db.trends_cache.create_index(
-        [("cacheKey", ASCENDING)], name="cache_key_idx", unique=True
-    )
-    db.trends_cache.create_index(
-        [("createdAt", ASCENDING)],
-        name="trends_ttl_idx",
-        expireAfterSeconds=settings.TRENDS_TTL_SECONDS,
-    )
-except Exception:
-    # don’t crash on startup if already exists
-    pass
+# The app lifespan opens it per worker (open_client, pool sized from the worker count);
+# scripts fall back to a default client on first use. Indexes are ensured from the
+# lifespan, so importing the app needs no reachable Mongo.
+import os, threading, time
+
+from pymongo import MongoClient, ASCENDING, DESCENDING
+from pymongo.database import Database
+from app.core.profiling import command_timer
+from app.core.settings import Settings, settings
+
+_client: MongoClient | None = None
+_db_name = settings.MONGO_DB
+_pid = 0
+_lock = threading.Lock()
+
+
+def open_client(cfg: Settings, *, max_pool_size: int = 100) -> MongoClient:
+    global _client, _db_name, _pid
+    with _lock:
+        if _client is not None and _pid == os.getpid():
+            _client.close()
+        _client = MongoClient(cfg.MONGO_URI, maxPoolSize=max_pool_size, event_listeners=[command_timer])
+        _db_name, _pid = cfg.MONGO_DB, os.getpid()
+        return _client
+
+
+def get_client() -> MongoClient:
+    # a szülőtől örökölt (fork előtti) klienst nem használjuk tovább
+    if _client is None or _pid != os.getpid():
+        with _lock:
+            if _client is None or _pid != os.getpid():
+                _open_default()
+    return _client
+
+
+def _open_default() -> None:
+    global _client, _pid
+    _client = MongoClient(settings.MONGO_URI, event_listeners=[command_timer])
+    _pid = os.getpid()
+
+
+def get_db() -> Database:
+    return get_client()[_db_name]
+
+
+class _LazyDB:
+    """`db.drafts` / `db["drafts"]` as before, but the client is only built on first access."""
+
+    def __getattr__(self, name: str):
+        return getattr(get_db(), name)
+
+    def __getitem__(self, name: str):
+        return get_db()[name]
+
+
+db = _LazyDB()
+
+
+def close() -> None:
+    global _client
+    with _lock:
+        if _client is not None and _pid == os.getpid():
+            _client.close()
+        _client = None
+
+
+def ping() -> float:
+    """Round trip of a ping command in ms (raises if Mongo is unreachable)."""
+    started = time.perf_counter()
+    get_client().admin.command("ping")
+    return (time.perf_counter() - started) * 1000
+
+
+def ensure_indexes() -> None:
+    """Idempotent; called once from the lifespan (in the background)."""
+    # Ensure TTL index for trends cache (expires after TRENDS_TTL_SECONDS)
+    try:
+        db.trends_cache.create_index(
+            [("cacheKey", ASCENDING)], name="cache_key_idx", unique=True
+        )
+        db.trends_cache.create_index(
+            [("createdAt", ASCENDING)],
+            name="trends_ttl_idx",
+            expireAfterSeconds=settings.TRENDS_TTL_SECONDS,
+        )
+    except Exception:
+        # don’t crash on startup if already exists
+        pass
+
+    # Feed leaderboard (/api/feed/top): equality → sort → range sorrend metrikánként
+    try:
+        for metric in ("score", "likeRate", "commentRate"):
+            key = f"kpis.{metric}"
+            db.feed_posts.create_index([(key, DESCENDING), ("publishedAt", DESCENDING)], name=f"top_{metric}_idx")
+            for field in ("personaId", "category"):
+                db.feed_posts.create_index(
+                    [(field, ASCENDING), (key, DESCENDING), ("publishedAt", DESCENDING)],
+                    name=f"top_{field}_{metric}_idx",
+                )
+    except Exception:
+        pass
+
+    # Tartalomnaptár sor: personánkénti kész jelöltek, a régiek lejárnak
+    try:
+        db.idea_queue.create_index(
+            [("status", ASCENDING), ("personaId", ASCENDING), ("createdAt", DESCENDING)], name="queue_idx"
+        )
+        db.idea_queue.create_index(
+            [("createdAt", ASCENDING)], name="queue_ttl_idx",
+            expireAfterSeconds=settings.CALENDAR_TTL_DAYS * 86400,
+        )
+    except Exception:
+        pass
+
+    # Lassú / profilozott kérések trace-ei (core/profiling.py)
+    try:
+        db.traces.create_index(
+            [("createdAt", ASCENDING)], name="traces_ttl_idx",
+            expireAfterSeconds=settings.PROFILE_TRACE_TTL_SECONDS,
+        )
+        db.traces.create_index([("path", ASCENDING), ("createdAt", DESCENDING)], name="traces_path_idx")
+    except Exception:
+        pass
+
+    # Idempotency-Key rekordok (core/idempotency.py)
+    try:
+        db.idempotency_keys.create_index(
+            [("createdAt", ASCENDING)], name="idempotency_ttl_idx",
+            expireAfterSeconds=settings.IDEMPOTENCY_TTL_SECONDS,
+        )
+    except Exception:
+        pass
+
+    # Média katalógus: dHash 4 darabja (közel-duplikátum keresés), duplikátum-jelölés
+    try:
+        for i in range(4):
+            db.media.create_index([(f"h{i}", ASCENDING)], name=f"dhash_h{i}_idx")
+        # galéria: keyset lapozás (createdAt, _id), personára szűrve is
+        db.media.create_index([("createdAt", DESCENDING), ("_id", DESCENDING)], name="gallery_idx")
+        db.media.create_index(
+            [("personaId", ASCENDING), ("createdAt", DESCENDING), ("_id", DESCENDING)], name="gallery_persona_idx"
+        )
+        db.media.create_index([("dir", ASCENDING), ("createdAt", DESCENDING)], name="media_dir_idx")
+        db.media.create_index([("draftId", ASCENDING)], name="media_draft_idx", sparse=True)
+        db.media.create_index([("duplicateOf", ASCENDING)], name="duplicate_of_idx", sparse=True)
+    except Exception:
+        pass
+
+    # Média GC: batchenkénti $in a hivatkozó mezőkre
+    try:
+        for coll, field in (
+            ("drafts", "previewUrl"), ("drafts", "fullImageUrl"), ("drafts", "filename"),
+            ("feed_posts", "imageUrl"), ("idea_queue", "previewUrl"),
+            ("personas", "filename"), ("personas", "ref_image_url"), ("personas", "imageUrl"),
+        ):
+            db[coll].create_index([(field, ASCENDING)], name=f"{field}_ref_idx", sparse=True)
+    except Exception:
+        pass
+
+    # Feed metrikák: time-series kollekció (meta.postId / meta.personaId + ts)
+    try:
+        from app.services.feed_metrics import ensure_collection
+
+        ensure_collection()
+    except Exception as e:
+        print("feed_metrics setup failed:", e)
@@ -2,13 +2,16 @@ import os
 from uuid import uuid4
 from fastapi import UploadFile, HTTPException
 
+from app.services import media_catalog
+
 # Folders
 UPLOAD_DIR = "/app/uploads"
 CHAR_DIR = os.path.join(UPLOAD_DIR, "characters")
 
-# Ensure dirs exist
-os.makedirs(UPLOAD_DIR, exist_ok=True)
-os.makedirs(CHAR_DIR, exist_ok=True)
+def ensure_dirs() -> None:
+    """Create the upload folders (from the app lifespan, not at import)."""
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    os.makedirs(CHAR_DIR, exist_ok=True)
 
 # Allowed image types
 ALLOWED_IMG = {
@@ -27,8 +30,14 @@ def save_upload(file: UploadFile, folder: str) -> tuple[str, str]:
 
     fname = f"{uuid4()}{ext}"
     abs_path = os.path.join(folder, fname)
+    os.makedirs(folder, exist_ok=True)
 
     with open(abs_path, "wb") as out:
         out.write(file.file.read())
 
+    try:
+        media_catalog.record_file(abs_path, kind="upload")
+    except Exception as e:   # a katalógus nem akadályozhatja a feltöltést
+        print("media_catalog record error:", e)
+
     return fname, abs_path
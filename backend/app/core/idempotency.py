@@ -0,0 +1,169 @@
+# backend/app/core/idempotency.py
+# Idempotency-Key a drága (fizetős OpenAI) generáló endpointokhoz: dupla kattintás /
+# kliens-retry NEM indít új generálást és nem szúr be még egy draftot.
+#   - kész kérés ismétlése → a tárolt válasz (Idempotency-Replayed: true),
+#   - futó kérés ismétlése → ugyanarra az eredményre vár (ugyanazon a workeren a taskra,
+#     másik workeren a Mongo dokumentum pollozásával),
+#   - ugyanaz a kulcs más kéréstörzzsel → 422.
+# A kulcsok az idempotency_keys kollekcióban élnek, TTL indexszel (IDEMPOTENCY_TTL_SECONDS).
+# A futó kérés lease-ét (leaseUntil) a tulajdonos lease/3-onként megújítja, így egy
+# IDEMPOTENCY_LEASE_SECONDS-nál hosszabb generálást sem vesz át egy másik worker.
+# A Mongo-hívások (szinkron pymongo) asyncio.to_thread-del futnak, nem az event loopon.
+from __future__ import annotations
+import asyncio, hashlib, uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from pymongo.errors import DuplicateKeyError
+
+from app.core.db import db
+from app.core.serialization import FastJSONResponse, dumps
+from app.core.settings import settings
+
+HEADER = "Idempotency-Key"
+# ezen a workeren futó eredeti kérések: kulcs → (task, kéréstörzs ujjlenyomata)
+_inflight: Dict[str, Tuple[asyncio.Task, str]] = {}
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _replay(doc: dict) -> FastJSONResponse:
+    if doc.get("error"):
+        raise HTTPException(doc["code"], doc["error"])
+    return FastJSONResponse(doc["body"], status_code=doc["code"], headers={"Idempotency-Replayed": "true"})
+
+
+def _claim(doc_id: str, fingerprint: str, owner: str) -> dict | None:
+    """Saját futás lefoglalása; None ha sikerült, különben a meglévő kulcs dokumentuma."""
+    now = _now()
+    lease = now + timedelta(seconds=settings.IDEMPOTENCY_LEASE_SECONDS)
+    try:
+        db.idempotency_keys.insert_one({
+            "_id": doc_id, "fingerprint": fingerprint, "status": "running",
+            "owner": owner, "createdAt": now, "leaseUntil": lease,
+        })
+        return None
+    except DuplicateKeyError:
+        pass
+    # lejárt lease (összeomlott worker): átvesszük
+    taken = db.idempotency_keys.update_one(
+        {"_id": doc_id, "fingerprint": fingerprint, "status": "running", "leaseUntil": {"$lt": now}},
+        {"$set": {"owner": owner, "leaseUntil": lease}},
+    ).modified_count
+    if taken:
+        return None
+    return db.idempotency_keys.find_one({"_id": doc_id}) or {"status": "gone"}
+
+
+def _renew(doc_id: str, owner: str) -> bool:
+    """A lease meghosszabbítása; False, ha közben elvesztettük (lejárt és más vette át)."""
+    lease = _now() + timedelta(seconds=settings.IDEMPOTENCY_LEASE_SECONDS)
+    return bool(db.idempotency_keys.update_one(
+        {"_id": doc_id, "owner": owner, "status": "running"}, {"$set": {"leaseUntil": lease}}
+    ).matched_count)
+
+
+async def _heartbeat(doc_id: str, owner: str) -> None:
+    """Amíg az eredeti kérés fut, lease/3-onként megújítja a leaseUntil-t."""
+    while True:
+        await asyncio.sleep(settings.IDEMPOTENCY_LEASE_SECONDS / 3)
+        try:
+            if not await asyncio.to_thread(_renew, doc_id, owner):
+                print("idempotency: lease lost:", doc_id)
+                return
+        except Exception as e:   # átmeneti Mongo hiba: a következő ütem újrapróbálja
+            print("idempotency: lease renew failed:", e)
+
+
+def _finish(doc_id: str, done: dict) -> None:
+    db.idempotency_keys.update_one({"_id": doc_id}, {"$set": done})
+
+
+def _forget(doc_id: str) -> None:
+    db.idempotency_keys.delete_one({"_id": doc_id})
+
+
+def _find(doc_id: str) -> dict | None:
+    return db.idempotency_keys.find_one({"_id": doc_id})
+
+
+async def _execute(doc_id: str, owner: str, fn: Callable[[], Awaitable[Any]]) -> dict:
+    heartbeat = asyncio.create_task(_heartbeat(doc_id, owner))
+    try:
+        result = await fn()
+    except HTTPException as e:
+        if e.status_code < 500:
+            # determinisztikus kliens-hiba: az ismétlés ugyanezt kapja
+            done = {"status": "done", "code": e.status_code, "error": e.detail}
+            await asyncio.to_thread(_finish, doc_id, done)
+        else:
+            await asyncio.to_thread(_forget, doc_id)   # retry újra próbálkozhat
+        raise
+    except asyncio.CancelledError:
+        _forget(doc_id)   # megszakítás közben nem várunk szálra: a kulcs ne ragadjon "running"-ban
+        raise
+    except BaseException:
+        await asyncio.to_thread(_forget, doc_id)
+        raise
+    finally:
+        heartbeat.cancel()
+    done = {"status": "done", "code": 200, "body": jsonable_encoder(result)}
+    await asyncio.to_thread(_finish, doc_id, done)
+    return done
+
+
+async def _wait_for(doc_id: str, fingerprint: str, fn: Callable[[], Awaitable[Any]]) -> FastJSONResponse:
+    """Másik workeren futó eredeti kérés: a dokumentum állapotát pollozzuk."""
+    while True:
+        await asyncio.sleep(settings.IDEMPOTENCY_POLL_SECONDS)
+        doc = await asyncio.to_thread(_find, doc_id)
+        if doc is None:
+            # az eredeti elbukott (5xx / megszakadt): mi futtatjuk újra
+            return await run_keyed(doc_id, fingerprint, fn)
+        if doc["status"] == "done":
+            return _replay(doc)
+        if doc["leaseUntil"].replace(tzinfo=timezone.utc) < _now():
+            return await run_keyed(doc_id, fingerprint, fn)
+
+
+async def run_keyed(doc_id: str, fingerprint: str, fn: Callable[[], Awaitable[Any]]) -> FastJSONResponse:
+    task, running = _inflight.get(doc_id, (None, None))
+    if task is not None and running != fingerprint:
+        raise HTTPException(422, f"{HEADER} was already used with a different request")
+    if task is None:
+        owner = uuid.uuid4().hex
+        existing = await asyncio.to_thread(_claim, doc_id, fingerprint, owner)
+        if doc_id in _inflight:
+            # a claim alatt ugyanezen a workeren egy másik kérés elindította: arra várunk
+            return await run_keyed(doc_id, fingerprint, fn)
+        if existing is None:
+            # külön task: ha az eredeti kliens lecsatlakozik, a (fizetős) munka akkor is
+            # befejeződik és eltárolódik – a retry már a kész választ kapja
+            task = asyncio.ensure_future(_execute(doc_id, owner, fn))
+            _inflight[doc_id] = (task, fingerprint)
+            task.add_done_callback(lambda t: (_inflight.pop(doc_id, None), t.cancelled() or t.exception()))
+        elif existing.get("fingerprint") not in (None, fingerprint):
+            raise HTTPException(422, f"{HEADER} was already used with a different request")
+        elif existing["status"] == "done":
+            return _replay(existing)
+        else:
+            return await _wait_for(doc_id, fingerprint, fn)
+    done = await asyncio.shield(task)
+    return FastJSONResponse(done["body"], status_code=done["code"])
+
+
+async def run(key: str | None, scope: str, payload: Any, fn: Callable[[], Awaitable[Any]]) -> Any:
+    """
+    fn() eredménye; ha jött Idempotency-Key, akkor legfeljebb egyszer fut le kulcsonként.
+    scope: endpoint (+ path paraméterek), payload: a kéréstörzs (ujjlenyomathoz).
+    """
+    if not key:
+        return await fn()
+    if len(key) > 255:
+        raise HTTPException(400, f"{HEADER} must be at most 255 characters")
+    fingerprint = hashlib.sha1(dumps(jsonable_encoder(payload))).hexdigest()
+    return await run_keyed(f"{scope}:{key}", fingerprint, fn)
@@ -0,0 +1,223 @@
+# backend/app/core/profiling.py
+# Kérésenkénti profilozás:
+#   - minden HTTP kérésnél könnyű bontás: Mongo parancsok (pymongo CommandListener) és
+#     kimenő HTTP hívások (httpx event hook) ideje → Server-Timing fejléc,
+#   - PROFILE_SLOW_MS fölötti kéréseknél a trace a traces kollekcióba kerül (TTL-lel),
+#   - X-Profile: 1 (+ X-Admin-Token) esetén mintavételező profiler is fut a kérés alatt:
+#     PROFILE_SAMPLE_INTERVAL_MS-enként a szálak stackjéből azokat tartja meg, amelyekben
+#     az endpoint függvény fut (sync endpointnál falióra, async-nál CPU idő az event loopon;
+#     ugyanannak az endpointnak a párhuzamos kérései is belekerülhetnek).
+# Visszakeresés: GET /api/traces, GET /api/traces/{id} (admin).
+from __future__ import annotations
+import asyncio, hmac, sys, threading, time, uuid
+from collections import Counter
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import List
+
+from pymongo import monitoring
+
+from app.core.settings import settings
+
+_current: ContextVar["Trace | None"] = ContextVar("profiling_trace", default=None)
+_SKIP_PREFIXES = ("/api/changes/", "/uploads/")   # hosszan élő streamek / statikus fájlok
+
+
+class Trace:
+    def __init__(self, method: str, path: str):
+        self.id = uuid.uuid4().hex[:16]
+        self.method = method
+        self.path = path
+        self.started = time.perf_counter()
+        self.created_at = datetime.now(timezone.utc)
+        self.mongo: List[dict] = []
+        self.http: List[dict] = []
+        self.dropped = 0
+        self._pending: dict = {}      # Mongo request_id → (command, collection)
+        self.stacks: Counter | None = None
+        self.samples = 0
+
+    def _add(self, bucket: List[dict], item: dict) -> None:
+        if len(self.mongo) + len(self.http) >= settings.PROFILE_MAX_EVENTS:
+            self.dropped += 1
+        else:
+            bucket.append(item)
+
+    def summary(self, status: int, total_ms: float) -> dict:
+        mongo_ms = sum(e["ms"] for e in self.mongo)
+        http_ms = sum(e["ms"] for e in self.http)
+        doc = {
+            "_id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "status": status,
+            "totalMs": round(total_ms, 2),
+            "mongoMs": round(mongo_ms, 2),
+            "httpMs": round(http_ms, 2),
+            # a maradék: Python CPU + várakozás (threadpool, admission, lockok)
+            "otherMs": round(max(total_ms - mongo_ms - http_ms, 0.0), 2),
+            "mongo": self.mongo,
+            "http": self.http,
+            "droppedEvents": self.dropped,
+            "createdAt": self.created_at,
+        }
+        if self.stacks is not None:
+            doc["profile"] = {
+                "intervalMs": settings.PROFILE_SAMPLE_INTERVAL_MS,
+                "samples": self.samples,
+                # "folded" formátum (flamegraph.pl / speedscope): "a;b;c" → darabszám
+                "stacks": [{"stack": s, "count": n} for s, n in self.stacks.most_common(200)],
+            }
+        return doc
+
+    def server_timing(self, total_ms: float) -> str:
+        mongo_ms = sum(e["ms"] for e in self.mongo)
+        http_ms = sum(e["ms"] for e in self.http)
+        return (f"mongo;dur={mongo_ms:.1f};desc=\"{len(self.mongo)} cmds\", "
+                f"http;dur={http_ms:.1f};desc=\"{len(self.http)} calls\", total;dur={total_ms:.1f}")
+
+
+# ---- Mongo: minden kliensre (db.open_client / _open_default) regisztrálva ----
+class CommandTimer(monitoring.CommandListener):
+    """A hívó szálán fut → a kérés ContextVar-ja látszik (a threadpool is másolja a contextet)."""
+
+    def started(self, event) -> None:
+        trace = _current.get()
+        if trace is not None:
+            coll = event.command.get(event.command_name)
+            trace._pending[event.request_id] = (event.command_name, coll if isinstance(coll, str) else None)
+
+    def _finish(self, event, ok: bool) -> None:
+        trace = _current.get()
+        if trace is None:
+            return
+        name, coll = trace._pending.pop(event.request_id, (event.command_name, None))
+        trace._add(trace.mongo, {"cmd": name, "coll": coll, "ms": round(event.duration_micros / 1000, 2), "ok": ok})
+
+    def succeeded(self, event) -> None:
+        self._finish(event, True)
+
+    def failed(self, event) -> None:
+        self._finish(event, False)
+
+
+command_timer = CommandTimer()
+
+
+# ---- httpx: a megosztott kliens event hookjai (openai_api.open_http) ----
+async def on_http_request(request) -> None:
+    if _current.get() is not None:
+        request.extensions["profiling_started"] = time.perf_counter()
+
+
+async def on_http_response(response) -> None:
+    trace = _current.get()
+    started = response.request.extensions.get("profiling_started")
+    if trace is None or started is None:
+        return
+    # a válasz fejlécéig (streamnél a teljes törzs ideje nincs benne)
+    trace._add(trace.http, {
+        "method": response.request.method,
+        "host": response.request.url.host,
+        "path": response.request.url.path,
+        "status": response.status_code,
+        "ms": round((time.perf_counter() - started) * 1000, 2),
+    })
+
+
+HTTP_HOOKS = {"request": [on_http_request], "response": [on_http_response]}
+
+
+# ---- mintavételező profiler ----
+class _Sampler(threading.Thread):
+    def __init__(self, trace: Trace, scope: dict):
+        super().__init__(name=f"profiler-{trace.id}", daemon=True)
+        self.trace = trace
+        self.scope = scope
+        self.interval = settings.PROFILE_SAMPLE_INTERVAL_MS / 1000
+        self.halt = threading.Event()
+        trace.stacks = Counter()
+
+    def run(self) -> None:
+        me = threading.get_ident()
+        while not self.halt.wait(self.interval):
+            endpoint = self.scope.get("endpoint")   # a router tölti ki az illesztéskor
+            code = getattr(endpoint, "__code__", None)
+            if code is None:
+                continue
+            for tid, frame in sys._current_frames().items():
+                if tid == me:
+                    continue
+                stack, hit = [], False
+                while frame is not None:
+                    hit = hit or frame.f_code is code
+                    stack.append(f"{frame.f_code.co_name} ({frame.f_code.co_filename.rsplit('/', 1)[-1]}:{frame.f_lineno})")
+                    frame = frame.f_back
+                if hit:
+                    self.trace.stacks[";".join(reversed(stack))] += 1
+                    self.trace.samples += 1
+
+
+def _wants_profile(scope: dict) -> bool:
+    headers = dict(scope.get("headers") or [])
+    if headers.get(b"x-profile") not in (b"1", b"true"):
+        return False
+    if not settings.ADMIN_TOKEN:
+        return False
+    # raw header bytes vs the encoded token (compare_digest on str rejects non-ASCII)
+    token = headers.get(b"x-admin-token", b"")
+    return hmac.compare_digest(token, settings.ADMIN_TOKEN.encode())
+
+
+def _store(doc: dict) -> None:
+    from app.core.db import db
+
+    try:
+        db.traces.insert_one(doc)
+    except Exception as e:
+        print("profiling: trace store failed:", e)
+
+
+class ProfilingMiddleware:
+    """Tiszta ASGI middleware (a scope-ot továbbadja, így a router által beírt endpoint látszik)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        path = scope.get("path", "")
+        if scope["type"] != "http" or not settings.PROFILING_ENABLED or path.startswith(_SKIP_PREFIXES):
+            await self.app(scope, receive, send)
+            return
+
+        trace = Trace(scope["method"], path)
+        token = _current.set(trace)
+        sampler = _Sampler(trace, scope) if _wants_profile(scope) else None
+        if sampler:
+            sampler.start()
+        status = {"code": 500, "stream": False}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                headers = dict(message.get("headers") or [])
+                status["stream"] = headers.get(b"content-type", b"").startswith(b"text/event-stream")
+                total_ms = (time.perf_counter() - trace.started) * 1000
+                # az X-Trace-Id-vel a lassúnak bizonyult kérés trace-e később lekérhető
+                extra = [(b"server-timing", trace.server_timing(total_ms).encode()),
+                         (b"x-trace-id", trace.id.encode())]
+                message = {**message, "headers": list(message.get("headers") or []) + extra}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            if sampler:
+                sampler.halt.set()
+            total_ms = (time.perf_counter() - trace.started) * 1000
+            slow = total_ms >= settings.PROFILE_SLOW_MS and not status["stream"]
+            if sampler or slow:
+                doc = trace.summary(status["code"], total_ms)
+                doc["reason"] = "profile" if sampler else "slow"
+                await asyncio.to_thread(_store, doc)
@@ -0,0 +1,40 @@
+# backend/app/core/resources.py
+# Per-worker erőforrások: Mongo kliens, megosztott httpx kliens, threadpool.
+# A lifespan nyitja / zárja őket – fork után, workerenként, így a pool méretek
+# a worker-számból jönnek és a forkolt processzek nem osztoznak socketeken.
+from __future__ import annotations
+import os
+
+from anyio import to_thread
+
+from app.core import db
+from app.core.settings import Settings
+from app.services import openai_api
+
+
+def pool_sizes(cfg: Settings) -> dict:
+    """Per-worker pool sizes: the configured totals split across WEB_CONCURRENCY workers."""
+    workers = max(1, cfg.WEB_CONCURRENCY)
+    return {
+        "workers": workers,
+        "mongoPool": max(10, cfg.MONGO_POOL_TOTAL // workers),
+        "httpPool": max(10, cfg.HTTP_POOL_TOTAL // workers),
+        "threads": max(8, cfg.THREADPOOL_TOTAL // workers),
+    }
+
+
+async def open_resources(cfg: Settings) -> dict:
+    sizes = pool_sizes(cfg)
+    db.open_client(cfg, max_pool_size=sizes["mongoPool"])
+    openai_api.open_http(max_connections=sizes["httpPool"])
+    to_thread.current_default_thread_limiter().total_tokens = sizes["threads"]
+    return sizes
+
+
+async def close_resources() -> None:
+    await openai_api.close_http()
+    db.close()
+
+
+def worker_info(sizes: dict | None) -> dict:
+    return {"pid": os.getpid(), **(sizes or {})}
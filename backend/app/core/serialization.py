@@ -0,0 +1,57 @@
+# backend/app/core/serialization.py
+# Gyors válaszút listákhoz: orjson (ObjectId / datetime natívan), és megbízható
+# DB-adatnál a Pydantic validáció kihagyása – a kimenet alakja ugyanaz marad.
+from __future__ import annotations
+from typing import Any, Dict, Iterable, List, Tuple, Type
+
+import orjson
+from bson import ObjectId
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+def dumps(content: Any) -> bytes:
+    return orjson.dumps(content, default=_default, option=_OPTIONS)
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSONResponse orjson-nal. Ha egy endpoint ezt adja vissza, a FastAPI a response_model
+    validációt és a jsonable_encoder-t is kihagyja – csak megbízható (DB-ből jövő) adatra.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def model_shape(model: Type[BaseModel]) -> List[Tuple[str, Any]]:
+    """(mező, default) párok a modell sorrendjében; egyszer számoljuk ki modellenként."""
+    shape = []
+    for name, field in model.model_fields.items():
+        default = None if field.is_required() else field.get_default(call_default_factory=True)
+        shape.append((name, default))
+    return shape
+
+
+def project(doc: Dict[str, Any], shape: List[Tuple[str, Any]]) -> Dict[str, Any]:
+    """A response_model-lel azonos alak validáció nélkül (hiányzó mező → default)."""
+    out = {}
+    for name, default in shape:
+        v = doc.get(name, default)
+        # mutable defaultot (pl. []) ne osszunk meg dokumentumok között
+        out[name] = list(v) if v is default and isinstance(v, list) else v
+    return out
+
+
+def project_many(docs: Iterable[Dict[str, Any]], shape: List[Tuple[str, Any]]) -> List[Dict[str, Any]]:
+    return [project(d, shape) for d in docs]
@@ -6,6 +6,14 @@ class Settings(BaseSettings):
     MONGO_URI: str = "mongodb://mongo:27017"
     MONGO_DB: str = "aiinfl"
 
+    # Worker processes (uvicorn --workers / gunicorn -w). The per-worker pools below
+    # are the totals divided by this, so N workers together stay within the budget.
+    WEB_CONCURRENCY: int = 1
+    MONGO_POOL_TOTAL: int = 100      # Mongo connections, all workers together
+    HTTP_POOL_TOTAL: int = 100       # outbound (OpenAI) HTTP connections
+    THREADPOOL_TOTAL: int = 160      # threads for sync endpoints
+    READY_TIMEOUT_SECONDS: float = 2.0
+
     # Public base URL for serving previews
     BASE_URL: str = "http://localhost:8000"
 
@@ -14,6 +22,129 @@ class Settings(BaseSettings):
     OPENAI_IMAGE_MODEL: str = "gpt-image-1"
     OPENAI_TEXT_MODEL: str = "gpt-4o-mini"
 
+    # OpenAI rate budget per model: [requests/min, tokens/min] (0 = unlimited)
+    OPENAI_RATE_LIMITS: dict[str, list[int]] = {
+        "gpt-4o-mini": [500, 200_000],
+        "gpt-image-1": [5, 0],
+    }
+    OPENAI_DEFAULT_LIMITS: list[int] = [60, 60_000]
+    # Retry (chat: 429/5xx + transport errors, images: 429 + connect errors only):
+    # full-jitter exponential backoff, Retry-After (429/503) wins if longer
+    OPENAI_MAX_RETRIES: int = 4
+    OPENAI_BACKOFF_BASE: float = 0.5
+    OPENAI_BACKOFF_MAX: float = 30.0
+    # Circuit breaker per upstream (chat / images): opens after N consecutive
+    # failures or SLO breaches, probes again after the cooldown
+    BREAKER_FAILURE_THRESHOLD: int = 5
+    BREAKER_COOLDOWN_SECONDS: float = 30.0
+    CHAT_LATENCY_SLO_SECONDS: float = 20.0
+    IMAGE_LATENCY_SLO_SECONDS: float = 90.0
+
+    # Token streaming (stream: true) for the /stream endpoints; False = one-shot compat mode
+    OPENAI_STREAMING: bool = True
+
+    # Near-duplicate caption reuse (local index, no LLM call above the threshold)
+    CAPTION_REUSE_ENABLED: bool = True
+    CAPTION_REUSE_THRESHOLD: float = 0.8
+    # Chat call for caption + hashtags: past this deadline the offline caption is used and
+    # the call counts as a breaker failure (kept below CHAT_LATENCY_SLO_SECONDS)
+    CAPTION_LLM_DEADLINE_SECONDS: float = 15.0
+
+    # Local hashtag index (co-occurrence / category / topic words, engagement weighted):
+    # hashtags without an LLM call when the caption is given, and the fallback tags;
+    # not used below HASHTAG_INDEX_MIN_DOCS tagged documents, loads at most MAX_DOCS per collection
+    HASHTAG_INDEX_ENABLED: bool = True
+    HASHTAG_INDEX_MIN_DOCS: int = 20
+    HASHTAG_INDEX_MAX_DOCS: int = 200_000
+    # caption / hashtag index: other workers' writes are picked up through the drafts /
+    # feed_posts version counters, checked at most this often (a change rebuilds the index)
+    INDEX_VERSION_CHECK_SECONDS: float = 10.0
+
+    # Admission control per endpoint class, per worker: [running, queued, initial service
+    # seconds for the Retry-After estimate]; beyond that (or after the queue timeout) a fast 503.
+    # The queue is a cap: at most timeout × running / service seconds wait (drafts: 30 × 8 / 20 = 12)
+    ADMISSION_LIMITS: dict[str, list[float]] = {
+        "drafts": [8, 32, 20.0],
+        "images": [4, 16, 30.0],
+        "agent": [4, 16, 30.0],
+    }
+    ADMISSION_DEFAULT_LIMITS: list[float] = [4, 16, 20.0]
+    ADMISSION_QUEUE_TIMEOUT_SECONDS: float = 30.0
+
+    # Max parallel LLM calls in a batch critique
+    CRITIQUE_CONCURRENCY: int = 4
+
+    # Live change events (/api/changes/ws, /api/changes/stream): Mongo change streams
+    # (needs a replica set), polling of the version counters otherwise
+    CHANGES_ENABLED: bool = True
+    CHANGES_POLL_SECONDS: float = 1.0
+    CHANGES_BUFFER: int = 2000          # recent events kept per worker for resume
+    CHANGES_CLIENT_QUEUE: int = 256     # per-client backlog before it gets a "reset"
+
+    # In-process persona cache (generation hot paths); other workers' writes are
+    # picked up through the personas version counter, checked at most this often
+    PERSONA_CACHE_TTL_SECONDS: float = 300.0
+    PERSONA_CACHE_MAX: int = 1000
+    PERSONA_VERSION_CHECK_SECONDS: float = 2.0
+
+    # Idempotency-Key on the paid generation endpoints (POST /drafts, /images/generate,
+    # /agent/apply): stored responses live this long; a running original is awaited
+    # (polled across workers) until its lease runs out; the owner renews the lease every
+    # LEASE/3 while it runs, so only a crashed worker's key is taken over
+    IDEMPOTENCY_TTL_SECONDS: int = 24 * 3600
+    IDEMPOTENCY_LEASE_SECONDS: float = 600.0
+    IDEMPOTENCY_POLL_SECONDS: float = 0.5
+
+    # Off-peak content calendar: pre-generated draft candidates (idea_queue) from the
+    # cached trends, once a day at CALENDAR_HOUR (server local time); the Mongo lease
+    # keeps it to one run across workers / cron
+    CALENDAR_ENABLED: bool = False
+    CALENDAR_HOUR: int = 3
+    CALENDAR_PER_PERSONA: int = 5        # ready candidates kept per persona
+    CALENDAR_CONCURRENCY: int = 2        # parallel caption + image generations
+    CALENDAR_LEASE_SECONDS: float = 3600.0
+    CALENDAR_TTL_DAYS: int = 7           # unused candidates expire after this
+
+    # Preview-first drafts: a fast low-quality, downscaled image right away, the full
+    # resolution one on approval / on demand (or right after creation if EAGER)
+    IMAGE_PREVIEW_FIRST: bool = True
+    IMAGE_PREVIEW_QUALITY: str = "low"
+    IMAGE_PREVIEW_MAX_SIDE: int = 512
+    IMAGE_FULL_QUALITY: str = "high"
+    IMAGE_UPGRADE_EAGER: bool = False
+    IMAGE_UPGRADE_STALE_SECONDS: float = 900.0   # a "running" upgrade ennyi után újraindítható
+    IMAGE_UPGRADE_WAIT_SECONDS: float = 300.0    # ?wait=true ennyit vár egy már futó upgrade-re
+
+    # Media catalog: perceptual hash (dHash) of every saved image; near-duplicates
+    # (Hamming distance <= MEDIA_DUP_DISTANCE, max 3) are "flag"-ged, "reuse"-d or ignored ("off")
+    MEDIA_DEDUP: str = "flag"
+    MEDIA_DUP_DISTANCE: int = 3
+
+    # Orphaned media GC (POST /api/media/gc, python -m app.services.media_gc): files younger
+    # than the grace period are kept (generation writes the file before the document);
+    # earlier BASE_URLs still present in stored image URLs must be listed here
+    MEDIA_GC_GRACE_SECONDS: float = 24 * 3600
+    MEDIA_GC_BATCH: int = 500
+    MEDIA_GC_PAUSE_SECONDS: float = 0.05
+    MEDIA_GC_BASE_URLS: list[str] = []
+
+    # Admin-only endpoints (X-Admin-Token header); unset = disabled
+    ADMIN_TOKEN: str | None = None
+
+    # Per-request profiling: Mongo / outbound HTTP breakdown on every request (Server-Timing,
+    # X-Trace-Id); requests slower than PROFILE_SLOW_MS are stored in `traces`. X-Profile: 1
+    # plus the admin token adds a sampling profiler to that one request.
+    PROFILING_ENABLED: bool = True
+    PROFILE_SLOW_MS: float = 1000.0
+    PROFILE_SAMPLE_INTERVAL_MS: float = 5.0
+    PROFILE_MAX_EVENTS: int = 500          # Mongo + HTTP events kept per trace
+    PROFILE_TRACE_TTL_SECONDS: int = 7 * 24 * 3600
+
+    # Feed post metrics time series (POST /api/metrics/ingest, feed_metrics collection):
+    # samples per ingest request and how long raw samples are kept
+    FEED_METRICS_MAX_BATCH: int = 5000
+    FEED_METRICS_RETENTION_DAYS: int = 180
+
     # Feature flags (keep images cheap during dev)
     USE_AI_IMAGES: bool = False
 
@@ -0,0 +1,26 @@
+# Server-Sent Events helper for streamed (token-by-token) responses.
+import json
+from typing import Any, AsyncIterator, Dict
+
+from fastapi.responses import StreamingResponse
+
+
+def _frame(ev: Dict[str, Any]) -> str:
+    data = json.dumps(ev, ensure_ascii=False, default=str)
+    return f"event: {ev.get('event', 'message')}\ndata: {data}\n\n"
+
+
+def sse_response(events: AsyncIterator[Dict[str, Any]]) -> StreamingResponse:
+    """Every dict becomes one SSE frame (event name = its 'event' key); errors end the stream with an 'error' frame."""
+    async def body():
+        try:
+            async for ev in events:
+                yield _frame(ev)
+        except Exception as e:
+            yield _frame({"event": "error", "detail": f"{type(e).__name__}: {e}"[:300]})
+
+    return StreamingResponse(
+        body(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,119 @@
+# backend/app/core/versions.py
+# Kollekciónkénti változás-számláló (Mongo "versions" kollekció, minden workernek közös).
+# Minden írás bump()-ol; a lista endpointok ebből képeznek ETag-et, és If-None-Match
+# egyezésnél 304-et adnak – egy kis _id-s olvasás a teljes lekérdezés + szerializálás helyett.
+from __future__ import annotations
+import hashlib, threading
+from collections import defaultdict
+from typing import Dict, Tuple
+from uuid import uuid4
+
+from fastapi import Request, Response
+from pymongo import UpdateOne
+
+from app.core.db import db
+
+CACHE_HEADERS = {"Cache-Control": "no-cache"}   # a böngésző tárolhat, de mindig revalidál
+
+# ebben a processzben végzett bump-ok kollekciónként: a helyben, inkrementálisan frissülő
+# cache-ek (caption / hashtag index) így különböztetik meg a saját írást a más workerétől
+_local: Dict[str, int] = defaultdict(int)
+_local_lock = threading.Lock()
+
+
+def bump(*names: str) -> None:
+    """Hívd minden írás után (insert / update / delete) az érintett kollekciókra."""
+    # az epoch csak az első upsertkor keletkezik: ha a versions kollekciót eldobják,
+    # a számláló újraindul, de a régi ETag-ek már nem egyezhetnek
+    db.versions.bulk_write(
+        [
+            UpdateOne({"_id": n}, {"$inc": {"v": 1}, "$setOnInsert": {"epoch": uuid4().hex[:8]}}, upsert=True)
+            for n in names
+        ],
+        ordered=False,
+    )
+    with _local_lock:
+        for n in names:
+            _local[n] += 1
+
+
+Baseline = Dict[str, Tuple[str, int]]
+
+
+def baseline(*names: str) -> Baseline:
+    """{kollekció: (verzió, eddigi saját bump-ok)} – kiindulópont a changed_elsewhere()-hez."""
+    with _local_lock:
+        local = {n: _local[n] for n in names}
+    vs = current(*names)
+    return {n: (vs[n], local[n]) for n in names}
+
+
+def _counter(version: str) -> Tuple[str, int]:
+    epoch, _, v = version.rpartition(".")
+    return epoch, int(v or 0)
+
+
+def changed_elsewhere(base: Baseline) -> Tuple[bool, Baseline]:
+    """
+    Írt-e MÁS processz a base óta? (a verzió többet lépett, mint a saját bump-ok száma,
+    vagy új epoch). Visszaadja az új kiindulópontot is.
+    """
+    now = baseline(*base)
+    for n, (version, local) in now.items():
+        (e0, v0), (e1, v1) = _counter(base[n][0]), _counter(version)
+        # e0 == "": a kollekciónak még nem volt számlálója, az első bump hozza létre az epochot
+        if (e0 and e0 != e1) or v1 - v0 > local - base[n][1]:
+            return True, now
+    return False, now
+
+
+def current(*names: str) -> Dict[str, str]:
+    docs = {d["_id"]: d for d in db.versions.find({"_id": {"$in": list(names)}})}
+    return {n: f"{docs[n].get('epoch', '')}.{docs[n].get('v', 0)}" if n in docs else "0" for n in names}
+
+
+def etag(*names: str, extra: str = "") -> str:
+    """Gyenge ETag a kollekciók verzióiból (+ pl. query / dátum, ha a válasz attól is függ)."""
+    vs = current(*names)
+    return tag_of(*(f"{n}={vs[n]}" for n in names), extra)
+
+
+def tag_of(*parts: str) -> str:
+    """Gyenge ETag tetszőleges, a válasz tartalmát meghatározó részekből."""
+    return f'W/"{hashlib.sha1("|".join(parts).encode()).hexdigest()[:20]}"'
+
+
+def _matches(request: Request, tag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    bare = tag.removeprefix("W/")
+    return any(t.strip().removeprefix("W/") == bare for t in header.split(","))
+
+
+def conditional(request: Request, *names: str, extra: str = "") -> Tuple[str, Response | None]:
+    """
+    (etag, 304-es válasz vagy None). Használat:
+        tag, not_modified = conditional(request, "drafts")
+        if not_modified:
+            return not_modified
+        ...
+        return FastJSONResponse(data, headers=etag_headers(tag))
+    """
+    # az ETag a lekérdezés ELŐTT készül: párhuzamos írásnál legfeljebb egy fölösleges
+    # teljes válasz lesz belőle, elavult adat sosem kap friss ETag-et
+    tag = etag(*names, extra=extra)
+    return tag, not_modified(request, tag)
+
+
+def not_modified(request: Request, tag: str) -> Response | None:
+    """304 válasz, ha a kliens If-None-Match-e egyezik, különben None."""
+    if _matches(request, tag):
+        return Response(status_code=304, headers=etag_headers(tag))
+    return None
+
+
+def etag_headers(tag: str) -> Dict[str, str]:
+    return {"ETag": tag, **CACHE_HEADERS}
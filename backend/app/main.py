@@ -2,7 +2,9 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
+from contextlib import asynccontextmanager
 from pathlib import Path
+import asyncio, threading
 
 # API routers
 from app.api.routes.health import router as health_router
@@ -12,45 +14,106 @@ from app.api.routes.analytics import router as analytics_router
 from app.api.routes.trends import router as trends_router
 from app.api.routes import images as images_router  # POST /api/images/generate
 from app.api.routes import agent
-
-app = FastAPI(title="AI Influencer API")
+from app.api.routes.changes import router as changes_router
+from app.api.routes.media import router as media_router
+from app.api.routes.traces import router as traces_router
+from app.api.routes.metrics import router as metrics_router
+from app.core import db as mongo
+from app.core.resources import close_resources, open_resources
+from app.core.settings import Settings, settings
+from app.core.files import ensure_dirs
+from app.core.profiling import ProfilingMiddleware
+from app.services.changes import hub as change_hub
+from app.services.content_calendar import run_scheduler
+from app.services.caption_index import caption_index
+from app.services.hashtag_index import hashtag_index
+from app.services.kpi import backfill_post_kpis
 
 # === Statikus könyvtárak beállítása (ABSZOLÚT utak) ===
 # A konténerben a kód /app alatt van:
 UPLOADS_ROOT = Path("/app/uploads").resolve()
 IMAGES_DIR = (UPLOADS_ROOT / "images").resolve()
-IMAGES_DIR.mkdir(parents=True, exist_ok=True)
-
-# A TELJES uploads mappát szolgáljuk ki:
-app.mount("/uploads", StaticFiles(directory=str(UPLOADS_ROOT)), name="uploads")
-
-# === Egyszerű root + debug ===
-@app.get("/")
-def root():
-    return {
-        "ok": True,
-        "uploads_root": str(UPLOADS_ROOT),
-        "images_dir": str(IMAGES_DIR),
-    }
-
-@app.get("/__debug_list")
-def __debug_list():
-    files = [p.name for p in IMAGES_DIR.glob("*.jpg")]
-    return {"count": len(files), "images": files[:50]}
-
-# === CORS + API route-ok ===
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["http://localhost:5173"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-app.include_router(health_router, prefix="/api")
-app.include_router(drafts_router, prefix="/api", tags=["drafts"])
-app.include_router(analytics_router, prefix="/api", tags=["analytics"])
-app.include_router(trends_router, prefix="/api", tags=["trends"])
-app.include_router(personas_db_router, prefix="/api")
-app.include_router(agent.router)  # /api/agent
-app.include_router(images_router.router)  # /api/images/generate
+
+
+def _db_warmup():
+    # indexek + régi feed postok kpis mezője (leaderboard); lassú / elérhetetlen Mongo
+    # ne tartsa vissza az első kérést
+    mongo.ensure_indexes()
+    backfill_post_kpis()
+    caption_index.warm()
+    if settings.HASHTAG_INDEX_ENABLED:
+        hashtag_index.ready()   # a fallback ne a kimaradáskor töltse be
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # import időben nincs I/O: mappák, Mongo, HTTP pool, indexek csak itt – workerenként
+    ensure_dirs()
+    IMAGES_DIR.mkdir(parents=True, exist_ok=True)
+    app.state.pools = await open_resources(app.state.settings)
+    threading.Thread(target=_db_warmup, name="db-warmup", daemon=True).start()
+    if app.state.settings.CHANGES_ENABLED:
+        change_hub.start()
+    calendar = asyncio.create_task(run_scheduler()) if app.state.settings.CALENDAR_ENABLED else None
+    yield
+    if calendar:
+        calendar.cancel()
+    change_hub.stop()
+    await close_resources()
+
+
+def create_app(cfg: Settings | None = None) -> FastAPI:
+    """
+    App factory. Több workerrel:  uvicorn app.main:app --workers 4  (WEB_CONCURRENCY=4),
+    vagy  uvicorn --factory app.main:create_app.
+    """
+    cfg = cfg or settings
+    app = FastAPI(title="AI Influencer API", lifespan=lifespan)
+    app.state.settings = cfg
+    app.state.pools = None
+
+    # A TELJES uploads mappát szolgáljuk ki (a mappát a lifespan hozza létre):
+    app.mount("/uploads", StaticFiles(directory=str(UPLOADS_ROOT), check_dir=False), name="uploads")
+
+    # === Egyszerű root + debug ===
+    @app.get("/")
+    def root():
+        return {
+            "ok": True,
+            "uploads_root": str(UPLOADS_ROOT),
+            "images_dir": str(IMAGES_DIR),
+        }
+
+    @app.get("/__debug_list")
+    def __debug_list():
+        # a médiakatalógusból (nincs glob); a teljes lista: GET /api/media
+        files = [d["_id"] for d in mongo.db.media.find({"dir": "images"}, {"_id": 1}).sort("createdAt", -1).limit(50)]
+        return {"count": mongo.db.media.count_documents({"dir": "images"}), "images": files}
+
+    # === CORS + API route-ok ===
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["http://localhost:5173"],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+        expose_headers=["Server-Timing", "X-Trace-Id"],
+    )
+    # Mongo / HTTP bontás minden kérésre, lassú kérések trace-e (core/profiling.py)
+    app.add_middleware(ProfilingMiddleware)
+
+    app.include_router(health_router, prefix="/api")
+    app.include_router(drafts_router, prefix="/api", tags=["drafts"])
+    app.include_router(analytics_router, prefix="/api", tags=["analytics"])
+    app.include_router(trends_router, prefix="/api", tags=["trends"])
+    app.include_router(personas_db_router, prefix="/api")
+    app.include_router(media_router, prefix="/api")     # /api/media, /api/media/gc
+    app.include_router(traces_router, prefix="/api")    # /api/traces (admin)
+    app.include_router(metrics_router, prefix="/api")   # /api/metrics/ingest (admin), trendek
+    app.include_router(changes_router, prefix="/api")   # /api/changes/ws, /api/changes/stream
+    app.include_router(agent.router)  # /api/agent
+    app.include_router(images_router.router)  # /api/images/generate
+    return app
+
+
+app = create_app()
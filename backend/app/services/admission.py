@@ -0,0 +1,108 @@
+# backend/app/services/admission.py
+# Admission control per endpoint class (drafts / images / agent), per worker:
+# at most `limit` requests run, at most `queue` wait (FIFO); beyond that, or after
+# ADMISSION_QUEUE_TIMEOUT_SECONDS in the queue, a fast 503 with a Retry-After estimated
+# from the recent service times (EWMA) – instead of piling up until the upstream times out.
+# The configured queue is a cap: only as many wait as can be served within the timeout
+# (timeout × limit / service time), the rest are rejected right away instead of after it.
+from __future__ import annotations
+import asyncio, math, time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Awaitable, Callable, Dict, TypeVar
+
+from fastapi import HTTPException
+
+from app.core.settings import settings
+
+T = TypeVar("T")
+_ALPHA = 0.2   # EWMA weight of the newest sample
+
+
+class AdmissionGate:
+    def __init__(self, name: str, *, limit: int, queue: int, timeout: float, initial_service: float):
+        self.name = name
+        self.limit = max(limit, 1)
+        self.queue = max(queue, 0)
+        self.timeout = timeout
+        self.active = 0
+        self.rejected = 0
+        self.service_ewma = initial_service   # seconds per admitted request
+        self._waiters: deque = deque()
+
+    def retry_after(self) -> int:
+        """Seconds until a slot is likely free: the queue ahead drains `limit` at a time."""
+        waves = (len(self._waiters) + 1) / self.limit
+        return max(1, min(math.ceil(waves * self.service_ewma), 300))
+
+    def max_waiting(self) -> int:
+        """Queue depth the timeout allows at the current service time (≤ the configured queue)."""
+        fits = int(self.timeout * self.limit / max(self.service_ewma, 1e-3))
+        return min(self.queue, fits)
+
+    def _reject(self, why: str) -> HTTPException:
+        self.rejected += 1
+        return HTTPException(503, f"{self.name} is overloaded ({why}), try again later",
+                             headers={"Retry-After": str(self.retry_after())})
+
+    async def _acquire(self) -> None:
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            return
+        if len(self._waiters) >= self.max_waiting():
+            raise self._reject("queue full")
+        fut = asyncio.get_running_loop().create_future()
+        self._waiters.append(fut)
+        try:
+            await asyncio.wait_for(fut, self.timeout)
+        except BaseException as e:
+            if fut.done() and not fut.cancelled():
+                self._release()            # the slot was already handed to us: pass it on
+            elif fut in self._waiters:
+                self._waiters.remove(fut)
+            if isinstance(e, asyncio.TimeoutError):
+                raise self._reject("queue timeout")
+            raise
+
+    def _release(self) -> None:
+        while self._waiters:
+            fut = self._waiters.popleft()
+            if not fut.done():
+                fut.set_result(None)       # the slot moves to the next waiter, active stays
+                return
+        self.active -= 1
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        await self._acquire()
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.service_ewma += _ALPHA * (time.monotonic() - started - self.service_ewma)
+            self._release()
+
+    async def run(self, fn: Callable[[], Awaitable[T]]) -> T:
+        async with self.slot():
+            return await fn()
+
+    def snapshot(self) -> dict:
+        return {
+            "active": self.active, "waiting": len(self._waiters),
+            "limit": self.limit, "queue": self.queue, "maxWaiting": self.max_waiting(),
+            "rejected": self.rejected,
+            "serviceSeconds": round(self.service_ewma, 2),
+        }
+
+
+def _gate(name: str) -> AdmissionGate:
+    limit, queue, initial = settings.ADMISSION_LIMITS.get(name, settings.ADMISSION_DEFAULT_LIMITS)
+    return AdmissionGate(name, limit=int(limit), queue=int(queue),
+                         timeout=settings.ADMISSION_QUEUE_TIMEOUT_SECONDS, initial_service=float(initial))
+
+
+gates: Dict[str, AdmissionGate] = {name: _gate(name) for name in ("drafts", "images", "agent")}
+
+
+def status() -> dict:
+    return {name: g.snapshot() for name, g in gates.items()}
@@ -1,13 +1,16 @@
 # backend/app/services/ai_image.py
+from __future__ import annotations
 import io, uuid, os
 from pathlib import Path
-import httpx
+from typing import TYPE_CHECKING
 from fastapi import HTTPException
-from PIL import Image
 from ..core.settings import settings
+from . import media_catalog, openai_api
 
-MEDIA_DIR = Path("/app/uploads/images").resolve()
-MEDIA_DIR.mkdir(parents=True, exist_ok=True)
+if TYPE_CHECKING:   # csak az annotációkhoz; a PIL lusta import
+    from PIL import Image
+
+MEDIA_DIR = Path("/app/uploads/images").resolve()   # _save_jpeg hozza létre, ha kell
 
 HF_ENDPOINT = lambda model: f"https://api-inference.huggingface.co/models/{model}"
 
@@ -59,16 +62,23 @@ async def generate_openai_img2img(
     model: str | None = None,
     size: str = "1024x1024",   # ← OpenAI által engedélyezett default
     pad_to_portrait: bool = True,
+    quality: str | None = None,      # "low" | "medium" | "high" (gpt-image-1); None = upstream default
+    max_side: int | None = None,     # mentés előtti kicsinyítés (gyors előnézet)
+    persona_id: str | None = None,   # csak a médiakatalógusnak
 ) -> tuple[str, str]:
     """
     OpenAI Images Edit (img2img):
     - Méret: 1024x1024 (OpenAI ezt támogatja); utána opcionális 4:5 padosítás (vászon bővítés, NEM nyújtás).
+    - quality="low" + max_side: gyors, olcsó előnézet (preview-first draft).
+    - Nyitott images breaker esetén CircuitOpenError (hívás nélkül).
     """
     key = os.getenv("OPENAI_API_KEY")
     if not key:
         raise HTTPException(500, "OPENAI_API_KEY not configured")
     model = model or os.getenv("OPENAI_IMAGE_MODEL", settings.OPENAI_IMAGE_MODEL)
 
+    from PIL import Image  # lusta import: csak képgeneráláskor kell
+
     # 1) base image beolvasása és PNG
     try:
         base = Image.open(init_image_path).convert("RGB")
@@ -89,11 +99,17 @@ async def generate_openai_img2img(
         "model": (None, model),
         "size": (None, size),  # ← csak a támogatott méretek egyike!
     }
-    async with httpx.AsyncClient(timeout=180) as client:
-        r = await client.post(url, headers=headers, files=files)
-        if r.status_code >= 400:
-            raise HTTPException(502, f"OpenAI {r.status_code}: {r.text[:400]}")
-        data = r.json()
+    if quality:
+        files["quality"] = (None, quality)
+    r = await openai_api.post(url, upstream="images", model=model, timeout=180, headers=headers, files=files)
+    if r.status_code == 429:
+        # retries exhausted: tell the client when to come back instead of a bare 502
+        wait = openai_api.retry_after(r) or settings.OPENAI_BACKOFF_MAX
+        raise HTTPException(503, "OpenAI rate limit reached, try again later",
+                            headers={"Retry-After": str(int(wait) + 1)})
+    if r.status_code >= 400:
+        raise HTTPException(502, f"OpenAI {r.status_code}: {r.text[:400]}")
+    data = r.json()
 
     # 3) base64 -> PIL Image
     import base64
@@ -105,18 +121,71 @@ async def generate_openai_img2img(
 
     # 4) 4:5 padosítás – NEM nyújtunk, csak vásznat bővítünk
     if pad_to_portrait:
-        w, h = image.size
-        target_w = w
-        target_h = int(round(target_w * 5 / 4))  # 4:5 arány
-        canvas = Image.new("RGB", (target_w, target_h), (17, 24, 39))  # #111827
-        top = (target_h - h) // 2
-        canvas.paste(image, (0, top))
-        image = canvas
-
-    # 5) Mentés
+        image = _pad_to_portrait(image)
+    if max_side:
+        image.thumbnail((max_side, max_side))
+
+    # 5) Mentés (+ katalógus)
+    return _save_jpeg(image, personaId=persona_id, promptHash=media_catalog.prompt_hash(prompt))
+
+def _pad_to_portrait(image: Image.Image) -> Image.Image:
+    """4:5 vászon, a kép középre kerül (#111827 kitöltés)."""
+    from PIL import Image
+
+    w, h = image.size
+    target_w = w
+    target_h = int(round(target_w * 5 / 4))  # 4:5 arány
+    canvas = Image.new("RGB", (target_w, target_h), (17, 24, 39))  # #111827
+    top = (target_h - h) // 2
+    canvas.paste(image, (0, top))
+    return canvas
+
+def _unpad_portrait(image: Image.Image) -> Image.Image:
+    """A _pad_to_portrait inverze: a 4:5 vászon közepéről a négyzetes kép (pl. img2img bemenetnek)."""
+    w, h = image.size
+    if h <= w:
+        return image
+    top = (h - w) // 2
+    return image.crop((0, top, w, top + w))
+
+def _save_jpeg(image: Image.Image, **meta) -> tuple[str, str]:
+    """Mentés + katalógus (dHash); MEDIA_DEDUP="reuse" esetén közel azonos meglévő képet adunk vissza."""
+    try:
+        h, dup = media_catalog.find_duplicate(image)
+    except Exception as e:   # a katalógus nem akadályozhatja a mentést
+        print("media_catalog lookup error:", e)
+        h, dup = None, None
+    if dup and settings.MEDIA_DEDUP == "reuse" and (MEDIA_DIR / dup["filename"]).exists():
+        return Path(dup["filename"]).stem, dup["url"]
+
     MEDIA_DIR.mkdir(parents=True, exist_ok=True)
     img_id = str(uuid.uuid4())
     out_path = MEDIA_DIR / f"{img_id}.jpg"
     image.save(out_path, format="JPEG", quality=92)
     url = f"{settings.BASE_URL}/uploads/images/{img_id}.jpg"
+    if h is not None:
+        try:
+            media_catalog.record(out_path.name, url, h, image.width, image.height, out_path.stat().st_size, dup, **meta)
+        except Exception as e:
+            print("media_catalog record error:", e)
     return img_id, url
+
+def generate_placeholder_img(
+    init_image_path: str, pad_to_portrait: bool = True, persona_id: str | None = None
+) -> tuple[str, str]:
+    """
+    Helyettesítő kép, amíg az images upstream nem elérhető (nyitott breaker):
+    a persona portréja 1024-es négyzetre vágva, ugyanúgy 4:5-re padosítva.
+    """
+    from PIL import Image
+
+    try:
+        base = Image.open(init_image_path).convert("RGB")
+    except FileNotFoundError:
+        raise HTTPException(400, f"Init image not found: {init_image_path}")
+    side = min(base.size)
+    left, top = (base.width - side) // 2, (base.height - side) // 2
+    image = base.crop((left, top, left + side, top + side)).resize((1024, 1024))
+    if pad_to_portrait:
+        image = _pad_to_portrait(image)
+    return _save_jpeg(image, kind="placeholder", personaId=persona_id)
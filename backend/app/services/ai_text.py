@@ -1,6 +1,12 @@
-import httpx, json
-from typing import List, Tuple, Dict, Any
+import asyncio, json
+from typing import List, Tuple, Dict, Any, AsyncIterator
 from app.core.settings import settings
+from app.services import openai_api
+from app.services.breaker import CircuitOpenError
+from app.services.hashtag_index import hashtag_index
+from app.services.json_stream import JsonStream
+
+CHAT_URL = "https://api.openai.com/v1/chat/completions"
 
 SYSTEM_PROMPT = (
     "You are an assistant that writes Instagram captions for a lifestyle persona. "
@@ -8,6 +14,9 @@ SYSTEM_PROMPT = (
     "Use at most 2 emojis total. English language only."
 )
 
+# create/regen draft ezt adja át, ha nincs customText
+DEFAULT_STYLE_HINT = "friendly, concise"
+
 CAPTION_RULES = (
     "Write 1 caption of 90–140 characters for the given topic. "
     "Then propose 10 short, relevant hashtags (lowercase, no diacritics). "
@@ -15,32 +24,27 @@ CAPTION_RULES = (
     "Return strict JSON with keys: caption (string), hashtags (array)."
 )
 
-# Szöveg és hashtagek generálása OpenAI segítségével
-async def gen_caption_and_tags(
-    topic: str,
-    category: str,
-    custom_text: str | None = None
-) -> Tuple[str, List[str]]:
-    """
-    Generates caption + hashtags via OpenAI.
-    No hard-coded brand tags. Ensures 'ai_generated' is present in the result.
-    """
-
-    if not settings.OPENAI_API_KEY:
-        caption = f"{topic} — quick tip inside."
-        tags = ["inspiration", "daily", "motivation", "creative", "ideas", "lifestyle"]
-        if "ai_generated" not in tags:
-            tags.append("ai_generated")
-        return caption, tags[:10]
-
-    style_hint = f"\nStyle hints: {custom_text}" if (custom_text and custom_text.strip()) else ""
-    user = f"{CAPTION_RULES}\n\nTopic: {topic}\nCategory: {category}{style_hint}"
+def _fallback_caption(topic: str, category: str = "lifestyle") -> Tuple[str, List[str]]:
+    """Offline caption (no key / chat upstream down or too slow); tags from the local hashtag index."""
+    caption = f"{topic} — quick tip inside."
+    tags = hashtag_index.hashtags_for(topic, category)
+    if tags:
+        return caption, tags
+    tags = ["inspiration", "daily", "motivation", "creative", "ideas", "lifestyle"]
+    if "ai_generated" not in tags:
+        tags.append("ai_generated")
+    return caption, tags[:10]
 
-    headers = {
+def _headers() -> Dict[str, str]:
+    return {
         "Authorization": f"Bearer {settings.OPENAI_API_KEY}",
         "Content-Type": "application/json",
     }
-    body = {
+
+def _caption_body(topic: str, category: str, custom_text: str | None) -> Dict[str, Any]:
+    style_hint = f"\nStyle hints: {custom_text}" if (custom_text and custom_text.strip()) else ""
+    user = f"{CAPTION_RULES}\n\nTopic: {topic}\nCategory: {category}{style_hint}"
+    return {
         "model": getattr(settings, "OPENAI_TEXT_MODEL", "gpt-4o-mini"),
         "messages": [
             {"role": "system", "content": SYSTEM_PROMPT},
@@ -50,17 +54,14 @@ async def gen_caption_and_tags(
         "response_format": {"type": "json_object"},
     }
 
-    async with httpx.AsyncClient(timeout=60) as client:
-        r = await client.post("https://api.openai.com/v1/chat/completions", headers=headers, json=body)
-        r.raise_for_status()
-        data = r.json()
-        obj = json.loads(data["choices"][0]["message"]["content"])
+_FORBIDDEN_TAGS = ("fitai", "aifitai", "ai")
 
+def _normalize_caption(obj: Dict[str, Any]) -> Tuple[str, List[str]]:
     caption = (obj.get("caption") or "").strip()[:160]
     tags = [str(h).lstrip("#").lower() for h in (obj.get("hashtags") or []) if isinstance(h, str)]
 
     # kiszűrjük a tiltottakat
-    tags = [t for t in tags if t not in ("fitai", "aifitai", "ai")]
+    tags = [t for t in tags if t not in _FORBIDDEN_TAGS]
 
     # garantáljuk az ai_generated taget
     if "ai_generated" not in tags:
@@ -75,6 +76,73 @@ async def gen_caption_and_tags(
 
     return caption, tags
 
+# Szöveg és hashtagek generálása OpenAI segítségével
+async def gen_caption_and_tags(
+    topic: str,
+    category: str,
+    custom_text: str | None = None
+) -> Tuple[str, List[str]]:
+    """
+    Generates caption + hashtags via OpenAI.
+    No hard-coded brand tags. Ensures 'ai_generated' is present in the result.
+    """
+
+    if not settings.OPENAI_API_KEY:
+        return _fallback_caption(topic, category)
+
+    body = _caption_body(topic, category, custom_text)
+    try:
+        r = await openai_api.post(
+            CHAT_URL, upstream="chat", model=body["model"], tokens=openai_api.estimate_tokens(body),
+            timeout=60, deadline=settings.CAPTION_LLM_DEADLINE_SECONDS, headers=_headers(), json=body,
+        )
+    except (CircuitOpenError, asyncio.TimeoutError):
+        return _fallback_caption(topic, category)
+    r.raise_for_status()
+    data = r.json()
+    obj = json.loads(data["choices"][0]["message"]["content"])
+    return _normalize_caption(obj)
+
+
+async def stream_caption_and_tags(
+    topic: str,
+    category: str,
+    custom_text: str | None = None
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Streaming változat: {"event": "caption", "delta"} a felirat darabjaira,
+    {"event": "hashtag", "value"} tagenként, végül {"event": "done", "caption", "hashtags"}
+    (ugyanaz a normalizált eredmény, mint gen_caption_and_tags-nél).
+    """
+    if not settings.OPENAI_API_KEY or not settings.OPENAI_STREAMING:
+        caption, tags = await gen_caption_and_tags(topic, category, custom_text)
+        yield {"event": "done", "caption": caption, "hashtags": tags}
+        return
+
+    body = _caption_body(topic, category, custom_text)
+    body["stream"] = True
+    body["stream_options"] = {"include_usage": True}
+    parser = JsonStream()
+    try:
+        async for piece in openai_api.stream(
+            CHAT_URL, upstream="chat", model=body["model"], tokens=openai_api.estimate_tokens(body),
+            timeout=60, headers=_headers(), json=body,
+        ):
+            for kind, path, value in parser.feed(piece):
+                if kind == "delta" and path == ("caption",):
+                    yield {"event": "caption", "delta": value}
+                elif kind == "value" and path[:1] == ("hashtags",) and isinstance(value, str):
+                    tag = value.lstrip("#").lower()
+                    if tag not in _FORBIDDEN_TAGS:
+                        yield {"event": "hashtag", "value": tag}
+    except CircuitOpenError:
+        caption, tags = _fallback_caption(topic, category)
+        yield {"event": "done", "caption": caption, "hashtags": tags}
+        return
+
+    caption, tags = _normalize_caption(json.loads(parser.text))
+    yield {"event": "done", "caption": caption, "hashtags": tags}
+
 # Kategória kitalálása kulcsszavak alapján
 CATEGORIES = [
     "education", "technology", "finance", "health", "fitness",
@@ -102,50 +170,102 @@ def guess_category(topic: str, caption: str = "") -> str:
     return "lifestyle"  # default
 
 
-def generate_agent_critique(payload: Dict[str, Any]) -> Dict[str, Any]:
+def _fallback_critique(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Szabály-alapú kritika (nincs kulcs / a chat upstream nem elérhető)."""
+    kpis = payload.get("kpis") or {}
+    like_rate = kpis.get("likeRate", 0.0)
+    comment_rate = kpis.get("commentRate", 0.0)
+    category = (payload.get("category") or "lifestyle").lower()
+
+    insights = [
+        "Reach vs likes suggests the hook may be weak.",
+        "Caption opening likely not inviting comments.",
+    ]
+    recs = [
+        "Start with a question in the first line (≤100 chars).",
+        "Use 2–3 niche hashtags, avoid generic tags.",
+    ]
+    img = {"style":"clean minimal","framing":"close-up","lighting":"soft daylight","background":"plain","textOverlay":"none"}
+    if category == "meal":
+        img = {"style":"warm food photography","framing":"top-down","lighting":"warm indoor","background":"wooden","textOverlay":"none"}
+    elif category == "fitness":
+        img = {"style":"high contrast","framing":"mid-shot","lighting":"gym ambient","background":"plain","textOverlay":"none"}
+    elif category == "finance":
+        img = {"style":"clean infographic","framing":"close-up","lighting":"neutral","background":"brand color","textOverlay":"short CTA"}
+
+    if comment_rate < 0.003:
+        recs.append("End with a direct question to drive comments.")
+    if like_rate < 0.015:
+        recs.append("Test a bolder thumbnail/cover (higher contrast).")
+
+    return {
+        "insights": insights[:3],
+        "recommendations": recs[:5],
+        "nextDraftConfig": {
+            "caption": payload.get("caption")[:100] if payload.get("caption") else "Ask a question to spark comments.",
+            "hashtags": (payload.get("hashtags") or [])[:3],
+            "image": img,
+        },
+    }
+
+
+async def generate_agent_critique(payload: Dict[str, Any]) -> Dict[str, Any]:
     """
     Valódi LLM-hívás (OpenAI /chat/completions) JSON-kimenettel.
     Visszaad: { insights[], recommendations[], nextDraftConfig{ caption?, hashtags[], image{...} } }
     """
     # ha nincs kulcs, marad a jelenlegi fallback-ágad
     if not settings.OPENAI_API_KEY:
-        kpis = payload.get("kpis") or {}
-        like_rate = kpis.get("likeRate", 0.0)
-        comment_rate = kpis.get("commentRate", 0.0)
-        category = (payload.get("category") or "lifestyle").lower()
-
-        insights = [
-            "Reach vs likes suggests the hook may be weak.",
-            "Caption opening likely not inviting comments.",
-        ]
-        recs = [
-            "Start with a question in the first line (≤100 chars).",
-            "Use 2–3 niche hashtags, avoid generic tags.",
-        ]
-        img = {"style":"clean minimal","framing":"close-up","lighting":"soft daylight","background":"plain","textOverlay":"none"}
-        if category == "meal":
-            img = {"style":"warm food photography","framing":"top-down","lighting":"warm indoor","background":"wooden","textOverlay":"none"}
-        elif category == "fitness":
-            img = {"style":"high contrast","framing":"mid-shot","lighting":"gym ambient","background":"plain","textOverlay":"none"}
-        elif category == "finance":
-            img = {"style":"clean infographic","framing":"close-up","lighting":"neutral","background":"brand color","textOverlay":"short CTA"}
-
-        if comment_rate < 0.003:
-            recs.append("End with a direct question to drive comments.")
-        if like_rate < 0.015:
-            recs.append("Test a bolder thumbnail/cover (higher contrast).")
-
-        return {
-            "insights": insights[:3],
-            "recommendations": recs[:5],
-            "nextDraftConfig": {
-                "caption": payload.get("caption")[:100] if payload.get("caption") else "Ask a question to spark comments.",
-                "hashtags": (payload.get("hashtags") or [])[:3],
-                "image": img,
-            },
-        }
+        return _fallback_critique(payload)
 
     # --- valódi LLM hívás ---
+    body = _critique_body(payload)
+    try:
+        r = await openai_api.post(
+            CHAT_URL, upstream="chat", model=body["model"], tokens=openai_api.estimate_tokens(body),
+            timeout=60, headers=_headers(), json=body,
+        )
+    except CircuitOpenError:
+        return _fallback_critique(payload)
+    r.raise_for_status()
+    data = r.json()
+    raw = data["choices"][0]["message"]["content"].strip()
+    return _normalize_critique(json.loads(raw))
+
+
+async def stream_agent_critique(payload: Dict[str, Any]) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Streaming kritika: {"event": "insight" | "recommendation", "value"} elemenként, ahogy
+    megérkeznek, végül {"event": "done", "critique"} a normalizált teljes válasszal.
+    """
+    if not settings.OPENAI_API_KEY or not settings.OPENAI_STREAMING:
+        yield {"event": "done", "critique": await generate_agent_critique(payload)}
+        return
+
+    body = _critique_body(payload)
+    body["stream"] = True
+    body["stream_options"] = {"include_usage": True}
+    parser = JsonStream()
+    try:
+        async for piece in openai_api.stream(
+            CHAT_URL, upstream="chat", model=body["model"], tokens=openai_api.estimate_tokens(body),
+            timeout=60, headers=_headers(), json=body,
+        ):
+            for kind, path, value in parser.feed(piece):
+                if kind != "value" or len(path) != 2:
+                    continue
+                if path[0] == "insights" and path[1] < 4:
+                    yield {"event": "insight", "value": str(value)[:120]}
+                elif path[0] == "recommendations" and path[1] < 5:
+                    yield {"event": "recommendation", "value": str(value)[:140]}
+    except CircuitOpenError:
+        yield {"event": "done", "critique": _fallback_critique(payload)}
+        return
+
+    yield {"event": "done", "critique": _normalize_critique(json.loads(parser.text))}
+
+
+def _critique_body(payload: Dict[str, Any]) -> Dict[str, Any]:
     system_prompt = (
         "You are an Instagram content optimization assistant. "
         "Return ONLY valid JSON. No markdown, no explanations."
@@ -189,11 +309,7 @@ Return JSON with:
 Only JSON output.
 """.strip()
 
-    headers = {
-        "Authorization": f"Bearer {settings.OPENAI_API_KEY}",
-        "Content-Type": "application/json",
-    }
-    body = {
+    return {
         "model": getattr(settings, "OPENAI_TEXT_MODEL", "gpt-4o-mini"),
         "messages": [
             {"role": "system", "content": system_prompt},
@@ -204,14 +320,9 @@ Only JSON output.
         "response_format": {"type": "json_object"},
     }
 
-    with httpx.Client(timeout=60) as client:
-        r = client.post("https://api.openai.com/v1/chat/completions", headers=headers, json=body)
-        r.raise_for_status()
-        data = r.json()
-        raw = data["choices"][0]["message"]["content"].strip()
 
+def _normalize_critique(obj: Dict[str, Any]) -> Dict[str, Any]:
     # JSON normalizálás + hiányok pótlása (hogy a frontend mindig kapjon képet is)
-    obj = json.loads(raw)
     insights = [str(x)[:120] for x in obj.get("insights", [])][:4]
     recs = [str(x)[:140] for x in obj.get("recommendations", [])][:5]
     cfg = obj.get("nextDraftConfig") or {}
@@ -0,0 +1,91 @@
+# backend/app/services/breaker.py
+# Circuit breaker per upstream (OpenAI chat / images): fail fast during outages.
+from __future__ import annotations
+import threading, time
+from typing import Dict
+
+from app.core.settings import settings
+
+
+class CircuitOpenError(Exception):
+    def __init__(self, name: str, retry_in: float):
+        super().__init__(f"{name} upstream circuit is open")
+        self.name = name
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    """
+    closed → open after N consecutive failures (errors or calls slower than the SLO);
+    open → half_open after the cooldown, where a single probe decides whether to close again.
+    """
+
+    def __init__(self, name: str, *, threshold: int, cooldown: float, latency_slo: float):
+        self.name = name
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.latency_slo = latency_slo
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probing = False
+        self.last_error: str | None = None
+        self._lock = threading.Lock()
+
+    def before_call(self) -> None:
+        with self._lock:
+            if self.state == "closed":
+                return
+            wait = self.opened_at + self.cooldown - time.monotonic()
+            if self.state == "open" and wait <= 0:
+                self.state = "half_open"
+            if self.state == "half_open" and not self.probing:
+                self.probing = True
+                return
+            raise CircuitOpenError(self.name, max(wait, 1.0))
+
+    def record(self, ok: bool, elapsed: float, error: str | None = None) -> None:
+        if ok and elapsed > self.latency_slo:
+            ok, error = False, f"slow response ({elapsed:.1f}s > {self.latency_slo:.0f}s SLO)"
+        with self._lock:
+            self.probing = False
+            if ok:
+                self.state, self.failures = "closed", 0
+                return
+            self.failures += 1
+            self.last_error = error
+            if self.state == "half_open" or self.failures >= self.threshold:
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+    def release(self) -> None:
+        """The caller gave up (cancelled / deadline): no verdict, the next call may probe."""
+        with self._lock:
+            self.probing = False
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            out = {"state": self.state, "failures": self.failures, "lastError": self.last_error}
+            if self.state != "closed":
+                out["retryIn"] = round(max(0.0, self.opened_at + self.cooldown - time.monotonic()), 1)
+            return out
+
+
+breakers: Dict[str, CircuitBreaker] = {
+    "chat": CircuitBreaker(
+        "chat",
+        threshold=settings.BREAKER_FAILURE_THRESHOLD,
+        cooldown=settings.BREAKER_COOLDOWN_SECONDS,
+        latency_slo=settings.CHAT_LATENCY_SLO_SECONDS,
+    ),
+    "images": CircuitBreaker(
+        "images",
+        threshold=settings.BREAKER_FAILURE_THRESHOLD,
+        cooldown=settings.BREAKER_COOLDOWN_SECONDS,
+        latency_slo=settings.IMAGE_LATENCY_SLO_SECONDS,
+    ),
+}
+
+
+def status() -> dict:
+    return {name: b.snapshot() for name, b in breakers.items()}
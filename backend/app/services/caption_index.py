@@ -0,0 +1,202 @@
+# backend/app/services/caption_index.py
+# Local near-duplicate index over already generated captions (no network):
+# hashed character trigram sets per topic, inverted index per style hint,
+# cosine similarity on the binary vectors.
+from __future__ import annotations
+import math, re, threading, time, zlib
+from collections import defaultdict
+from typing import Dict, List, Set
+
+from app.core import versions
+from app.core.db import db
+from app.core.settings import settings
+from app.services.ai_text import DEFAULT_STYLE_HINT
+
+_NON_WORD = re.compile(r"[^0-9a-z]+")
+_BUCKETS = (1 << 20) - 1
+_CATEGORY_WEIGHT = 0.15   # same category adds this much on top of the topic similarity
+# offline / error-path captions (ai_text._fallback_caption, the create / regen fallbacks in
+# routes/drafts.py): never worth reusing for another topic
+_FALLBACK_CAPTIONS = {"quick tip inside."}
+_FALLBACK_SUFFIXES = (" — quick tip inside.", " — save it!")
+
+
+def _norm(text: str | None) -> str:
+    return " ".join(_NON_WORD.sub(" ", (text or "").lower()).split())
+
+
+def _grams(topic: str) -> Set[int]:
+    """Hashed char-trigrams of the normalized topic ('leg-day' == 'leg day')."""
+    t = f" {_norm(topic)} "
+    return {zlib.crc32(t[i:i + 3].encode()) & _BUCKETS for i in range(len(t) - 2)}
+
+
+def _style(style_hint: str | None) -> str:
+    return _norm(style_hint or DEFAULT_STYLE_HINT)
+
+
+def _is_fallback(caption: str | None) -> bool:
+    c = (caption or "").strip().lower()
+    return c in _FALLBACK_CAPTIONS or c.endswith(_FALLBACK_SUFFIXES)
+
+
+class _Entry:
+    __slots__ = ("draft_id", "title", "category", "style", "grams", "caption", "hashtags")
+
+    def __init__(self, doc: dict):
+        self.draft_id = str(doc["_id"])
+        self.title = doc.get("title") or ""
+        # the category the draft was requested with (lookups compare against that), not the
+        # inferred one stored in "category"
+        self.category = doc.get("requestedCategory") or doc.get("category") or "lifestyle"
+        self.style = _style(doc.get("customText"))
+        self.grams = _grams(self.title)
+        self.caption = doc.get("caption") or ""
+        self.hashtags = list(doc.get("hashtags") or [])
+
+
+class CaptionIndex:
+    """
+    In-process index, built from db.drafts and then kept current by upsert()/remove() from
+    the draft write paths (per worker). Other workers' writes show up in the drafts version
+    counter: when it moved by more than this worker's own bumps, the index is rebuilt. Loads and rebuilds run in a background
+    thread and are swapped in; lookups never wait for them (no hits until the first load).
+    """
+
+    def __init__(self) -> None:
+        self._entries: Dict[str, _Entry] = {}
+        self._postings: Dict[str, Dict[int, Set[str]]] = defaultdict(lambda: defaultdict(set))
+        self._loaded = False
+        self._lock = threading.Lock()
+        self._base: versions.Baseline | None = None
+        self._checked_at = 0.0
+        self._building = False
+
+    def _scan(self) -> None:
+        proj = {"title": 1, "category": 1, "requestedCategory": 1, "customText": 1, "caption": 1, "hashtags": 1}
+        for doc in db.drafts.find({}, proj):
+            self._add(doc)
+
+    def load(self) -> None:
+        """(Re)build from Mongo outside the lock and swap it in (blocking)."""
+        # version read BEFORE the scan: a write during it shows up as a change next time
+        base = versions.baseline("drafts")
+        fresh = CaptionIndex()
+        fresh._scan()
+        with self._lock:
+            self._entries, self._postings = fresh._entries, fresh._postings
+            self._base, self._checked_at, self._loaded = base, time.monotonic(), True
+
+    def _load_in_background(self) -> None:
+        if self._building:
+            return
+        self._building = True
+
+        def run() -> None:
+            try:
+                self.load()
+            except Exception as e:
+                print("caption_index load failed:", e)
+            finally:
+                self._building = False
+
+        threading.Thread(target=run, name="caption-index-load", daemon=True).start()
+
+    def warm(self) -> None:
+        """Start the first load in the background (startup warmup)."""
+        self._sync()
+
+    def _sync(self) -> bool:
+        """Loaded? Starts the first load / a rebuild (other workers' writes) when needed."""
+        if not self._loaded:
+            self._load_in_background()
+            return False
+        now = time.monotonic()
+        if not self._building and now - self._checked_at >= settings.INDEX_VERSION_CHECK_SECONDS:
+            self._checked_at = now
+            changed, base = versions.changed_elsewhere(self._base)
+            if changed:
+                self._load_in_background()
+            else:
+                self._base = base   # only our own (already applied) writes
+        return True
+
+    def _add(self, doc: dict) -> None:
+        if not (doc.get("title") and doc.get("caption") and doc.get("hashtags")):
+            return
+        if _is_fallback(doc["caption"]):
+            return
+        e = _Entry(doc)
+        self._entries[e.draft_id] = e
+        postings = self._postings[e.style]
+        for g in e.grams:
+            postings[g].add(e.draft_id)
+
+    def _drop(self, draft_id: str) -> None:
+        e = self._entries.pop(draft_id, None)
+        if e is None:
+            return
+        postings = self._postings[e.style]
+        for g in e.grams:
+            ids = postings.get(g)
+            if ids:
+                ids.discard(draft_id)
+                if not ids:
+                    del postings[g]
+
+    def upsert(self, doc: dict) -> None:
+        """Call after every draft insert/update (doc must carry _id)."""
+        with self._lock:
+            if not self._loaded:
+                return  # the load in progress (or the first lookup) picks it up
+            self._drop(str(doc["_id"]))
+            self._add(doc)
+
+    def remove(self, draft_id: str) -> None:
+        with self._lock:
+            self._drop(draft_id)
+
+    def lookup(
+        self,
+        topic: str,
+        category: str,
+        style_hint: str | None = None,
+        *,
+        threshold: float | None = None,
+        limit: int = 3,
+    ) -> List[dict]:
+        """Most similar earlier captions for this topic/category/style, best first."""
+        threshold = settings.CAPTION_REUSE_THRESHOLD if threshold is None else threshold
+        grams = _grams(topic)
+        if not grams:
+            return []
+        if not self._sync():
+            return []
+        with self._lock:
+            postings = self._postings.get(_style(style_hint)) or {}
+            overlap: Dict[str, int] = defaultdict(int)
+            for g in grams:
+                for draft_id in postings.get(g, ()):
+                    overlap[draft_id] += 1
+            hits = []
+            for draft_id, n in overlap.items():
+                e = self._entries[draft_id]
+                sim = n / math.sqrt(len(grams) * len(e.grams))
+                score = (1 - _CATEGORY_WEIGHT) * sim + (_CATEGORY_WEIGHT if e.category == category else 0.0)
+                if score >= threshold:
+                    hits.append((score, e))
+        hits.sort(key=lambda h: h[0], reverse=True)
+        return [
+            {
+                "draftId": e.draft_id,
+                "title": e.title,
+                "category": e.category,
+                "caption": e.caption,
+                "hashtags": list(e.hashtags),
+                "score": round(score, 3),
+            }
+            for score, e in hits[:limit]
+        ]
+
+
+caption_index = CaptionIndex()
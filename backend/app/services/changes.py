@@ -0,0 +1,227 @@
+# backend/app/services/changes.py
+# Élő változás-események (drafts / feed_posts / personas) workerenként EGY forrásból,
+# sok kliensnek szétosztva:
+#   - Mongo change stream (replica set kell; lokálisan egy node-os rs is jó),
+#   - különben a core.versions számlálók pollozása ("invalidate" események).
+# Minden esemény egyszer lesz JSON-ná alakítva, és ugyanaz a string megy minden
+# SSE / WebSocket kliensnek. A token alapján a kliens újracsatlakozáskor folytathatja.
+from __future__ import annotations
+import asyncio, itertools, threading, uuid
+from collections import deque
+from typing import AsyncIterator, Dict, Iterable, List, Set
+
+from pymongo.errors import OperationFailure, PyMongoError
+
+from app.core import versions
+from app.core.db import db
+from app.core.serialization import dumps
+from app.core.settings import settings
+
+COLLECTIONS = ("drafts", "feed_posts", "personas")
+_NO_CHANGE_STREAMS = {40573, 40324}   # standalone mongod: nincs $changeStream
+_OPS = ["insert", "update", "replace", "delete"]
+
+
+class Event:
+    __slots__ = ("seq", "name", "coll", "token", "json")
+
+    def __init__(self, seq: int, ev: dict):
+        self.seq = seq
+        self.name = ev["event"]
+        self.coll = ev.get("coll")
+        self.token = ev.get("token")
+        self.json = dumps(ev).decode()   # egyszer kódoljuk, minden kliens ezt kapja
+
+
+class _Subscriber:
+    __slots__ = ("queue", "colls")
+
+    def __init__(self, colls: Set[str]):
+        self.queue: asyncio.Queue = asyncio.Queue(settings.CHANGES_CLIENT_QUEUE)
+        self.colls = colls
+
+
+class ChangeHub:
+    def __init__(self) -> None:
+        self.mode = "off"                     # "changestream" | "polling" | "off"
+        self._subs: Set[_Subscriber] = set()
+        self._buffer: deque = deque()         # legutóbbi események (resume-hoz)
+        self._by_token: Dict[str, int] = {}   # token → seq
+        self._seq = 0
+        self._boot = uuid.uuid4().hex[:8]
+        self._poll_ids = itertools.count(1)
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    # ---- életciklus (lifespan) ----
+    def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="change-hub", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    @property
+    def clients(self) -> int:
+        return len(self._subs)
+
+    @property
+    def latest_token(self) -> str | None:
+        return self._buffer[-1].token if self._buffer else None
+
+    # ---- forrás oldal (háttérszál) ----
+    @staticmethod
+    def _pipeline(colls: Iterable[str] = COLLECTIONS) -> List[dict]:
+        return [{"$match": {"ns.coll": {"$in": list(colls)}, "operationType": {"$in": _OPS}}}]
+
+    @staticmethod
+    def _to_event(change: dict) -> dict:
+        op = change["operationType"]
+        ev = {
+            "event": "change",
+            "coll": change["ns"]["coll"],
+            "op": op,
+            "id": str(change["documentKey"]["_id"]),
+            "token": change["_id"]["_data"],
+        }
+        doc = change.get("fullDocument")
+        if doc:
+            doc = dict(doc)
+            doc["id"] = str(doc.pop("_id"))
+            ev["doc"] = doc
+        if op == "update":
+            desc = change.get("updateDescription") or {}
+            ev["updatedFields"] = list((desc.get("updatedFields") or {}).keys())
+            ev["removedFields"] = list(desc.get("removedFields") or [])
+        return ev
+
+    def _emit(self, ev: dict) -> None:
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._publish, ev)
+
+    def _run(self) -> None:
+        token = None
+        delay = 1.0
+        while not self._stop.is_set():
+            try:
+                with db.watch(
+                    self._pipeline(), full_document="updateLookup",
+                    resume_after=token, max_await_time_ms=1000,
+                ) as stream:
+                    self.mode, delay = "changestream", 1.0
+                    while not self._stop.is_set() and stream.alive:
+                        change = stream.try_next()
+                        if change is not None:
+                            token = stream.resume_token
+                            self._emit(self._to_event(change))
+            except OperationFailure as e:
+                if e.code in _NO_CHANGE_STREAMS:
+                    self._poll()
+                    return
+                print("changes: change stream error:", e)
+            except PyMongoError as e:
+                print("changes: change stream error:", e)
+            self._stop.wait(delay)
+            delay = min(delay * 2, 30.0)
+
+    def _poll(self) -> None:
+        """Fallback: a verziószámlálók figyelése; kollekciónként durva "invalidate" esemény."""
+        self.mode = "polling"
+        last = None
+        while not self._stop.wait(settings.CHANGES_POLL_SECONDS):
+            try:
+                now = versions.current(*COLLECTIONS)
+            except PyMongoError:
+                continue
+            for coll in COLLECTIONS:
+                if last is not None and now[coll] != last[coll]:
+                    self._emit({
+                        "event": "invalidate", "coll": coll, "version": now[coll],
+                        "token": f"p.{self._boot}.{next(self._poll_ids)}",
+                    })
+            last = now
+
+    # ---- szétosztás (event loop) ----
+    def _publish(self, ev: dict) -> None:
+        self._seq += 1
+        event = Event(self._seq, ev)
+        if len(self._buffer) >= settings.CHANGES_BUFFER:
+            self._by_token.pop(self._buffer.popleft().token, None)
+        self._buffer.append(event)
+        self._by_token[event.token] = event.seq
+        for sub in self._subs:
+            if event.coll in sub.colls:
+                self._offer(sub, event)
+
+    def _reset_event(self, reason: str) -> Event:
+        # a legfrissebb tokennel: a teljes újratöltés után innen lehet folytatni
+        return Event(self._seq, {"event": "reset", "reason": reason, "token": self.latest_token})
+
+    def _offer(self, sub: _Subscriber, event: Event) -> None:
+        try:
+            sub.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # lassú kliens: a backlogot eldobjuk, ő egyszer újratölt és megy tovább
+            while not sub.queue.empty():
+                sub.queue.get_nowait()
+            sub.queue.put_nowait(self._reset_event("lagging"))
+
+    def _replay_from_buffer(self, since: str, colls: Set[str]) -> List[Event] | None:
+        seq = self._by_token.get(since)
+        if seq is None:
+            return None
+        start = seq - self._buffer[0].seq + 1
+        return [e for e in itertools.islice(self._buffer, start, None) if e.coll in colls]
+
+    def _replay_from_mongo(self, since: str, colls: Set[str]) -> List[Event] | None:
+        """Másik worker tokenje: a change streamet onnan olvassuk vissza (max CHANGES_BUFFER)."""
+        out: List[Event] = []
+        try:
+            with db.watch(
+                self._pipeline(colls), full_document="updateLookup",
+                resume_after={"_data": since}, max_await_time_ms=50,
+            ) as stream:
+                while len(out) < settings.CHANGES_BUFFER:
+                    change = stream.try_next()
+                    if change is None:
+                        return out
+                    out.append(Event(0, self._to_event(change)))
+        except PyMongoError:
+            return None
+        return None   # túl régi / túl sok: inkább teljes újratöltés
+
+    async def subscribe(
+        self, colls: Set[str], since: str | None = None, *, heartbeat: float = 15.0
+    ) -> AsyncIterator[Event | None]:
+        """Események a kliensnek; None = heartbeat (nincs esemény `heartbeat` mp óta)."""
+        sub = _Subscriber(colls)
+        self._subs.add(sub)
+        try:
+            replayed: Set[str] = set()
+            if since:
+                # a feliratkozás és a pufferes visszajátszás között nincs await → nincs rés / duplikátum
+                events = self._replay_from_buffer(since, colls)
+                if events is None and self.mode == "changestream" and not since.startswith("p."):
+                    events = await asyncio.to_thread(self._replay_from_mongo, since, colls)
+                    replayed = {e.token for e in events or ()}
+                if events is None:
+                    yield self._reset_event("unknown token")
+                for e in events or ():
+                    yield e
+            while True:
+                try:
+                    event = await asyncio.wait_for(sub.queue.get(), heartbeat)
+                except asyncio.TimeoutError:
+                    yield None
+                    continue
+                if event.token in replayed:
+                    continue
+                yield event
+        finally:
+            self._subs.discard(sub)
+
+
+hub = ChangeHub()
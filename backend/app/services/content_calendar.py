@@ -0,0 +1,278 @@
+# backend/app/services/content_calendar.py
+# Csúcsidőn kívüli tartalomnaptár: personánként a (cache-elt) trend-kulcsszavakból
+# előre legyártott draft-jelöltek (caption + hashtagek + kép) az idea_queue kollekcióba.
+# A GET /api/ideas ezekből szolgál ki, a POST /api/drafts ideaId-vel LLM / kép nélkül veszi át.
+# Futtatás: a lifespan ütemezője (CALENDAR_ENABLED, CALENDAR_HOUR), POST /api/ideas/generate
+# (admin, háttérben), vagy cronból:
+#   python -m app.services.content_calendar --per-persona 5
+from __future__ import annotations
+import argparse, asyncio, os, socket, time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List
+
+from bson import ObjectId
+from fastapi import HTTPException
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from app.core import versions
+from app.core.db import db
+from app.core.settings import settings
+from app.services.ai_image import (
+    build_image_prompt_from_persona,
+    generate_openai_img2img,
+    generate_placeholder_img,
+)
+from app.services.ai_text import DEFAULT_STYLE_HINT, gen_caption_and_tags, guess_category
+from app.services.breaker import CircuitOpenError
+from app.services.caption_index import caption_index
+from app.services.persona_cache import resolve_init_path
+from app.services.trends import get_trends
+
+_LOCK_ID = "calendar"
+
+
+# ---- lease lock: több worker / cron közül egyszerre csak egy generál ----
+def _acquire(owner: str, lease: float) -> bool:
+    now = datetime.now(timezone.utc)
+    try:
+        db.locks.find_one_and_update(
+            {"_id": _LOCK_ID, "until": {"$lt": now}},
+            {"$set": {"owner": owner, "until": now + timedelta(seconds=lease)}},
+            upsert=True,   # nincs még dokumentum → létrejön; él a lease → DuplicateKeyError
+            return_document=ReturnDocument.AFTER,
+        )
+        return True
+    except DuplicateKeyError:
+        return False
+
+
+def _renew(owner: str, lease: float) -> bool:
+    """A lease meghosszabbítása; False, ha közben elvesztettük (lejárt és más vette át)."""
+    until = datetime.now(timezone.utc) + timedelta(seconds=lease)
+    return bool(db.locks.update_one({"_id": _LOCK_ID, "owner": owner}, {"$set": {"until": until}}).matched_count)
+
+
+async def _heartbeat(owner: str, lease: float) -> None:
+    """Amíg a batch fut, lease/3-onként megújítja a lockot (hosszú batch se fusson kétszer)."""
+    while True:
+        await asyncio.sleep(lease / 3)
+        try:
+            if not await asyncio.to_thread(_renew, owner, lease):
+                print("calendar: lease lost to another owner")
+                return
+        except Exception as e:   # átmeneti Mongo hiba: a következő ütem újrapróbálja
+            print("calendar: lease renew failed:", e)
+
+
+def _release(owner: str) -> None:
+    db.locks.update_one({"_id": _LOCK_ID, "owner": owner}, {"$set": {"until": datetime.now(timezone.utc)}})
+
+
+# ---- egy jelölt legyártása ----
+async def _image(persona: dict, title: str, hashtags: List[str]) -> tuple[str | None, str | None]:
+    """(previewUrl, imageStatus). Upstream hiba esetén a portréból placeholder, ahogy a POST /drafts-nál."""
+    init_path = resolve_init_path(persona)
+    if not init_path:
+        return None, "missing"
+    positive, _ = build_image_prompt_from_persona(persona, topic=title, trend_tags=hashtags)
+    try:
+        _, url = await generate_openai_img2img(
+            init_image_path=init_path, prompt=positive, size="1024x1024", pad_to_portrait=True,
+            persona_id=str(persona["_id"]),
+        )
+        return url, None
+    except (CircuitOpenError, HTTPException) as e:
+        if isinstance(e, HTTPException) and e.status_code == 400:
+            return None, "missing"   # a portré fájl nincs meg
+        _, url = await asyncio.to_thread(generate_placeholder_img, init_path, persona_id=str(persona["_id"]))
+        return url, "placeholder"
+
+
+# kiadható jelölt: kész ÉS van képe (a kép nélküli régi jelöltek se a listában, se a
+# tervezésben nem számítanak, és a claim sem adja ki őket)
+_READY = {"status": "ready", "previewUrl": {"$nin": [None, ""]}}
+
+
+async def _candidate(persona: dict, keyword: str, geo: str, batch_id: str) -> dict:
+    category = guess_category(keyword)
+    style = DEFAULT_STYLE_HINT   # a persona "style" mezője vizuális stílus, nem caption hangnem
+    hits = await asyncio.to_thread(caption_index.lookup, keyword, category, style, limit=1)
+    if hits:
+        caption, hashtags, reused = hits[0]["caption"], list(hits[0]["hashtags"]), hits[0]["draftId"]
+    else:
+        caption, hashtags = await gen_caption_and_tags(topic=keyword, category=category, custom_text=style)
+        reused = None
+    if "ai_generated" not in [h.lower() for h in hashtags]:
+        hashtags.append("ai_generated")
+    url, image_status = await _image(persona, keyword, hashtags)
+    return {
+        "title": keyword,
+        "category": category,
+        "personaId": str(persona["_id"]),
+        "caption": caption,
+        "hashtags": hashtags,
+        "customText": style,
+        "previewUrl": url,
+        "imageStatus": image_status,
+        "reusedFrom": reused,
+        "geo": geo,
+        "batchId": batch_id,
+        "status": "ready",
+        "createdAt": datetime.now(timezone.utc),
+    }
+
+
+def _plan(personas: List[dict], keywords: List[str], per_persona: int) -> List[tuple]:
+    """(persona, keyword) párok: personánként más-más kulcsszavak, a már sorban állók kihagyva."""
+    queued: Dict[str, set] = {}
+    for d in db.idea_queue.find(_READY, {"personaId": 1, "title": 1}):
+        queued.setdefault(d.get("personaId"), set()).add((d.get("title") or "").lower())
+    plan = []
+    for i, p in enumerate(personas):
+        pid = str(p["_id"])
+        have = queued.get(pid, set())
+        free = max(per_persona - len(have), 0)
+        # eltolás personánként, hogy ne ugyanazt a top kulcsszót kapja mindenki
+        rotated = keywords[i % len(keywords):] + keywords[: i % len(keywords)] if keywords else []
+        for kw in rotated:
+            if free <= 0:
+                break
+            if kw.lower() in have:
+                continue
+            plan.append((p, kw))
+            have.add(kw.lower())
+            free -= 1
+    return plan
+
+
+async def generate_batch(
+    *,
+    per_persona: int | None = None,
+    concurrency: int | None = None,
+    geo: str | None = None,
+    window: str | None = None,
+) -> dict:
+    """
+    Egy teljes kör: minden personához feltölti a sort per_persona jelöltre, legfeljebb
+    `concurrency` párhuzamos generálással. Ha más már fut (lease él), {"skipped": True}.
+    """
+    per_persona = per_persona or settings.CALENDAR_PER_PERSONA
+    sem = asyncio.Semaphore(concurrency or settings.CALENDAR_CONCURRENCY)
+    geo = geo or settings.TRENDS_GEO
+    window = window or settings.TRENDS_WINDOW
+    owner = f"{socket.gethostname()}:{os.getpid()}"
+    if not await asyncio.to_thread(_acquire, owner, settings.CALENDAR_LEASE_SECONDS):
+        return {"skipped": True, "reason": "another batch is running"}
+
+    started = time.perf_counter()
+    batch_id = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S")
+    heartbeat = asyncio.create_task(_heartbeat(owner, settings.CALENDAR_LEASE_SECONDS))
+    try:
+        trends = await asyncio.to_thread(get_trends, geo, window)   # 24h cache, általában nincs hálózat
+        keywords = [k for k in trends.get("keywords") or [] if k.strip()]
+        personas = await asyncio.to_thread(lambda: list(db.personas.find()))
+        plan = await asyncio.to_thread(_plan, personas, keywords, per_persona)
+
+        async def one(persona: dict, kw: str) -> dict:
+            async with sem:
+                return await _candidate(persona, kw, geo, batch_id)
+
+        outcomes = await asyncio.gather(*(one(p, kw) for p, kw in plan), return_exceptions=True)
+        # kép nélküli jelölt (nincs portré) nem kerül a sorba: a claim úgysem adná ki
+        docs = [o for o in outcomes if isinstance(o, dict) and o.get("previewUrl")]
+        no_image = sum(1 for o in outcomes if isinstance(o, dict) and not o.get("previewUrl"))
+        errors = [f"{kw}: {type(o).__name__}: {o}"[:300] for (_, kw), o in zip(plan, outcomes) if isinstance(o, Exception)]
+        if docs:
+            await asyncio.to_thread(db.idea_queue.insert_many, docs, ordered=False)
+            await asyncio.to_thread(versions.bump, "idea_queue")
+    finally:
+        heartbeat.cancel()
+        await asyncio.to_thread(_release, owner)
+
+    return {
+        "batchId": batch_id,
+        "geo": geo,
+        "personas": len(personas),
+        "generated": len(docs),
+        "skippedNoImage": no_image,
+        "errors": errors,
+        "seconds": round(time.perf_counter() - started, 1),
+    }
+
+
+# ---- ütemező (lifespan) ----
+def _seconds_until(hour: int) -> float:
+    now = datetime.now()
+    nxt = now.replace(hour=hour, minute=0, second=0, microsecond=0)
+    if nxt <= now:
+        nxt += timedelta(days=1)
+    return (nxt - now).total_seconds()
+
+
+async def run_logged(**kwargs) -> None:
+    """generate_batch háttérben (ütemező / kézi indítás): az eredmény és a hiba csak a logba megy."""
+    try:
+        print("calendar:", await generate_batch(**kwargs))
+    except Exception as e:
+        print("calendar: batch failed:", e)
+
+
+async def run_scheduler() -> None:
+    """Naponta egyszer CALENDAR_HOUR-kor (szerver helyi idő); a lease miatt workerenként is biztonságos."""
+    while True:
+        await asyncio.sleep(_seconds_until(settings.CALENDAR_HOUR))
+        await run_logged()
+
+
+# ---- sor olvasása / átvétele ----
+def list_queued(persona_id: str | None = None, limit: int = 50) -> List[dict]:
+    q: dict = dict(_READY)
+    if persona_id:
+        q["personaId"] = persona_id
+    return list(db.idea_queue.find(q).sort("createdAt", -1).limit(limit))
+
+
+def claim(idea_id: str, persona_id: str) -> dict | None:
+    """
+    Atomikusan lefoglal egy kész jelöltet (ugyanaz az ötlet nem lesz két draft). Kép nélküli
+    (régi) jelöltet nem ad ki: None → a POST /drafts rendesen generál.
+    """
+    try:
+        oid = ObjectId(idea_id)
+    except Exception:
+        return None
+    doc = db.idea_queue.find_one_and_update(
+        {"_id": oid, **_READY, "personaId": persona_id},
+        {"$set": {"status": "used", "usedAt": datetime.now(timezone.utc)}},
+        return_document=ReturnDocument.AFTER,
+    )
+    if doc:
+        versions.bump("idea_queue")
+    return doc
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Pre-generate the idea queue (off-peak batch).")
+    ap.add_argument("--per-persona", type=int, default=settings.CALENDAR_PER_PERSONA)
+    ap.add_argument("--concurrency", type=int, default=settings.CALENDAR_CONCURRENCY)
+    ap.add_argument("--geo", default=settings.TRENDS_GEO)
+    ap.add_argument("--window", default=settings.TRENDS_WINDOW)
+    args = ap.parse_args()
+
+    async def run() -> dict:
+        from app.services import openai_api
+
+        openai_api.open_http(settings.HTTP_POOL_TOTAL)
+        try:
+            return await generate_batch(
+                per_persona=args.per_persona, concurrency=args.concurrency, geo=args.geo, window=args.window,
+            )
+        finally:
+            await openai_api.close_http()
+
+    print(asyncio.run(run()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+# backend/app/services/critique.py
+# Async critique engine: egy vagy sok feed poszt kritikája, korlátozott párhuzamossággal.
+from __future__ import annotations
+import asyncio
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Tuple
+
+from pymongo import UpdateOne
+
+from app.core import versions
+from app.core.db import db
+from app.core.settings import settings
+from app.services.ai_text import generate_agent_critique, stream_agent_critique
+from app.services.kpi import post_kpis
+
+
+def _payload(post: dict) -> Dict[str, Any]:
+    return {
+        "title": post.get("title") or "",
+        "caption": post.get("caption") or "",
+        "hashtags": post.get("hashtags") or [],
+        "category": post.get("category") or "lifestyle",
+        "personaId": post.get("personaId") or "",
+        "kpis": post_kpis(post.get("metrics") or {}),
+    }
+
+
+def _record(k: Dict[str, Any], agent: Dict[str, Any]) -> Dict[str, Any]:
+    # kiegészítjük fix mezőkkel
+    return {
+        "score": k["score"],
+        "kpis": {"likeRate": k["likeRate"], "commentRate": k["commentRate"], "engagementRate": k["engagementRate"]},
+        "insights": agent.get("insights", []),
+        "recommendations": agent.get("recommendations", []),
+        "nextDraftConfig": agent.get("nextDraftConfig", {}),
+        "version": "v2",
+        "createdAt": datetime.utcnow().isoformat(),
+    }
+
+
+def _save(ops: List[UpdateOne]) -> None:
+    """Agent rekordok mentése (szinkron pymongo: az async hívók to_thread-del futtatják)."""
+    db.feed_posts.bulk_write(ops, ordered=False)
+    versions.bump("feed_posts")
+
+
+async def critique(post: dict) -> Dict[str, Any]:
+    """Feed post → agent record (KPI-k + LLM insights/recommendations). Nem ment."""
+    payload = _payload(post)
+    # LLM-ből strukturált válasz (nem if-else)
+    agent = await generate_agent_critique(payload)
+    return _record(payload["kpis"], agent)
+
+
+async def critique_stream(post: dict) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Mint critique(), de az insight/recommendation eseményeket azonnal továbbadja;
+    a végén menti az agent rekordot és {"event": "done", "record"}-ot ad.
+    """
+    payload = _payload(post)
+    async for ev in stream_agent_critique(payload):
+        if ev["event"] != "done":
+            yield ev
+            continue
+        record = _record(payload["kpis"], ev["critique"])
+        await asyncio.to_thread(_save, [UpdateOne({"_id": post["_id"]}, {"$set": {"agent": record}})])
+        yield {"event": "done", "record": record}
+
+
+async def critique_many(
+    posts: List[dict], concurrency: int | None = None
+) -> Tuple[Dict[str, Dict[str, Any]], Dict[str, str]]:
+    """
+    Sok poszt kritikája egyszerre, legfeljebb `concurrency` párhuzamos LLM-hívással.
+    Az eredményeket EGY bulk_write-tal menti. Visszaad: (records, errors) post id szerint.
+    """
+    sem = asyncio.Semaphore(concurrency or settings.CRITIQUE_CONCURRENCY)
+
+    async def one(post: dict) -> Dict[str, Any]:
+        async with sem:
+            return await critique(post)
+
+    outcomes = await asyncio.gather(*(one(p) for p in posts), return_exceptions=True)
+
+    records: Dict[str, Dict[str, Any]] = {}
+    errors: Dict[str, str] = {}
+    ops = []
+    for post, out in zip(posts, outcomes):
+        pid = str(post["_id"])
+        if isinstance(out, Exception):
+            errors[pid] = f"{type(out).__name__}: {out}"[:300]
+            continue
+        records[pid] = out
+        ops.append(UpdateOne({"_id": post["_id"]}, {"$set": {"agent": out}}))
+
+    if ops:
+        await asyncio.to_thread(_save, ops)
+    return records, errors
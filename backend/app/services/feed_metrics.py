@@ -0,0 +1,163 @@
+# backend/app/services/feed_metrics.py
+# Feed post metrikák idősorként: a feed_metrics MongoDB time-series kollekció
+# (timeField "ts", metaField "meta" = {postId, personaId, category}).
+#   - ingest(): batch beírás (insert_many) + a poszt legfrissebb snapshotja (metrics, kpis,
+#     metricsAt) a kpi.set_posts_metrics bulk írásával; régebbi (késve érkező) minta nem írja
+#     felül az újabbat,
+#   - trend(): időablakos KPI görbe posztra vagy personára. A számlálók kumulatívak, ezért
+#     minden poszt utolsó ismert értéke továbbvivődik (locf) azokba a bucketekbe is, ahol
+#     nem jelentett – persona szinten így nem esik vissza a görbe egy kimaradt mintától.
+# A bucketelés sima dátum-aritmetika ($dateTrunc nélkül), így a time-series helyett sima
+# kollekcióra visszaeső (Mongo < 5.0) szerveren is működik.
+from __future__ import annotations
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Tuple
+
+from bson import ObjectId
+from pymongo.errors import BulkWriteError, CollectionInvalid, OperationFailure
+
+from app.core.db import db
+from app.core.settings import settings
+from app.services.kpi import set_posts_metrics, stored_kpis
+
+COLLECTION = "feed_metrics"
+FIELDS = ("impressions", "reach", "likes", "comments")
+BUCKETS = {"1h": 3600, "6h": 6 * 3600, "1d": 86400, "1w": 7 * 86400}   # másodperc
+_ORIGIN = datetime(1970, 1, 5, tzinfo=timezone.utc)   # hétfő: a heti bucketek hétfőn kezdődnek
+
+
+def ensure_collection() -> None:
+    """Time-series kollekció (Mongo 5+); régebbi szerveren sima kollekció indexszel."""
+    try:
+        db.create_collection(
+            COLLECTION,
+            timeseries={"timeField": "ts", "metaField": "meta", "granularity": "hours"},
+            expireAfterSeconds=settings.FEED_METRICS_RETENTION_DAYS * 86400,
+        )
+    except CollectionInvalid:
+        pass   # már létezik
+    except OperationFailure as e:
+        print("feed_metrics: time-series collection unavailable, using a regular one:", e)
+        db[COLLECTION].create_index(
+            "ts", name="ts_ttl_idx", expireAfterSeconds=settings.FEED_METRICS_RETENTION_DAYS * 86400
+        )
+    db[COLLECTION].create_index([("meta.postId", 1), ("ts", 1)], name="post_ts_idx")
+    db[COLLECTION].create_index([("meta.personaId", 1), ("ts", 1)], name="persona_ts_idx")
+
+
+def _utc(ts: datetime) -> datetime:
+    return ts.replace(tzinfo=timezone.utc) if ts.tzinfo is None else ts.astimezone(timezone.utc)
+
+
+def ingest(samples: List[dict]) -> dict:
+    """
+    samples: [{postId, ts, impressions, reach, likes, comments}]. Ismeretlen / hibás postId-jű
+    minták a rejected listába kerülnek, a többi beíródik.
+    """
+    rejected: List[dict] = []
+    oids: Dict[str, ObjectId] = {}
+    for i, s in enumerate(samples):
+        try:
+            oids[s["postId"]] = ObjectId(s["postId"])
+        except Exception:
+            rejected.append({"index": i, "postId": s.get("postId"), "error": "invalid post id"})
+
+    posts = {
+        str(p["_id"]): p
+        for p in db.feed_posts.find({"_id": {"$in": list(oids.values())}}, {"personaId": 1, "category": 1})
+    }
+
+    docs: List[dict] = []
+    latest: Dict[str, Tuple[datetime, dict]] = {}
+    for i, s in enumerate(samples):
+        pid = s.get("postId")
+        if pid not in oids:
+            continue
+        post = posts.get(pid)
+        if not post:
+            rejected.append({"index": i, "postId": pid, "error": "post not found"})
+            continue
+        ts = _utc(s["ts"])
+        metrics = {f: int(s.get(f) or 0) for f in FIELDS}
+        docs.append({
+            "ts": ts,
+            "meta": {"postId": pid, "personaId": post.get("personaId"), "category": post.get("category")},
+            **metrics,
+        })
+        if pid not in latest or ts > latest[pid][0]:
+            latest[pid] = (ts, metrics)
+
+    inserted = 0
+    if docs:
+        try:
+            inserted = len(db[COLLECTION].insert_many(docs, ordered=False).inserted_ids)
+        except BulkWriteError as e:
+            inserted = e.details.get("nInserted", 0)
+
+    # a poszt snapshotja csak újabb mintára frissül (metricsAt őrzi a sorrendet)
+    updated = set_posts_metrics((oids[pid], m, ts) for pid, (ts, m) in latest.items())
+    return {"accepted": inserted, "rejected": rejected, "postsUpdated": updated}
+
+
+def _bucket_expr(seconds: int) -> dict:
+    """ts lefelé kerekítve a bucket elejére (_ORIGIN-hez igazítva); Mongo 4.x-en is fut."""
+    ms = seconds * 1000
+    return {"$subtract": ["$ts", {"$mod": [{"$subtract": ["$ts", _ORIGIN]}, ms]}]}
+
+
+def _last_before(match: dict, since: datetime) -> Dict[str, dict]:
+    """Posztonként az ablak előtti utolsó minta (a görbe első bucketjének kiinduló értéke)."""
+    pipeline = [
+        {"$match": {**match, "ts": {"$lt": since}}},
+        {"$sort": {"ts": 1}},
+        {"$group": {"_id": "$meta.postId", **{f: {"$last": f"${f}"} for f in FIELDS}}},
+    ]
+    return {row["_id"]: row for row in db[COLLECTION].aggregate(pipeline, allowDiskUse=True)}
+
+
+def trend(
+    *,
+    post_id: str | None = None,
+    persona_id: str | None = None,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    bucket: str = "1h",
+) -> List[dict]:
+    """
+    KPI görbe: minden bucketre, ahol legalább egy poszt jelentett, a posztok utolsó ismert
+    számlálóinak összege (kimaradt posztnál a korábbi érték) + a stored_kpis arányok és score.
+    """
+    until = _utc(until) if until else datetime.now(timezone.utc)
+    since = _utc(since) if since else until - timedelta(days=7)
+    match: dict = {}
+    if post_id:
+        match["meta.postId"] = post_id
+    if persona_id:
+        match["meta.personaId"] = persona_id
+
+    pipeline = [
+        {"$match": {**match, "ts": {"$gte": since, "$lt": until}}},
+        {"$sort": {"ts": 1}},
+        # posztonként + bucketenként az utolsó minta
+        {"$group": {
+            "_id": {"t": _bucket_expr(BUCKETS[bucket]), "p": "$meta.postId"},
+            **{f: {"$last": f"${f}"} for f in FIELDS},
+        }},
+        {"$sort": {"_id.t": 1}},
+    ]
+    rows = list(db[COLLECTION].aggregate(pipeline, allowDiskUse=True))
+    if not rows:
+        return []
+
+    # locf: a posztok utolsó ismert értéke (az ablak előttiből indulva) bucketről bucketre
+    last = {pid: {f: row[f] for f in FIELDS} for pid, row in _last_before(match, since).items()}
+    points = []
+    i = 0
+    while i < len(rows):
+        t = rows[i]["_id"]["t"]
+        while i < len(rows) and rows[i]["_id"]["t"] == t:
+            last[rows[i]["_id"]["p"]] = {f: rows[i][f] for f in FIELDS}
+            i += 1
+        totals = {f: sum(v[f] for v in last.values()) for f in FIELDS}
+        points.append({"t": t, "posts": len(last), **totals, **stored_kpis(totals)})
+    return points
@@ -0,0 +1,258 @@
+# backend/app/services/hashtag_index.py
+# Local hashtag suggestion index (no network), built from drafts + feed_posts:
+#   - hashtag co-occurrence (tags used together on one post),
+#   - per-category tag frequency,
+#   - topic word → tag association (title words, e.g. "leg day" → legday, gym),
+# every document weighted: drafts 1, feed posts 1 + engagement (kpis.score).
+# Kept current by upsert_*/remove_*/reweight_post from the write paths (per worker), like
+# caption_index; other workers' writes move the drafts / feed_posts version counters past
+# this worker's own bumps, which triggers a rebuild. It is the fast path when the caption is already known and the fallback
+# when the chat upstream is down or too slow (ai_text.gen_caption_and_tags).
+# Loads and rebuilds run in a background thread and are swapped in: queries never wait for
+# them (an index that is not loaded yet answers "not ready" / []).
+from __future__ import annotations
+import re, threading, time
+from collections import defaultdict
+from typing import Dict, Iterable, List, Tuple
+
+from app.core import versions
+from app.core.db import db
+from app.core.settings import settings
+
+_NON_WORD = re.compile(r"[^0-9a-z]+")
+_NON_TAG = re.compile(r"[^0-9a-z_]+")
+# ai_text._FORBIDDEN_TAGS + the tag every caption gets anyway
+_SKIP = {"ai_generated", "ai", "fitai", "aifitai"}
+_MAX_TAGS = 30             # per document (bounds the co-occurrence pairs)
+_FANOUT = 50               # best neighbours kept per token / tag / category at query time
+_ENGAGEMENT_WEIGHT = 4.0   # feed post with score 100 counts 1 + 4
+_COOC_WEIGHT = 0.5
+_CATEGORY_WEIGHT = 0.3
+
+
+def _tag(t) -> str:
+    return _NON_TAG.sub("", str(t).lstrip("#").lower())
+
+
+def _tags(doc: dict) -> Tuple[str, ...]:
+    seen = dict.fromkeys(_tag(t) for t in (doc.get("hashtags") or []))
+    return tuple(t for t in seen if t and t not in _SKIP)[:_MAX_TAGS]
+
+
+def _tokens(text: str | None) -> Tuple[str, ...]:
+    words = _NON_WORD.sub(" ", (text or "").lower()).split()
+    return tuple(dict.fromkeys(w for w in words if len(w) > 2))
+
+
+def _weight(post: dict) -> float:
+    score = ((post.get("kpis") or {}).get("score")) or 0
+    return 1.0 + _ENGAGEMENT_WEIGHT * min(max(float(score), 0.0), 100.0) / 100
+
+
+class _Entry:
+    __slots__ = ("category", "tags", "tokens", "weight")
+
+    def __init__(self, doc: dict, weight: float):
+        self.category = doc.get("category") or "lifestyle"
+        self.tags = _tags(doc)
+        self.tokens = _tokens(doc.get("title"))
+        self.weight = weight
+
+
+class _Table:
+    """key → {tag: weight} + total per key; top-_FANOUT list cached until the key changes."""
+
+    def __init__(self) -> None:
+        self.rows: Dict[str, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+        self.totals: Dict[str, float] = defaultdict(float)
+        self._top: Dict[str, List[Tuple[str, float]]] = {}
+
+    def add(self, key: str, tags: Iterable[str], w: float) -> None:
+        row = self.rows[key]
+        for t in tags:
+            row[t] += w
+            if row[t] <= 1e-9:
+                del row[t]
+            self.totals[key] += w
+        if self.totals[key] <= 1e-9:
+            self.rows.pop(key, None)
+            self.totals.pop(key, None)
+        self._top.pop(key, None)
+
+    def top(self, key: str) -> List[Tuple[str, float]]:
+        """[(tag, P(tag | key))], best first."""
+        cached = self._top.get(key)
+        if cached is None:
+            row, total = self.rows.get(key), self.totals.get(key)
+            if not row or not total:
+                return []
+            best = sorted(row.items(), key=lambda kv: kv[1], reverse=True)[:_FANOUT]
+            cached = self._top[key] = [(t, w / total) for t, w in best]
+        return cached
+
+
+class HashtagIndex:
+    def __init__(self) -> None:
+        self._docs: Dict[str, _Entry] = {}
+        self._by_category = _Table()
+        self._by_token = _Table()
+        self._by_tag = _Table()       # co-occurrence
+        self._tag_weight: Dict[str, float] = defaultdict(float)
+        self._loaded = False
+        self._lock = threading.Lock()
+        self._base: versions.Baseline | None = None
+        self._checked_at = 0.0
+        self._building = False
+
+    # ---- build / incremental updates ----
+    def _scan(self) -> None:
+        limit = settings.HASHTAG_INDEX_MAX_DOCS
+        proj = {"title": 1, "category": 1, "hashtags": 1}
+        for d in db.drafts.find({}, proj).sort("_id", -1).limit(limit):
+            self._add(f"d:{d['_id']}", _Entry(d, 1.0))
+        for p in db.feed_posts.find({}, {**proj, "kpis.score": 1}).sort("_id", -1).limit(limit):
+            self._add(f"p:{p['_id']}", _Entry(p, _weight(p)))
+
+    def load(self) -> None:
+        """(Re)build from Mongo outside the lock and swap it in (blocking; startup warmup)."""
+        # version read BEFORE the scan: a write during it shows up as a change next time
+        base = versions.baseline("drafts", "feed_posts")
+        fresh = HashtagIndex()
+        fresh._scan()
+        with self._lock:
+            self._docs, self._tag_weight = fresh._docs, fresh._tag_weight
+            self._by_category, self._by_token, self._by_tag = fresh._by_category, fresh._by_token, fresh._by_tag
+            self._base, self._checked_at, self._loaded = base, time.monotonic(), True
+
+    def _load_in_background(self) -> None:
+        if self._building:
+            return
+        self._building = True
+
+        def run() -> None:
+            try:
+                self.load()
+            except Exception as e:
+                print("hashtag_index load failed:", e)
+            finally:
+                self._building = False
+
+        threading.Thread(target=run, name="hashtag-index-load", daemon=True).start()
+
+    def _sync(self) -> bool:
+        """Loaded? Starts the first load / a rebuild (other workers' writes) when needed."""
+        if not self._loaded:
+            self._load_in_background()
+            return False
+        now = time.monotonic()
+        if not self._building and now - self._checked_at >= settings.INDEX_VERSION_CHECK_SECONDS:
+            self._checked_at = now
+            changed, base = versions.changed_elsewhere(self._base)
+            if changed:
+                self._load_in_background()
+            else:
+                self._base = base   # only our own (already applied) writes
+        return True
+
+    def _apply(self, e: _Entry, w: float) -> None:
+        self._by_category.add(e.category, e.tags, w)
+        for tok in e.tokens:
+            self._by_token.add(tok, e.tags, w)
+        for t in e.tags:
+            self._by_tag.add(t, (o for o in e.tags if o != t), w)
+            self._tag_weight[t] += w
+            if self._tag_weight[t] <= 1e-9:
+                del self._tag_weight[t]
+
+    def _add(self, key: str, e: _Entry) -> None:
+        if not e.tags:
+            return
+        self._docs[key] = e
+        self._apply(e, e.weight)
+
+    def _drop(self, key: str) -> None:
+        e = self._docs.pop(key, None)
+        if e is not None:
+            self._apply(e, -e.weight)
+
+    def _upsert(self, key: str, e: _Entry) -> None:
+        with self._lock:
+            if not self._loaded:
+                return  # the load in progress (or the first query) picks it up
+            self._drop(key)
+            self._add(key, e)
+
+    def upsert_draft(self, doc: dict) -> None:
+        """Call after every draft insert/update (doc must carry _id)."""
+        self._upsert(f"d:{doc['_id']}", _Entry(doc, 1.0))
+
+    def upsert_post(self, doc: dict) -> None:
+        """Call after a feed post insert (doc must carry _id, hashtags, category, kpis)."""
+        self._upsert(f"p:{doc['_id']}", _Entry(doc, _weight(doc)))
+
+    def reweight_post(self, post_id, kpis: dict) -> None:
+        """Engagement changed (new metrics): only the weight of the post moves."""
+        key = f"p:{post_id}"
+        with self._lock:
+            e = self._docs.get(key)
+            if e is None:
+                return
+            self._drop(key)
+            e.weight = _weight({"kpis": kpis})
+            self._add(key, e)
+
+    def remove_draft(self, draft_id) -> None:
+        with self._lock:
+            self._drop(f"d:{draft_id}")
+
+    def remove_post(self, post_id) -> None:
+        with self._lock:
+            self._drop(f"p:{post_id}")
+
+    # ---- queries ----
+    def ready(self) -> bool:
+        """Loaded and big enough; False (never waits) while the first load is running."""
+        return self._sync() and len(self._docs) >= settings.HASHTAG_INDEX_MIN_DOCS
+
+    def suggest(self, topic: str, category: str, *, limit: int = 10, exclude: Iterable[str] = ()) -> List[dict]:
+        """
+        Tags for a topic + category, best first. Score: topic words' associated tags
+        + tags co-occurring with tags named in the topic + category frequency.
+        """
+        if not self._sync():
+            return []
+        tokens = _tokens(topic)
+        skip = _SKIP | {_tag(t) for t in exclude}
+        scores: Dict[str, float] = defaultdict(float)
+        with self._lock:
+            # tags spelled out in the topic: "leg day workout" → leg, legday, legdayworkout, ...
+            words = _NON_WORD.sub(" ", (topic or "").lower()).split()
+            spelled = {*words, *("".join(words[i:i + 2]) for i in range(len(words) - 1)), "".join(words)}
+            named = {t for t in spelled if t in self._tag_weight}
+            for t in named:
+                scores[t] += 1.0
+                for o, p in self._by_tag.top(t):
+                    scores[o] += _COOC_WEIGHT * p
+            for tok in tokens:
+                for t, p in self._by_token.top(tok):
+                    scores[t] += p
+            for t, p in self._by_category.top(category):
+                scores[t] += _CATEGORY_WEIGHT * p
+        best = sorted(((s, t) for t, s in scores.items() if t not in skip), reverse=True)[:limit]
+        return [{"tag": t, "score": round(s, 4)} for s, t in best]
+
+    def hashtags_for(self, topic: str, category: str, limit: int = 10) -> List[str]:
+        """Ready-to-store list (ai_generated last, max `limit`), or [] while the index is too small."""
+        if not settings.HASHTAG_INDEX_ENABLED:
+            return []
+        try:
+            if not self.ready():
+                return []
+            tags = [h["tag"] for h in self.suggest(topic, category, limit=limit - 1)]
+        except Exception as e:   # fallback út: Mongo nélkül se dőljön el
+            print("hashtag_index unavailable:", e)
+            return []
+        return tags + ["ai_generated"] if tags else []
+
+
+hashtag_index = HashtagIndex()
@@ -0,0 +1,116 @@
+# backend/app/services/image_upgrade.py
+# Preview-first képek: a draft egy gyors, kicsi előnézettel jön létre (previewUrl),
+# a teljes felbontású kép (fullImageUrl) később készül – jóváhagyáskor, kérésre,
+# vagy IMAGE_UPGRADE_EAGER esetén rögtön a háttérben.
+# A teljes kép az ELŐNÉZETBŐL készül (az az img2img bemenete, nem a persona portré), így
+# a jóváhagyott kompozíció marad; a feed poszt csak akkor kapja meg, ha még az előnézetet mutatja.
+# fullImageStatus: "pending" → "running" → "done" | "failed" (failed újrapróbálható).
+from __future__ import annotations
+import asyncio, os, tempfile, time
+from datetime import datetime, timedelta, timezone
+from typing import Set
+
+from bson import ObjectId
+from pymongo import ReturnDocument
+
+from app.core import versions
+from app.core.db import db
+from app.core.settings import settings
+from app.services import media_catalog
+from app.services.ai_image import MEDIA_DIR, _unpad_portrait, generate_openai_img2img
+
+_tasks: Set[asyncio.Task] = set()   # erős referencia, különben a GC elviheti a futó taskot
+
+
+def preview_options() -> dict:
+    """generate_openai_img2img kwargs az előnézethez."""
+    return {"quality": settings.IMAGE_PREVIEW_QUALITY, "max_side": settings.IMAGE_PREVIEW_MAX_SIDE}
+
+
+def claim(draft_id: str) -> dict | None:
+    """pending / failed (vagy beragadt running) → running; None ha nincs mit / más már csinálja."""
+    stale = datetime.now(timezone.utc) - timedelta(seconds=settings.IMAGE_UPGRADE_STALE_SECONDS)
+    try:
+        oid = ObjectId(draft_id)
+    except Exception:
+        return None
+    return db.drafts.find_one_and_update(
+        {"_id": oid, "$or": [
+            {"fullImageStatus": {"$in": ["pending", "failed"]}},
+            {"fullImageStatus": "running", "fullImageStartedAt": {"$lt": stale}},
+        ]},
+        {"$set": {"fullImageStatus": "running", "fullImageStartedAt": datetime.now(timezone.utc)}},
+        return_document=ReturnDocument.AFTER,
+    )
+
+
+async def upgrade(draft_id: str) -> str | None:
+    """A teljes felbontású kép legyártása; az URL-t adja vissza (None, ha nem kellett / nem sikerült)."""
+    doc = claim(draft_id)
+    if not doc:
+        return None
+    oid = doc["_id"]
+    init_path = None
+    try:
+        preview = MEDIA_DIR / (doc.get("previewUrl") or "").rsplit("/", 1)[-1]
+        if not preview.is_file() or not doc.get("imagePrompt"):
+            raise RuntimeError("preview image or image prompt missing")
+        init_path = await asyncio.to_thread(_preview_init, preview)
+        _, url = await generate_openai_img2img(
+            init_image_path=init_path,
+            prompt=doc["imagePrompt"],
+            size="1024x1024",
+            pad_to_portrait=True,
+            quality=settings.IMAGE_FULL_QUALITY,
+            persona_id=doc.get("personaId"),
+        )
+    except Exception as e:
+        print("image_upgrade failed:", draft_id, e)
+        db.drafts.update_one({"_id": oid}, {"$set": {"fullImageStatus": "failed"}})
+        versions.bump("drafts")
+        return None
+    finally:
+        if init_path:
+            os.unlink(init_path)
+
+    db.drafts.update_one({"_id": oid}, {"$set": {"fullImageUrl": url, "fullImageStatus": "done", "imageStatus": None}})
+    media_catalog.attach(url, draftId=str(oid))
+    # ha közben jóváhagyták: a feed poszt is a teljes képet kapja
+    moved = db.feed_posts.update_many(
+        {"draftId": str(oid), "imageUrl": doc.get("previewUrl")}, {"$set": {"imageUrl": url}}
+    ).modified_count
+    if moved:
+        versions.bump("drafts", "feed_posts")
+    else:
+        versions.bump("drafts")
+    return url
+
+
+def _preview_init(preview) -> str:
+    """Az előnézet négyzetes része ideiglenes PNG-be (img2img bemenet), a hívó törli."""
+    from PIL import Image
+
+    with Image.open(preview) as im:
+        square = _unpad_portrait(im.convert("RGB"))
+    fd, path = tempfile.mkstemp(suffix=".png", prefix="upgrade_")
+    with os.fdopen(fd, "wb") as f:
+        square.save(f, format="PNG")
+    return path
+
+
+async def wait_done(draft_id: str, timeout: float | None = None) -> None:
+    """Megvárja, amíg egy (más kérés / worker által) futó upgrade befejeződik."""
+    oid = ObjectId(draft_id)
+    deadline = time.monotonic() + (settings.IMAGE_UPGRADE_WAIT_SECONDS if timeout is None else timeout)
+    while time.monotonic() < deadline:
+        d = await asyncio.to_thread(db.drafts.find_one, {"_id": oid}, {"fullImageStatus": 1})
+        if not d or d.get("fullImageStatus") != "running":
+            return
+        await asyncio.sleep(1.0)
+
+
+def schedule(draft_id: str) -> None:
+    """Háttérben indítja (event loopból hívandó); a dupla indítást a claim() szűri."""
+    task = asyncio.get_running_loop().create_task(upgrade(draft_id))
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
@@ -0,0 +1,130 @@
+# backend/app/services/json_stream.py
+# Incremental JSON scanner for streamed LLM output: every character is looked at once,
+# partial string values are reported as they grow, so the UI can render before the
+# closing brace arrives.
+from __future__ import annotations
+import json
+from typing import Any, List, Tuple
+
+Path = Tuple[Any, ...]
+Event = Tuple[str, Path, Any]   # ("delta", path, text) | ("value", path, scalar)
+
+_ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+
+class _Frame:
+    __slots__ = ("is_obj", "slot", "expect_key")
+
+    def __init__(self, is_obj: bool):
+        self.is_obj = is_obj
+        self.slot: Any = None if is_obj else 0   # current key / list index
+        self.expect_key = is_obj
+
+
+class JsonStream:
+    """
+    feed(chunk) → events:
+      ("delta", path, text)   new characters of a string value still being written
+      ("value", path, value)  a string / number / bool / null value completed
+    path is the key/index chain, e.g. ("caption",) or ("hashtags", 2).
+    Containers produce no events; parse the full text (self.text) for the final object.
+    """
+
+    def __init__(self) -> None:
+        self.text = ""
+        self._stack: List[_Frame] = []
+        self._in_str = False
+        self._is_key = False
+        self._esc = False
+        self._uni: str | None = None       # collected hex digits of a \uXXXX escape
+        self._high: int | None = None      # pending high surrogate of a \uD83D\uDCAA pair
+        self._buf: List[str] = []          # current string
+        self._sent = 0                     # chars of the current string already sent as delta
+        self._literal: List[str] = []
+
+    def _path(self) -> Path:
+        return tuple(f.slot for f in self._stack)
+
+    def _finish_literal(self, out: List[Event]) -> None:
+        if self._literal:
+            raw = "".join(self._literal)
+            self._literal = []
+            try:
+                out.append(("value", self._path(), json.loads(raw)))
+            except ValueError:
+                pass
+
+    def _flush_delta(self, out: List[Event]) -> None:
+        if self._in_str and not self._is_key and len(self._buf) > self._sent:
+            out.append(("delta", self._path(), "".join(self._buf[self._sent:])))
+            self._sent = len(self._buf)
+
+    def feed(self, chunk: str) -> List[Event]:
+        self.text += chunk
+        out: List[Event] = []
+        for c in chunk:
+            if self._in_str:
+                self._string_char(c, out)
+                continue
+            if c in " \t\r\n":
+                self._finish_literal(out)
+            elif c == '"':
+                top = self._stack[-1] if self._stack else None
+                self._in_str, self._buf, self._sent = True, [], 0
+                self._is_key = bool(top and top.is_obj and top.expect_key)
+            elif c in "{[":
+                self._stack.append(_Frame(c == "{"))
+            elif c in "}]":
+                self._finish_literal(out)
+                if self._stack:
+                    self._stack.pop()
+            elif c == ":":
+                pass
+            elif c == ",":
+                self._finish_literal(out)
+                if self._stack:
+                    top = self._stack[-1]
+                    if top.is_obj:
+                        top.expect_key = True
+                    else:
+                        top.slot += 1
+            else:
+                self._literal.append(c)
+        self._flush_delta(out)
+        return out
+
+    def _string_char(self, c: str, out: List[Event]) -> None:
+        if self._uni is not None:
+            self._uni += c
+            if len(self._uni) == 4:
+                code, self._uni = int(self._uni, 16), None
+                if 0xD800 <= code < 0xDC00:
+                    self._high = code
+                    return
+                if 0xDC00 <= code < 0xE000 and self._high is not None:
+                    code = 0x10000 + ((self._high - 0xD800) << 10) + (code - 0xDC00)
+                self._high = None
+                self._buf.append(chr(code))
+            return
+        if self._esc:
+            self._esc = False
+            if c == "u":
+                self._uni = ""
+            else:
+                self._buf.append(_ESCAPES.get(c, c))
+            return
+        if c == "\\":
+            self._esc = True
+            return
+        if c != '"':
+            self._buf.append(c)
+            return
+        # string closed
+        value = "".join(self._buf)
+        if self._is_key:
+            top = self._stack[-1]
+            top.slot, top.expect_key = value, False
+        else:
+            self._flush_delta(out)
+            out.append(("value", self._path(), value))
+        self._in_str = False
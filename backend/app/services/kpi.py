@@ -0,0 +1,328 @@
+# backend/app/services/kpi.py
+# Feed post KPI-k: arányok + 0..100 score a metrics snapshotból,
+# egy posztra (post_kpis) és a teljes feedre oszloposan (feed_kpi_report).
+# A numpy csak a feed-szintű függvényekben töltődik be (lusta import).
+from __future__ import annotations
+import threading, time
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING, Iterable, Tuple
+
+from pymongo import UpdateOne
+
+from app.core import versions
+from app.core.db import db
+from app.services.hashtag_index import hashtag_index
+
+if TYPE_CHECKING:   # csak az annotációkhoz; futásidőben lusta import
+    import numpy as np
+
+
+# metrika-modell: reach tartomány kategóriánként + persona like-rate szorzó
+# (a drafts._simulate_metrics és a synth generátor is ezt használja)
+CATEGORY_REACH = {
+    "fitness": (1800, 4800),
+    "food": (1200, 3500),
+    "lifestyle": (900, 3000),
+    "finance": (800, 2500),
+    "travel": (1500, 4200),
+    "technology": (1000, 3200),
+    "education": (900, 2800),
+    "career": (900, 2600),
+    "productivity": (1100, 3200),
+    "health": (950, 3000),
+}
+DEFAULT_REACH = (900, 2800)
+
+
+def persona_bias(name: str) -> float:
+    """Like-rate szorzó a persona NEVE alapján (az id-ben nincs kulcsszó)."""
+    p = (name or "").lower()
+    if any(k in p for k in ["coach", "fit", "gym"]):
+        return 1.15
+    if any(k in p for k in ["food", "chef"]):
+        return 1.25
+    if any(k in p for k in ["crypto", "fin"]):
+        return 0.90
+    return 1.0
+
+
+def post_kpis(m: dict) -> dict:
+    reach = max(1, int(m.get("reach") or 0))
+    likes = int(m.get("likes") or 0)
+    comments = int(m.get("comments") or 0)
+    impressions = int(m.get("impressions") or 0)
+
+    like_rate = likes / reach
+    comment_rate = comments / reach
+    # engagement rate itt a két mutató (kérésed szerint csak 4 KPI-t tartunk)
+    eng_rate = (likes + comments) / reach
+
+    # egyszerű score (arány alapú, 0..100)
+    like_norm = min(like_rate, 0.08) / 0.08
+    comm_norm = min(comment_rate, 0.02) / 0.02
+    score = round(100 * (0.65 * like_norm + 0.35 * comm_norm))
+
+    return {
+        "reach": reach,
+        "impressions": impressions,
+        "likes": likes,
+        "comments": comments,
+        "likeRate": round(like_rate, 4),
+        "commentRate": round(comment_rate, 4),
+        "engagementRate": round(eng_rate, 4),
+        "score": score,
+    }
+
+
+# ---- Feed postra mentett KPI-k (kpis mező): a leaderboard indexből olvas
+TOP_METRICS = ("score", "likeRate", "commentRate")
+
+
+def stored_kpis(m: dict) -> dict:
+    """A post_kpis arányai + score – ez kerül a feed_posts.kpis mezőbe."""
+    k = post_kpis(m)
+    return {name: k[name] for name in ("likeRate", "commentRate", "engagementRate", "score")}
+
+
+def set_post_metrics(post_id, metrics: dict) -> bool:
+    """metrics csere + kpis újraszámolás egy update-ben (minden metrika-változás ezen menjen át)."""
+    return set_posts_metrics([(post_id, metrics, None)]) > 0
+
+
+def set_posts_metrics(updates: Iterable[Tuple[object, dict, datetime | None]]) -> int:
+    """
+    set_post_metrics sok posztra, EGY bulk_write-tal: [(post_id, metrics, mért időpont | None)].
+    Időponttal (idősoros ingest) a régebbi minta nem írja felül az újabbat (metricsAt őrzi).
+    Visszaad: a frissült posztok száma.
+    """
+    ops, ids = [], []
+    for post_id, metrics, at in updates:
+        q: dict = {"_id": post_id}
+        update = {"metrics": metrics, "kpis": stored_kpis(metrics)}
+        if at is not None:
+            q["$or"] = [{"metricsAt": {"$lt": at}}, {"metricsAt": {"$exists": False}}]
+            update["metricsAt"] = at
+        ops.append(UpdateOne(q, {"$set": update}))
+        ids.append(post_id)
+    if not ops:
+        return 0
+    n = db.feed_posts.bulk_write(ops, ordered=False).matched_count
+    if n:
+        versions.bump("feed_posts")
+        # a hashtag-súly az engagementtel mozog; a guard miatt nem mind frissült: a tárolt kpis a mérvadó
+        for p in db.feed_posts.find({"_id": {"$in": ids}}, {"kpis": 1}):
+            hashtag_index.reweight_post(p["_id"], p.get("kpis") or {})
+    return n
+
+
+def backfill_post_kpis(batch: int = 5_000) -> int:
+    """kpis mező pótlása a régi feed postokon (bulk_write, vektorizált képlet)."""
+    import numpy as np
+    from pymongo import UpdateOne
+
+    cursor = db.feed_posts.find({"kpis": {"$exists": False}}, {"metrics": 1}, batch_size=batch)
+    done = 0
+    while True:
+        rows = [d for _, d in zip(range(batch), cursor)]
+        if not rows:
+            break
+        m = [d.get("metrics") or {} for d in rows]
+        k = kpi_columns(
+            np.array([int(x.get("reach") or 0) for x in m], dtype=np.int64),
+            np.array([int(x.get("likes") or 0) for x in m], dtype=np.int64),
+            np.array([int(x.get("comments") or 0) for x in m], dtype=np.int64),
+        )
+        ops = [
+            UpdateOne({"_id": d["_id"]}, {"$set": {"kpis": {
+                "likeRate": round(float(k["likeRate"][i]), 4),
+                "commentRate": round(float(k["commentRate"][i]), 4),
+                "engagementRate": round(float(k["engagementRate"][i]), 4),
+                "score": int(k["score"][i]),
+            }}})
+            for i, d in enumerate(rows)
+        ]
+        db.feed_posts.bulk_write(ops, ordered=False)
+        done += len(ops)
+    if done:
+        versions.bump("feed_posts")
+    return done
+
+
+def top_posts(
+    by: str = "score",
+    *,
+    persona_id: str | None = None,
+    category: str | None = None,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    limit: int = 10,
+) -> list:
+    """
+    Top-N feed post egy mentett KPI szerint. Az indexek (personaId|category, kpis.<by>, publishedAt)
+    sorrendűek (equality → sort → range), így a rendezés az indexből jön, nincs in-memory sort.
+    """
+    q: dict = {}
+    if persona_id:
+        q["personaId"] = persona_id
+    if category:
+        q["category"] = category
+    if since or until:
+        q["publishedAt"] = {}
+        if since:
+            q["publishedAt"]["$gte"] = since
+        if until:
+            q["publishedAt"]["$lt"] = until
+    proj = {"agent": 0}
+    cursor = db.feed_posts.find(q, proj).sort([(f"kpis.{by}", -1), ("publishedAt", -1)]).limit(limit)
+    items = []
+    for p in cursor:
+        p["id"] = str(p.pop("_id"))
+        items.append(p)
+    return items
+
+
+# ---- Feed-wide KPI engine: ugyanaz a képlet, oszlopokon, egy NumPy menetben
+_PCTS = (50, 90, 99)
+_SCORE_BINS = 10            # 0-9, 10-19, ..., 90-100
+_HIST_CELLS_MAX = 5_000_000  # csoport × 101 score-cella felett rendezéssel számolunk
+_lock = threading.Lock()
+_cache: dict = {"report": None, "version": None}
+
+
+def kpi_columns(reach: np.ndarray, likes: np.ndarray, comments: np.ndarray) -> dict:
+    """Vectorized post_kpis (rounding to 4 decimals is left to the caller)."""
+    import numpy as np
+
+    reach = np.maximum(reach, 1).astype(np.float64)
+    like_rate = likes / reach
+    comment_rate = comments / reach
+    eng_rate = (likes + comments) / reach
+    like_norm = np.minimum(like_rate, 0.08) / 0.08
+    comm_norm = np.minimum(comment_rate, 0.02) / 0.02
+    score = np.rint(100 * (0.65 * like_norm + 0.35 * comm_norm))
+    return {"likeRate": like_rate, "commentRate": comment_rate, "engagementRate": eng_rate, "score": score}
+
+
+def load_feed_columns() -> dict:
+    """feed_posts.metrics oszlopos formában + kategória / persona kódok."""
+    import numpy as np
+
+    cursor = db.feed_posts.aggregate([
+        {"$project": {
+            "_id": 0,
+            "i": "$metrics.impressions", "r": "$metrics.reach",
+            "l": "$metrics.likes", "c": "$metrics.comments",
+            "k": "$category", "p": "$personaId",
+        }},
+    ], batchSize=10_000)
+    cats: dict = {}
+    personas: dict = {}
+    rows_i, rows_r, rows_l, rows_c, rows_k, rows_p = [], [], [], [], [], []
+    for d in cursor:
+        rows_i.append(d.get("i") or 0)
+        rows_r.append(d.get("r") or 0)
+        rows_l.append(d.get("l") or 0)
+        rows_c.append(d.get("c") or 0)
+        rows_k.append(cats.setdefault(d.get("k") or "lifestyle", len(cats)))
+        rows_p.append(personas.setdefault(d.get("p") or "", len(personas)))
+    return {
+        "impressions": np.asarray(rows_i, dtype=np.int64),
+        "reach": np.asarray(rows_r, dtype=np.int64),
+        "likes": np.asarray(rows_l, dtype=np.int64),
+        "comments": np.asarray(rows_c, dtype=np.int64),
+        "category": np.asarray(rows_k, dtype=np.int32),
+        "persona": np.asarray(rows_p, dtype=np.int32),
+        "categories": list(cats),
+        "personas": list(personas),
+    }
+
+
+def _group_stats(codes: np.ndarray, labels: list, k: dict, limit: int | None) -> list:
+    """Count / means / score percentiles + histogram per group, without a Python loop over rows."""
+    import numpy as np
+
+    g = len(labels)
+    counts = np.bincount(codes, minlength=g)
+    out = {}
+    for name in ("likeRate", "commentRate", "engagementRate", "score"):
+        out[name] = np.bincount(codes, weights=k[name], minlength=g) / np.maximum(counts, 1)
+
+    # score egész 0..100 → csoportonkénti 101-es hisztogram; ebből percentilis és eloszlás is
+    # rendezés nélkül. Nagyon sok csoportnál (memória) marad az egyszeri (csoport, score) rendezés.
+    score = k["score"].astype(np.int64)
+    ranks = {q: np.floor((q / 100) * np.maximum(counts - 1, 0) + 0.5).astype(np.int64) for q in _PCTS}
+    if g * 101 <= _HIST_CELLS_MAX:
+        full = np.bincount(codes.astype(np.int64) * 101 + score, minlength=g * 101).reshape(g, 101)
+        cum = np.cumsum(full, axis=1)
+        pct = {q: (cum <= ranks[q][:, None]).sum(axis=1) for q in _PCTS}
+        hist = np.add.reduceat(full, np.arange(0, 101, 100 // _SCORE_BINS)[:_SCORE_BINS], axis=1)
+    else:
+        sorted_scores = score[np.lexsort((score, codes))]
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        pct = {q: sorted_scores[np.minimum(starts + ranks[q], max(len(score) - 1, 0))] for q in _PCTS}
+        bins = np.minimum(score // (100 // _SCORE_BINS), _SCORE_BINS - 1)
+        hist = np.bincount(codes * _SCORE_BINS + bins, minlength=g * _SCORE_BINS).reshape(g, _SCORE_BINS)
+
+    rank = np.argsort(-counts, kind="stable")
+    if limit is not None:
+        rank = rank[:limit]
+    return [
+        {
+            "key": labels[i],
+            "count": int(counts[i]),
+            "likeRate": round(float(out["likeRate"][i]), 4),
+            "commentRate": round(float(out["commentRate"][i]), 4),
+            "engagementRate": round(float(out["engagementRate"][i]), 4),
+            "meanScore": round(float(out["score"][i]), 1),
+            "scorePercentiles": {f"p{q}": int(pct[q][i]) for q in _PCTS},
+            "scoreHistogram": hist[i].tolist(),
+        }
+        for i in rank
+        if counts[i]
+    ]
+
+
+def feed_kpi_report(cols: dict, persona_limit: int | None = 50) -> dict:
+    import numpy as np
+
+    started = time.perf_counter()
+    k = kpi_columns(cols["reach"], cols["likes"], cols["comments"])
+    n = len(k["score"])
+
+    def pcts(a: np.ndarray) -> dict:
+        if not n:
+            return {f"p{q}": 0.0 for q in _PCTS}
+        return {f"p{q}": round(float(v), 4) for q, v in zip(_PCTS, np.percentile(a, _PCTS))}
+
+    by_cat = _group_stats(cols["category"], cols["categories"], k, None)
+    by_persona = _group_stats(cols["persona"], cols["personas"], k, persona_limit)
+    for row in by_cat:
+        row["category"] = row.pop("key")
+    for row in by_persona:
+        row["personaId"] = row.pop("key")
+
+    return {
+        "count": n,
+        "totals": {name: int(cols[name].sum()) for name in ("impressions", "reach", "likes", "comments")},
+        "means": {name: round(float(v.mean()), 4) if n else 0.0 for name, v in k.items()},
+        "percentiles": {name: pcts(v) for name, v in k.items()},
+        "byCategory": by_cat,
+        "byPersona": by_persona,
+        "computeMs": round((time.perf_counter() - started) * 1000, 2),
+        "computedAt": datetime.now(timezone.utc).isoformat().replace("+00:00", "Z"),
+    }
+
+
+def cached_feed_report() -> dict:
+    """
+    A legutóbbi riport, amíg a feed_posts verziója (core.versions) nem változik –
+    bármelyik worker írása után mindegyik újraszámol.
+    """
+    version = versions.current("feed_posts")["feed_posts"]
+    if _cache["report"] is not None and _cache["version"] == version:
+        return _cache["report"]
+    with _lock:
+        if _cache["report"] is None or _cache["version"] != version:
+            # ha számítás közben írnak, a verzió eltér, és a következő hívás újraszámol
+            _cache.update(report=feed_kpi_report(load_feed_columns()), version=version)
+        return _cache["report"]
@@ -0,0 +1,251 @@
+# backend/app/services/media_catalog.py
+# Generált képek katalógusa (media kollekció) perceptuális hash-sel (dHash, 64 bit).
+# Közel-duplikátum keresés multi-index hash-sel: a 64 bitet 4 × 16 bites darabra vágjuk
+# (h0..h3, mind indexelt). Ha két hash Hamming-távolsága ≤ 3, a skatulya-elv miatt legalább
+# egy darabjuk pontosan egyezik → egy $or lekérdezés az indexeken, utána pontos távolság.
+# Mentéskor (ai_image._save_jpeg) MEDIA_DEDUP szerint: "flag" (duplicateOf mező),
+# "reuse" (a meglévő fájlt adjuk vissza, nincs új fájl), "off".
+# Eredet (provenance): dir (images / characters), kind (generated / placeholder / upload),
+# personaId, promptHash, draftId – a galéria (GET /api/media) ebből lapoz, fájlrendszer nélkül.
+# Meglévő fájlok: python -m app.services.media_catalog --backfill
+from __future__ import annotations
+import argparse, hashlib, os, time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import List, Tuple
+
+from pymongo.errors import DuplicateKeyError
+
+from app.core import versions
+from app.core.db import db
+from app.core.settings import settings
+
+_PARTS = 4
+_MAX_DISTANCE = _PARTS - 1   # efölött a 4 darabos index már nem garantál találatot
+_GALLERY_FIELDS = {"url": 1, "personaId": 1, "draftId": 1, "promptHash": 1, "kind": 1,
+                   "width": 1, "height": 1, "bytes": 1, "createdAt": 1}
+
+
+def prompt_hash(prompt: str | None) -> str | None:
+    """A prompt rövid hash-e (ugyanabból a promptból készült képek csoportosításához)."""
+    if not prompt:
+        return None
+    return hashlib.sha256(" ".join(prompt.split()).encode()).hexdigest()[:16]
+
+
+def _url_for(path: str | os.PathLike) -> Tuple[str, str]:
+    """(dir, kiszolgált URL) egy uploads alatti fájlra, pl. ("characters", ".../uploads/characters/x.png")."""
+    p = Path(path)
+    return p.parent.name, f"{settings.BASE_URL}/uploads/{p.parent.name}/{p.name}"
+
+
+def dhash(image) -> int:
+    """64 bites difference hash: 9×8-as szürke kicsinyítés, szomszédos pixelek összehasonlítása."""
+    from PIL import Image
+
+    small = image.convert("L").resize((9, 8), Image.LANCZOS)
+    px = list(small.getdata())
+    bits = 0
+    for row in range(8):
+        for col in range(8):
+            bits = (bits << 1) | (px[row * 9 + col] > px[row * 9 + col + 1])
+    return bits
+
+
+def file_dhash(path: str | os.PathLike) -> Tuple[int, int, int]:
+    """(hash, width, height) egy képfájlból; JPEG-nél draft módban (gyors, kicsiben dekódol)."""
+    from PIL import Image
+
+    with Image.open(path) as im:
+        size = im.size
+        im.draft("L", (64, 64))
+        return dhash(im), size[0], size[1]
+
+
+def _parts(h: int) -> List[int]:
+    return [(h >> (16 * i)) & 0xFFFF for i in range(_PARTS)]
+
+
+def _hex(h: int) -> str:
+    return f"{h:016x}"
+
+
+def near_duplicates(h: int, *, width: int | None = None, height: int | None = None,
+                    max_distance: int | None = None, limit: int = 5) -> List[dict]:
+    """Katalógus dokumentumok h-tól legfeljebb max_distance távolságra (legközelebbi elöl)."""
+    max_distance = min(settings.MEDIA_DUP_DISTANCE if max_distance is None else max_distance, _MAX_DISTANCE)
+    q: dict = {"$or": [{f"h{i}": p} for i, p in enumerate(_parts(h))]}
+    if width and height:
+        # az előnézet és a teljes kép ugyanaz a motívum – csak azonos méretűt tekintünk duplikátumnak
+        q.update({"width": width, "height": height})
+    hits = []
+    for d in db.media.find(q, {"dhash": 1, "url": 1, "filename": 1, "width": 1, "height": 1}):
+        dist = bin(int(d["dhash"], 16) ^ h).count("1")
+        if dist <= max_distance:
+            d["distance"] = dist
+            hits.append(d)
+    hits.sort(key=lambda d: d["distance"])
+    return hits[:limit]
+
+
+def catalog_doc(filename: str, url: str, h: int, width: int, height: int, size: int, **extra) -> dict:
+    doc = {
+        "_id": filename,
+        "filename": filename,
+        "url": url,
+        "dhash": _hex(h),
+        **{f"h{i}": p for i, p in enumerate(_parts(h))},
+        "width": width,
+        "height": height,
+        "bytes": size,
+        "createdAt": datetime.now(timezone.utc),
+    }
+    doc.update(extra)
+    return doc
+
+
+def find_duplicate(image) -> Tuple[int, dict | None]:
+    """(hash, legközelebbi duplikátum vagy None) egy még el nem mentett PIL képre."""
+    h = dhash(image)
+    if settings.MEDIA_DEDUP == "off":
+        return h, None
+    hits = near_duplicates(h, width=image.width, height=image.height, limit=1)
+    return h, (hits[0] if hits else None)
+
+
+def record(filename: str, url: str, h: int, width: int, height: int, size: int, duplicate: dict | None,
+           **extra) -> None:
+    """Egy frissen mentett kép (ai_image._save_jpeg); extra: personaId, promptHash, kind, ..."""
+    fields = {"dir": "images", "kind": "generated", **{k: v for k, v in extra.items() if v is not None}}
+    if duplicate:
+        fields.update(duplicateOf=duplicate["_id"], distance=duplicate["distance"])
+    try:
+        db.media.insert_one(catalog_doc(filename, url, h, width, height, size, **fields))
+    except DuplicateKeyError:
+        return
+    versions.bump("media")
+
+
+def _file_doc(path: str | os.PathLike, **extra) -> dict:
+    """Katalógus dokumentum egy meglévő fájlból (hash, méret; createdAt = a fájl mtime-ja)."""
+    st = os.stat(path)
+    h, w, hh = file_dhash(path)
+    dir_name, url = _url_for(path)
+    created = datetime.fromtimestamp(st.st_mtime, timezone.utc)
+    return catalog_doc(Path(path).name, url, h, w, hh, st.st_size, dir=dir_name, createdAt=created, **extra)
+
+
+def record_file(path: str | os.PathLike, *, kind: str, **extra) -> None:
+    """Feltöltött / más úton mentett fájl katalogizálása (pl. persona portré: kind="upload")."""
+    try:
+        db.media.insert_one(_file_doc(path, kind=kind, **{k: v for k, v in extra.items() if v is not None}))
+    except DuplicateKeyError:
+        return
+    versions.bump("media")
+
+
+def attach(url_or_filename: str | None, **fields) -> bool:
+    """Utólag ismert hivatkozások (draftId, personaId) a képhez – URL-lel vagy fájlnévvel."""
+    if not url_or_filename:
+        return False
+    name = url_or_filename.rsplit("/", 1)[-1]
+    res = db.media.update_one({"_id": name}, {"$set": fields})
+    if res.modified_count:
+        versions.bump("media")
+    return bool(res.matched_count)
+
+
+def _encode_cursor(d: dict) -> str:
+    return f"{d['createdAt'].isoformat()}|{d['_id']}"
+
+
+def _decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    """ValueError, ha nem egy korábbi nextCursor."""
+    created, sep, _id = cursor.partition("|")
+    if not sep or not _id:
+        raise ValueError("invalid cursor")
+    return datetime.fromisoformat(created), _id
+
+
+def page(*, persona_id: str | None = None, kind: str | None = None, since: datetime | None = None,
+         until: datetime | None = None, cursor: str | None = None, limit: int = 50) -> Tuple[List[dict], str | None]:
+    """
+    Galéria lap, legújabb elöl; keyset lapozás (createdAt, _id) szerint a gallery_idx /
+    gallery_persona_idx indexen – mély lapoknál sincs skip. (docs, nextCursor | None).
+    """
+    q: dict = {}
+    if persona_id:
+        q["personaId"] = persona_id
+    if kind:
+        q["kind"] = kind
+    if since or until:
+        q["createdAt"] = {**({"$gte": since} if since else {}), **({"$lt": until} if until else {})}
+    if cursor:
+        created, last_id = _decode_cursor(cursor)
+        q = {"$and": [q, {"$or": [
+            {"createdAt": {"$lt": created}},
+            {"createdAt": created, "_id": {"$lt": last_id}},
+        ]}]}
+    docs = list(db.media.find(q, _GALLERY_FIELDS).sort([("createdAt", -1), ("_id", -1)]).limit(limit + 1))
+    nxt = _encode_cursor(docs[limit - 1]) if len(docs) > limit else None
+    return docs[:limit], nxt
+
+
+def backfill(directory: str | os.PathLike, *, batch: int = 500, kind: str = "generated") -> dict:
+    """Katalógusba veszi a mappa még nem ismert képfájljait (hash + méret, createdAt = mtime)."""
+    started = time.perf_counter()
+    seen = added = failed = 0
+    names: List[os.DirEntry] = []
+
+    def flush() -> None:
+        nonlocal added, failed
+        known = {d["_id"] for d in db.media.find({"_id": {"$in": [e.name for e in names]}}, {"_id": 1})}
+        docs = []
+        for e in names:
+            if e.name in known:
+                continue
+            try:
+                docs.append(_file_doc(e.path, kind=kind, backfilled=True))
+            except Exception:
+                failed += 1
+        if docs:
+            try:
+                added += len(db.media.insert_many(docs, ordered=False).inserted_ids)
+            except Exception as ex:   # BulkWriteError: párhuzamos mentés már felvette
+                added += getattr(ex, "details", {}).get("nInserted", 0)
+        names.clear()
+        if docs:
+            versions.bump("media")
+
+    with os.scandir(directory) as it:
+        for e in it:
+            if e.is_file() and e.name.lower().endswith((".jpg", ".jpeg", ".png", ".webp")):
+                seen += 1
+                names.append(e)
+                if len(names) >= batch:
+                    flush()
+    if names:
+        flush()
+    return {"files": seen, "added": added, "failed": failed, "seconds": round(time.perf_counter() - started, 1)}
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Media catalog maintenance.")
+    ap.add_argument("--backfill", action="store_true", help="hash existing images into the catalog")
+    ap.add_argument("--dir", default=None, help="only this directory (default: images + characters)")
+    ap.add_argument("--batch", type=int, default=500)
+    args = ap.parse_args()
+    if args.backfill:
+        from app.core.files import CHAR_DIR, UPLOAD_DIR   # files.py importálja ezt a modult
+
+        if args.dir:
+            print(backfill(args.dir, batch=args.batch))
+            return
+        print("images:", backfill(os.path.join(UPLOAD_DIR, "images"), batch=args.batch))
+        print("characters:", backfill(CHAR_DIR, batch=args.batch, kind="upload"))
+    else:
+        ap.print_help()
+
+
+if __name__ == "__main__":
+    main()
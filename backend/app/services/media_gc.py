@@ -0,0 +1,163 @@
+# backend/app/services/media_gc.py
+# Árva médiafájlok takarítása (mark-and-sweep, inkrementálisan):
+#   - a média mappákat os.scandir-ral streameljük, MEDIA_GC_BATCH fájlonként,
+#   - a türelmi időn (MEDIA_GC_GRACE_SECONDS) belüli fájlokat kihagyjuk: generálás közben
+#     a fájl előbb jön létre, mint a rá hivatkozó dokumentum,
+#   - batchenként EGY $in lekérdezés kollekciónként (drafts, feed_posts, personas, idea_queue),
+#   - ami sehol nincs hivatkozva, törlődik (dry run: csak jelentés), a katalógusból is.
+# A delete_draft / delete_feed_post szándékosan nem töröl fájlt: egy kép több dokumentumé
+# is lehet (draft → feed poszt, MEDIA_DEDUP="reuse"); ezt a GC dönti el.
+# Futtatás: POST /api/media/gc (admin token), vagy python -m app.services.media_gc --delete
+from __future__ import annotations
+import argparse, os, re, time
+from typing import Dict, Iterator, List
+
+from app.core import versions
+from app.core.db import db
+from app.core.files import CHAR_DIR, UPLOAD_DIR
+from app.core.settings import settings
+
+# mappa → (URL path prefix, hivatkozó mezők kollekciónként; "filename" mezők csak a nevet tárolják)
+TARGETS = {
+    "images": (
+        os.path.join(UPLOAD_DIR, "images"), "/uploads/images/",
+        {
+            "drafts": ["previewUrl", "fullImageUrl"],
+            "feed_posts": ["imageUrl"],
+            "idea_queue": ["previewUrl"],
+        },
+        {"drafts": ["filename"]},
+    ),
+    "characters": (
+        CHAR_DIR, "/uploads/characters/",
+        {"personas": ["ref_image_url", "imageUrl"]},
+        {"personas": ["filename"]},
+    ),
+}
+
+
+class UnknownBaseURL(RuntimeError):
+    pass
+
+
+def _bases() -> List[str]:
+    return [b.rstrip("/") for b in [settings.BASE_URL, *settings.MEDIA_GC_BASE_URLS]]
+
+
+def check_bases() -> None:
+    """
+    A hivatkozásokat pontos URL-re keressük ($in, indexből). Ha van olyan URL, aminek a
+    hostja nem ismert (pl. régi BASE_URL), a GC élő fájlt is árvának látna → nem indulunk.
+    """
+    known = "|".join(re.escape(b) for b in _bases())
+    for _, (_, prefix, url_fields, _) in TARGETS.items():
+        pattern = re.compile(rf"^(({known})?{re.escape(prefix)}|(?!.*{re.escape(prefix)}))")
+        for coll, fields in url_fields.items():
+            for f in fields:
+                bad = db[coll].find_one({f: {"$type": "string", "$not": pattern}}, {f: 1})
+                if bad:
+                    raise UnknownBaseURL(
+                        f"{coll}.{f} references {bad[f]!r}; add its origin to MEDIA_GC_BASE_URLS"
+                    )
+
+
+def _referenced(names: List[str], prefix: str, url_fields: Dict[str, List[str]],
+                name_fields: Dict[str, List[str]]) -> set:
+    urls = [f"{b}{prefix}{n}" for n in names for b in _bases()] + [f"{prefix}{n}" for n in names]
+    by_url = {u: u.rsplit("/", 1)[-1] for u in urls}
+    found = set()
+    for coll in set(url_fields) | set(name_fields):
+        ors = [{f: {"$in": urls}} for f in url_fields.get(coll, [])]
+        ors += [{f: {"$in": names}} for f in name_fields.get(coll, [])]
+        fields = url_fields.get(coll, []) + name_fields.get(coll, [])
+        for d in db[coll].find({"$or": ors}, {f: 1 for f in fields}):
+            for f in fields:
+                v = d.get(f)
+                if isinstance(v, str):
+                    found.add(by_url.get(v, v))
+    return found
+
+
+def _batches(directory: str, grace_before: float, batch: int, stats: dict) -> Iterator[List[os.DirEntry]]:
+    out: List[os.DirEntry] = []
+    try:
+        it = os.scandir(directory)
+    except FileNotFoundError:
+        return
+    with it:
+        for e in it:
+            if not e.is_file(follow_symlinks=False):
+                continue
+            stats["scanned"] += 1
+            if e.stat().st_mtime > grace_before:
+                stats["inGrace"] += 1
+                continue
+            out.append(e)
+            if len(out) >= batch:
+                yield out
+                out = []
+    if out:
+        yield out
+
+
+def collect(*, dry_run: bool = True, grace_seconds: float | None = None, batch: int | None = None,
+            max_delete: int | None = None, pause: float | None = None) -> dict:
+    """Egy teljes kör; a jelentés: mappánként szkennelt / árva / törölt fájlok és felszabadított bájtok."""
+    check_bases()
+    started = time.perf_counter()
+    grace = settings.MEDIA_GC_GRACE_SECONDS if grace_seconds is None else grace_seconds
+    batch = batch or settings.MEDIA_GC_BATCH
+    pause = settings.MEDIA_GC_PAUSE_SECONDS if pause is None else pause
+    grace_before = time.time() - grace
+    report: dict = {"dryRun": dry_run, "graceSeconds": grace, "dirs": {}, "orphans": 0,
+                    "deleted": 0, "reclaimedBytes": 0, "sample": []}
+
+    for name, (directory, prefix, url_fields, name_fields) in TARGETS.items():
+        stats = {"scanned": 0, "inGrace": 0, "orphans": 0, "deleted": 0, "reclaimedBytes": 0}
+        for entries in _batches(directory, grace_before, batch, stats):
+            refs = _referenced([e.name for e in entries], prefix, url_fields, name_fields)
+            removed = []
+            for e in entries:
+                if e.name in refs:
+                    continue
+                stats["orphans"] += 1
+                if len(report["sample"]) < 20:
+                    report["sample"].append(f"{name}/{e.name}")
+                size = e.stat().st_size
+                if dry_run:
+                    stats["reclaimedBytes"] += size   # ennyi szabadulna fel
+                    continue
+                if max_delete is not None and report["deleted"] + stats["deleted"] >= max_delete:
+                    continue
+                try:
+                    os.remove(e.path)
+                except FileNotFoundError:
+                    continue
+                stats["deleted"] += 1
+                stats["reclaimedBytes"] += size
+                removed.append(e.name)
+            if removed:
+                db.media.delete_many({"_id": {"$in": removed}})
+                versions.bump("media")
+            if pause:
+                time.sleep(pause)   # a Mongo-t és a lemezt ne terhelje egyben
+        report["dirs"][name] = stats
+        for k in ("orphans", "deleted", "reclaimedBytes"):
+            report[k] += stats[k]
+
+    report["seconds"] = round(time.perf_counter() - started, 2)
+    return report
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Remove media files no document references.")
+    ap.add_argument("--delete", action="store_true", help="actually delete (default: dry run)")
+    ap.add_argument("--grace", type=float, default=settings.MEDIA_GC_GRACE_SECONDS)
+    ap.add_argument("--batch", type=int, default=settings.MEDIA_GC_BATCH)
+    ap.add_argument("--max-delete", type=int, default=None)
+    args = ap.parse_args()
+    print(collect(dry_run=not args.delete, grace_seconds=args.grace, batch=args.batch, max_delete=args.max_delete))
+
+
+if __name__ == "__main__":
+    main()
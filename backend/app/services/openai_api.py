@@ -0,0 +1,336 @@
+# backend/app/services/openai_api.py
+# Shared gateway in front of every OpenAI HTTP call:
+# circuit breaker per upstream, per-model RPM/TPM token buckets
+# + retry with jittered exponential backoff.
+from __future__ import annotations
+import asyncio, json, random, threading, time
+from email.utils import parsedate_to_datetime
+from typing import Any, AsyncIterator, Dict
+
+import httpx
+from app.core import profiling
+from app.core.settings import settings
+from app.services.breaker import breakers
+
+# Retry policy per upstream: (retried HTTP statuses, retried transport errors).
+# Chat completions are cheap and safe to repeat. Image edits are paid and not idempotent:
+# a 5xx / read timeout may still have produced (and billed) an image, so they are only
+# retried when the request surely did not run (429, or the connection was never made).
+_NOT_SENT = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+RETRY_POLICY: Dict[str, tuple] = {
+    "chat": ({408, 429, 500, 502, 503, 504}, (httpx.TransportError,)),
+    "images": ({429}, _NOT_SENT),
+}
+
+
+class TokenBucket:
+    """
+    Reservation-based token bucket. Every caller debits immediately (the balance may go
+    negative) and gets back how long it has to wait, so waiters are served in arrival
+    order, each in its own time slot, instead of all waking up together.
+    """
+
+    def __init__(self, per_minute: float):
+        self.rate = per_minute / 60.0
+        self.capacity = float(per_minute)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def reserve(self, amount: float, now: float) -> float:
+        if self.rate <= 0:
+            return 0.0  # 0 = unlimited
+        amount = min(amount, self.capacity)
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= amount
+        return max(0.0, -self.tokens / self.rate)
+
+    def refund(self, amount: float) -> None:
+        if self.rate > 0:
+            self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class ModelBudget:
+    """RPM + TPM buckets of one model, plus a shared pause window set by Retry-After."""
+
+    def __init__(self, rpm: int, tpm: int):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self, tokens: int) -> float:
+        with self._lock:
+            now = time.monotonic()
+            wait = max(self.requests.reserve(1, now), self.tokens.reserve(tokens, now))
+            return max(wait, self.blocked_until - now)
+
+    def pause(self, seconds: float) -> None:
+        with self._lock:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+    def settle(self, estimated: int, actual: int) -> None:
+        """Give back (or charge) the difference between the estimate and the reported usage."""
+        with self._lock:
+            self.tokens.refund(estimated - actual)
+
+
+class RateGovernor:
+    def __init__(self, limits: Dict[str, list[int]], default: list[int]):
+        self._limits = limits
+        self._default = default
+        self._budgets: Dict[str, ModelBudget] = {}
+        self._lock = threading.Lock()
+
+    def budget(self, model: str) -> ModelBudget:
+        with self._lock:
+            b = self._budgets.get(model)
+            if b is None:
+                rpm, tpm = (self._limits.get(model) or self._default)[:2]
+                b = self._budgets[model] = ModelBudget(rpm, tpm)
+            return b
+
+    async def acquire(self, model: str, tokens: int = 0) -> None:
+        wait = self.budget(model).reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+governor = RateGovernor(settings.OPENAI_RATE_LIMITS, settings.OPENAI_DEFAULT_LIMITS)
+
+# Shared connection pool (keep-alive to api.openai.com), opened per worker by the lifespan.
+# The timeout is given per request, so one client serves chat and images alike.
+_http: httpx.AsyncClient | None = None
+
+
+def open_http(max_connections: int = 100) -> httpx.AsyncClient:
+    global _http
+    limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections // 2)
+    _http = httpx.AsyncClient(limits=limits, event_hooks=profiling.HTTP_HOOKS)
+    return _http
+
+
+async def close_http() -> None:
+    global _http
+    if _http is not None:
+        await _http.aclose()
+        _http = None
+
+
+def _client() -> httpx.AsyncClient:
+    return _http if _http is not None else open_http()   # scripts / no lifespan
+
+
+def estimate_tokens(body: Dict[str, Any]) -> int:
+    """Rough prompt (~4 chars/token) + completion budget estimate for the TPM bucket."""
+    chars = sum(len(str(m.get("content") or "")) for m in body.get("messages") or [])
+    return chars // 4 + int(body.get("max_tokens") or 512)
+
+
+def retry_after(r: httpx.Response) -> float | None:
+    """Retry-After in seconds (retry-after-ms, delta-seconds or HTTP-date form)."""
+    ms = r.headers.get("retry-after-ms")
+    if ms:
+        try:
+            return float(ms) / 1000.0
+        except ValueError:
+            pass
+    raw = r.headers.get("retry-after")
+    if not raw:
+        return None
+    try:
+        return max(0.0, float(raw))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(raw).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _backoff(attempt: int) -> float:
+    """Full-jitter exponential backoff."""
+    cap = min(settings.OPENAI_BACKOFF_MAX, settings.OPENAI_BACKOFF_BASE * (2 ** attempt))
+    return random.uniform(0, cap)
+
+
+def _delay_for(budget: ModelBudget, r: httpx.Response | None, attempt: int) -> float:
+    delay = _backoff(attempt)
+    if r is not None and r.status_code in (429, 503):
+        hint = retry_after(r)
+        if hint is not None:
+            # everyone on this model waits it out, not just this caller
+            budget.pause(hint)
+            delay = max(delay, hint)
+    return delay
+
+
+def _settle(budget: ModelBudget, tokens: int, r: httpx.Response) -> None:
+    if not tokens or r.status_code >= 400:
+        return
+    try:
+        used = (r.json().get("usage") or {}).get("total_tokens")
+    except Exception:
+        used = None
+    if isinstance(used, int):
+        budget.settle(tokens, used)
+
+
+def _record(breaker, r: httpx.Response | None, elapsed: float) -> None:
+    """
+    Only upstream trouble (no response, 429, 5xx) counts against the breaker; `elapsed` is
+    the last attempt's own latency (governor queueing and retry backoff are not upstream time).
+    """
+    if r is None:
+        breaker.record(False, elapsed, "transport error")
+    elif r.status_code == 429 or r.status_code >= 500:
+        breaker.record(False, elapsed, f"HTTP {r.status_code}")
+    else:
+        breaker.record(True, elapsed)
+
+
+def _abandon(breaker, inflight: float | None, expires: float | None) -> None:
+    """
+    The caller gave up mid-call. With the request in flight past our own deadline, or for
+    at least the SLO, that is a hanging upstream: it counts as a failure. Otherwise (client
+    disconnect, deadline spent in the governor queue / backoff) there is no verdict, only
+    the probe slot is freed.
+    """
+    now = time.monotonic()
+    waited = now - inflight if inflight is not None else 0.0
+    if inflight is not None and expires is not None and now >= expires:
+        breaker.record(False, waited, f"deadline exceeded after {waited:.1f}s")
+    elif waited >= breaker.latency_slo:
+        breaker.record(False, waited, f"abandoned after {waited:.1f}s")
+    else:
+        breaker.release()
+
+
+async def post(
+    url: str, *, upstream: str, model: str, tokens: int = 0, timeout: float = 60,
+    deadline: float | None = None, **kwargs,
+) -> httpx.Response:
+    """
+    POST to OpenAI through the breaker and the governor. Retries per RETRY_POLICY[upstream];
+    the last response is returned as-is so callers keep their own error handling.
+    Raises CircuitOpenError without calling out while the upstream's breaker is open.
+    deadline: overall seconds (retries included); past it asyncio.TimeoutError is raised
+    and the call counts against the breaker.
+    """
+    if deadline is None:
+        return await _post(url, upstream, model, tokens, timeout, None, kwargs)
+    expires = time.monotonic() + deadline
+    return await asyncio.wait_for(_post(url, upstream, model, tokens, timeout, expires, kwargs), deadline)
+
+
+async def _post(url: str, upstream: str, model: str, tokens: int, timeout: float,
+                expires: float | None, kwargs: dict) -> httpx.Response:
+    breaker = breakers[upstream]
+    breaker.before_call()
+    budget = governor.budget(model)
+    retry_status, retry_errors = RETRY_POLICY[upstream]
+    attempt = 0
+    elapsed = 0.0
+    inflight: float | None = None   # send time of the request currently waiting on the upstream
+    cancelled = False
+    r = None
+    try:
+        while True:
+            await governor.acquire(model, tokens)
+            sent = inflight = time.monotonic()
+            try:
+                r = await _client().post(url, timeout=timeout, **kwargs)
+            except retry_errors:
+                r = None
+                elapsed = time.monotonic() - sent
+                inflight = None
+                if attempt >= settings.OPENAI_MAX_RETRIES:
+                    raise
+                await asyncio.sleep(_delay_for(budget, None, attempt))
+                attempt += 1
+                continue
+            elapsed = time.monotonic() - sent
+            inflight = None
+            if r.status_code not in retry_status or attempt >= settings.OPENAI_MAX_RETRIES:
+                _settle(budget, tokens, r)
+                return r
+            await asyncio.sleep(_delay_for(budget, r, attempt))
+            attempt += 1
+    except asyncio.CancelledError:
+        cancelled = True
+        raise
+    finally:
+        if cancelled:
+            _abandon(breaker, inflight, expires)
+        else:
+            _record(breaker, r, elapsed)
+
+
+async def stream(url: str, *, upstream: str, model: str, tokens: int = 0, timeout: float = 60, **kwargs) -> AsyncIterator[str]:
+    """
+    Streaming chat completion (`"stream": true` in the body): yields the content deltas
+    as they arrive. Retries happen only before the first byte, so nothing is duplicated.
+    """
+    breaker = breakers[upstream]
+    breaker.before_call()
+    budget = governor.budget(model)
+    retry_status, retry_errors = RETRY_POLICY[upstream]
+    attempt = 0
+    elapsed = 0.0
+    abandoned = False
+    inflight: float | None = None
+    verdict: httpx.Response | None = None
+    try:
+        client = _client()
+        while True:
+            await governor.acquire(model, tokens)
+            sent = inflight = time.monotonic()
+            try:
+                async with client.stream("POST", url, timeout=timeout, **kwargs) as r:
+                    if r.status_code in retry_status and attempt < settings.OPENAI_MAX_RETRIES:
+                        await r.aread()
+                        inflight = None
+                        delay = _delay_for(budget, r, attempt)
+                    else:
+                        verdict = r
+                        _record(breaker, r, time.monotonic() - sent)   # time to headers
+                        if r.status_code >= 400:
+                            await r.aread()
+                            r.raise_for_status()
+                        async for delta in _sse_deltas(r, budget, tokens):
+                            yield delta
+                        return
+            except retry_errors:
+                elapsed = time.monotonic() - sent
+                inflight = None
+                if verdict is not None or attempt >= settings.OPENAI_MAX_RETRIES:
+                    raise
+                delay = _delay_for(budget, None, attempt)
+            await asyncio.sleep(delay)
+            attempt += 1
+    except (asyncio.CancelledError, GeneratorExit):
+        abandoned = True   # client disconnect / deadline: a verdict only if the upstream hung
+        raise
+    finally:
+        if verdict is None:
+            if abandoned:
+                _abandon(breaker, inflight, None)
+            else:
+                _record(breaker, None, elapsed)
+
+
+async def _sse_deltas(r: httpx.Response, budget: ModelBudget, tokens: int) -> AsyncIterator[str]:
+    async for line in r.aiter_lines():
+        if not line.startswith("data:"):
+            continue
+        data = line[5:].strip()
+        if data == "[DONE]":
+            return
+        chunk = json.loads(data)
+        usage = chunk.get("usage")
+        if usage and tokens and isinstance(usage.get("total_tokens"), int):
+            budget.settle(tokens, usage["total_tokens"])
+        for choice in chunk.get("choices") or []:
+            piece = (choice.get("delta") or {}).get("content")
+            if piece:
+                yield piece
@@ -0,0 +1,103 @@
+# backend/app/services/persona_cache.py
+# Read-through persona cache a generálási utakhoz (draft létrehozás, képgenerálás, agent apply):
+# persona dokumentum + feloldott portré útvonal, TTL-lel. Saját írásnál explicit invalidate,
+# más worker írását a personas verziószámláló (core.versions) jelzi.
+from __future__ import annotations
+import threading, time
+from collections import OrderedDict
+from typing import Optional, Tuple
+from urllib.parse import urlparse
+
+from bson import ObjectId
+
+from app.core import versions
+from app.core.db import db
+from app.core.settings import settings
+
+
+def resolve_init_path(p: dict | None) -> Optional[str]:
+    """
+    Persona portré → konténerbeli lokális útvonal (img2img init kép).
+    - Előnyben a feltöltött fájl (filename → /uploads/characters/...).
+    - Ha csak URL van, és az /uploads/...-ra mutat, konténerben /app + path
+      (új séma: ref_image_url, régi séma: imageUrl).
+    """
+    if not p:
+        return None
+    if p.get("filename"):
+        return f"/app/uploads/characters/{p['filename']}"
+    for key in ("ref_image_url", "imageUrl"):
+        if p.get(key):
+            parsed = urlparse(p[key])
+            if parsed.path.startswith("/uploads/"):
+                return "/app" + parsed.path
+    return None
+
+
+class PersonaCache:
+    """LRU + TTL; a hiányzó personát nem cache-eljük (egy frissen létrehozott rögtön látszik)."""
+
+    def __init__(self, ttl: float, max_size: int, version_check: float):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.version_check = version_check
+        self._entries: "OrderedDict[str, Tuple[float, dict, Optional[str]]]" = OrderedDict()
+        self._version: str | None = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def _sync_version(self, now: float) -> None:
+        if now - self._checked_at < self.version_check:
+            return
+        self._checked_at = now
+        v = versions.current("personas")["personas"]
+        with self._lock:
+            if v != self._version:
+                self._entries.clear()
+                self._version = v
+
+    def _entry(self, persona_id: str) -> Tuple[dict, Optional[str]] | None:
+        now = time.monotonic()
+        self._sync_version(now)
+        with self._lock:
+            hit = self._entries.get(persona_id)
+            if hit and hit[0] > now:
+                self._entries.move_to_end(persona_id)
+                return hit[1], hit[2]
+        try:
+            doc = db.personas.find_one({"_id": ObjectId(persona_id)})
+        except Exception:
+            doc = None
+        if not doc:
+            return None
+        entry = (now + self.ttl, doc, resolve_init_path(doc))
+        with self._lock:
+            self._entries[persona_id] = entry
+            self._entries.move_to_end(persona_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return doc, entry[2]
+
+    def get(self, persona_id: str | None) -> dict | None:
+        """Persona dokumentum (másolat) vagy None (rossz ID / nem létezik)."""
+        hit = self._entry(persona_id) if persona_id else None
+        return dict(hit[0]) if hit else None
+
+    def init_path(self, persona_id: str | None) -> Optional[str]:
+        hit = self._entry(persona_id) if persona_id else None
+        return hit[1] if hit else None
+
+    def invalidate(self, persona_id: str | None = None) -> None:
+        """Egy persona (vagy minden) eldobása; a hívó írás után a verziót is bump-olja."""
+        with self._lock:
+            if persona_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(persona_id, None)
+
+
+persona_cache = PersonaCache(
+    ttl=settings.PERSONA_CACHE_TTL_SECONDS,
+    max_size=settings.PERSONA_CACHE_MAX,
+    version_check=settings.PERSONA_VERSION_CHECK_SECONDS,
+)
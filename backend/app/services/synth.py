@@ -0,0 +1,321 @@
+# backend/app/services/synth.py
+# Determinisztikus, vektorizált szintetikus adatgenerátor (personas / drafts / feed_posts)
+# benchmarkokhoz. Ugyanaz a metrika-modell, mint a _simulate_metrics-ben.
+#
+#   python -m app.services.synth --personas 1000 --drafts 1200000 --posts 1000000 --seed 42
+#
+# A metrika-modell (CATEGORY_REACH, persona_bias) a kpi.py-ban él; a numpy-t
+# függvényen belül importáljuk.
+# Minden dokumentum "synthetic": True jelölést kap, így --purge-dzsel eltávolítható.
+from __future__ import annotations
+import argparse, time
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING, Dict, Iterator, List
+
+from bson import ObjectId
+
+from app.services.kpi import CATEGORY_REACH, DEFAULT_REACH, persona_bias
+
+if TYPE_CHECKING:   # csak az annotációkhoz; futásidőben lusta import
+    import numpy as np
+
+CATEGORIES = [
+    "education", "technology", "finance", "health", "fitness",
+    "travel", "food", "lifestyle", "career", "productivity",
+]
+
+# --- eloszlások -------------------------------------------------------------
+# a feed kategória-keveréke (fitness / food / travel a leggyakoribb)
+_CATEGORY_WEIGHTS = (6, 8, 7, 6, 16, 12, 14, 15, 7, 9)
+# posztolás órája (UTC): reggeli és esti csúcs
+_HOUR_WEIGHTS = (1, 1, 1, 1, 1, 2, 4, 7, 8, 6, 5, 5, 6, 5, 4, 4, 5, 7, 9, 10, 9, 6, 3, 2)
+# persona archetípusok: (név-előtag, fő kategória)
+_ARCHETYPES = [
+    ("coach", "fitness"), ("gymrat", "fitness"), ("chef", "food"), ("foodie", "food"),
+    ("crypto", "finance"), ("finbro", "finance"), ("nomad", "travel"), ("dev", "technology"),
+    ("student", "education"), ("recruiter", "career"), ("planner", "productivity"),
+    ("calm", "health"), ("stylist", "lifestyle"),
+]
+_STYLES = ["photo_realistic", "editorial", "cinematic"]
+_MOODS = ["neutral", "smiling", "focused", "energetic"]
+_BGS = ["studio_gray", "outdoor", "cafe", "gym", "home"]
+_TOPICS = {
+    "education": ["Thesis writing tips", "Exam week plan", "Note-taking system", "Study with me"],
+    "technology": ["AI tools I use daily", "Coding setup tour", "Docker in 60 seconds", "App of the week"],
+    "finance": ["Budget reset", "ETF basics", "Saving challenge", "Crypto myths"],
+    "health": ["Sleep routine", "Mindfulness break", "Wellbeing check-in", "Mental health day"],
+    "fitness": ["Leg day routine", "HIIT finisher", "Mobility flow", "Glute workout"],
+    "travel": ["Porto in 48 hours", "Budget flight hacks", "Hidden gems Europe", "Beach day"],
+    "food": ["High-protein breakfast bowl", "Coffee ritual", "Meal prep Sunday", "Quick snack ideas"],
+    "lifestyle": ["Morning routine", "Minimal home decor", "Capsule wardrobe", "Slow weekend"],
+    "career": ["Interview prep", "CV glow-up", "Portfolio review", "First job lessons"],
+    "productivity": ["Time blocking", "Focus playlist", "Weekly schedule", "Tasks that matter"],
+}
+_TAGS = {
+    cat: [w.lower().replace(" ", "") for w in topics] + [cat, f"{cat}tips", "daily", "motivation"]
+    for cat, topics in _TOPICS.items()
+}
+_PERSONA_EPOCH = 1_704_067_200   # 2024-01-01, így a persona _id-k is seedfüggők csak
+# a feed időablak vége: fix alapértelmezés, hogy a kimenet a futás idejétől se függjön
+ANCHOR = datetime(2025, 1, 1, tzinfo=timezone.utc)
+_CHUNK = 100_000   # fix belső blokkméret → a kimenet csak a seedtől függ, a batch mérettől nem
+
+
+def _weights(w: tuple) -> list:
+    total = sum(w)
+    return [x / total for x in w]
+
+
+def _rng(seed: int, kind: int, chunk: int) -> np.random.Generator:
+    import numpy as np
+
+    return np.random.default_rng([seed, kind, chunk])
+
+
+def _object_ids(rng: np.random.Generator, epoch_s: np.ndarray) -> List[ObjectId]:
+    """Determinisztikus ObjectId-k a megadott időbélyeggel (az analytics az _id idejét használja)."""
+    import numpy as np
+
+    raw = np.empty((len(epoch_s), 12), dtype=np.uint8)
+    raw[:, :4] = epoch_s.astype(">u4").view(np.uint8).reshape(-1, 4)
+    raw[:, 4:] = rng.integers(0, 256, size=(len(epoch_s), 8), dtype=np.uint8)
+    return [ObjectId(row.tobytes()) for row in raw]
+
+
+# --- personas ---------------------------------------------------------------
+def persona_docs(n: int, *, seed: int = 0) -> List[dict]:
+    import numpy as np
+
+    rng = _rng(seed, 0, 0)
+    arche = rng.integers(0, len(_ARCHETYPES), n)
+    style = rng.integers(0, len(_STYLES), n)
+    mood = rng.integers(0, len(_MOODS), n)
+    bg = rng.integers(0, len(_BGS), n)
+    ids = _object_ids(rng, np.full(n, _PERSONA_EPOCH, dtype=np.int64) + np.arange(n))
+    docs = []
+    for i in range(n):
+        prefix, cat = _ARCHETYPES[arche[i]]
+        docs.append({
+            "_id": ids[i],
+            "name": f"{prefix}_{i:06d}",
+            "ref_image_url": None,
+            "filename": None,
+            "identity_hint": None,
+            "style": _STYLES[style[i]],
+            "mood": _MOODS[mood[i]],
+            "bg": _BGS[bg[i]],
+            "primaryCategory": cat,
+            "synthetic": True,
+        })
+    return docs
+
+
+def _persona_arrays(personas: List[dict]) -> Dict[str, np.ndarray]:
+    import numpy as np
+
+    cat_index = {c: i for i, c in enumerate(CATEGORIES)}
+    weights = 1.0 / np.arange(1, len(personas) + 1) ** 0.8     # néhány nagyon aktív persona
+    return {
+        "weights": weights / weights.sum(),
+        "primary": np.array([cat_index[p["primaryCategory"]] for p in personas], dtype=np.int32),
+        "bias": np.array([persona_bias(p["name"]) for p in personas], dtype=np.float64),
+    }
+
+
+# --- feed / draft oszlopok ----------------------------------------------------
+def _columns(rng: np.random.Generator, n: int, pa: Dict[str, np.ndarray], days: int, now: int) -> Dict[str, np.ndarray]:
+    import numpy as np
+
+    persona = rng.choice(len(pa["weights"]), size=n, p=pa["weights"]).astype(np.int32)
+    # 70%: a persona fő kategóriája, különben a globális keverék
+    category = np.where(
+        rng.random(n) < 0.7,
+        pa["primary"][persona],
+        rng.choice(len(CATEGORIES), size=n, p=_weights(_CATEGORY_WEIGHTS)),
+    ).astype(np.int32)
+
+    # idő: a friss napok sűrűbbek, napon belül reggeli/esti csúcs
+    day = np.floor(days * rng.random(n) ** 1.4).astype(np.int64)
+    hour = rng.choice(24, size=n, p=_weights(_HOUR_WEIGHTS))
+    midnight = now - now % 86400
+    published = midnight - day * 86400 + hour * 3600 + rng.integers(0, 3600, n)
+
+    lo = np.array([CATEGORY_REACH.get(c, DEFAULT_REACH)[0] for c in CATEGORIES])[category]
+    hi = np.array([CATEGORY_REACH.get(c, DEFAULT_REACH)[1] for c in CATEGORIES])[category]
+    reach = rng.integers(lo, hi + 1)
+    impressions = (reach * rng.uniform(1.2, 1.6, n)).astype(np.int64)
+    likes = (reach * rng.uniform(0.02, 0.06, n) * pa["bias"][persona]).astype(np.int64)
+    comments = (reach * rng.uniform(0.002, 0.015, n)).astype(np.int64)
+    return {
+        "persona": persona,
+        "category": category,
+        "publishedAt": published,
+        "impressions": impressions,
+        "reach": reach,
+        "likes": likes,
+        "comments": comments,
+        "topic": rng.integers(0, 4, n),
+        "tags": rng.integers(0, 8, size=(n, 5)),
+    }
+
+
+def feed_columns(
+    n: int, *, personas: int = 500, seed: int = 0, days: int = 90, anchor: datetime = ANCHOR
+) -> dict:
+    """
+    n poszt metrikái oszlopos formában, Mongo nélkül – ugyanaz az alak, mint
+    kpi.load_feed_columns() eredménye (benchmarkokhoz). A posztok az anchor előtti
+    `days` napra esnek.
+    """
+    import numpy as np
+
+    ps = persona_docs(personas, seed=seed)
+    pa = _persona_arrays(ps)
+    now = int(anchor.timestamp())
+    parts = [_columns(_rng(seed, 2, k), min(_CHUNK, n - start), pa, days, now)
+             for k, start in enumerate(range(0, n, _CHUNK))]
+    cat = lambda name: np.concatenate([p[name] for p in parts]) if parts else np.zeros(0, dtype=np.int64)
+    return {
+        "impressions": cat("impressions"),
+        "reach": cat("reach"),
+        "likes": cat("likes"),
+        "comments": cat("comments"),
+        "category": cat("category").astype(np.int32),
+        "persona": cat("persona").astype(np.int32),
+        "publishedAt": cat("publishedAt"),
+        "categories": list(CATEGORIES),
+        "personas": [str(p["_id"]) for p in ps],
+    }
+
+
+def iter_content(
+    personas: List[dict], drafts: int, posts: int, *, seed: int = 0, days: int = 90,
+    anchor: datetime = ANCHOR,
+) -> Iterator[tuple[List[dict], List[dict]]]:
+    """
+    (drafts, feed_posts) blokkok. Az első `posts` draft approved és van feed postja,
+    a többi sima draft. Blokkonként _CHUNK dokumentum, az anchor előtti `days` napból.
+    """
+    from app.services.kpi import kpi_columns
+
+    drafts = max(drafts, posts)
+    pa = _persona_arrays(personas)
+    pids = [str(p["_id"]) for p in personas]
+    now = int(anchor.timestamp())
+    for chunk, start in enumerate(range(0, drafts, _CHUNK)):
+        n = min(_CHUNK, drafts - start)
+        rng = _rng(seed, 1, chunk)
+        col = _columns(rng, n, pa, days, now)
+        k = kpi_columns(col["reach"], col["likes"], col["comments"])
+        created = col["publishedAt"] - rng.integers(600, 6 * 3600, n)
+        ids = _object_ids(rng, created)
+        draft_batch, post_batch = [], []
+        for i in range(n):
+            cat = CATEGORIES[col["category"][i]]
+            title = _TOPICS[cat][col["topic"][i]]
+            tags = list(dict.fromkeys(_TAGS[cat][j] for j in col["tags"][i])) + ["ai_generated"]
+            caption = f"{title} — save this for later and tell me how it goes!"
+            persona_id = pids[col["persona"][i]]
+            approved = start + i < posts
+            draft_batch.append({
+                "_id": ids[i],
+                "title": title,
+                "category": cat,
+                "caption": caption,
+                "hashtags": tags,
+                "customText": None,
+                "personaId": persona_id,
+                "status": "approved" if approved else "draft",
+                "previewUrl": None,
+                "createdAt": datetime.fromtimestamp(int(created[i]), timezone.utc).replace(tzinfo=None),
+                "synthetic": True,
+            })
+            if approved:
+                post_batch.append({
+                    "draftId": str(ids[i]),
+                    "title": title,
+                    "caption": caption,
+                    "hashtags": tags,
+                    "imageUrl": None,
+                    "personaId": persona_id,
+                    "category": cat,
+                    "publishedAt": datetime.fromtimestamp(int(col["publishedAt"][i]), timezone.utc).replace(tzinfo=None),
+                    "metrics": {
+                        "impressions": int(col["impressions"][i]),
+                        "reach": int(col["reach"][i]),
+                        "likes": int(col["likes"][i]),
+                        "comments": int(col["comments"][i]),
+                    },
+                    "kpis": {
+                        "likeRate": round(float(k["likeRate"][i]), 4),
+                        "commentRate": round(float(k["commentRate"][i]), 4),
+                        "engagementRate": round(float(k["engagementRate"][i]), 4),
+                        "score": int(k["score"][i]),
+                    },
+                    "synthetic": True,
+                })
+        yield draft_batch, post_batch
+
+
+def _insert(coll, docs: List[dict], batch_size: int) -> int:
+    for i in range(0, len(docs), batch_size):
+        coll.insert_many(docs[i:i + batch_size], ordered=False)
+    return len(docs)
+
+
+def seed_database(
+    *, personas: int, drafts: int, posts: int, seed: int = 0, days: int = 90, batch_size: int = 10_000,
+    anchor: datetime = ANCHOR,
+) -> Dict[str, int]:
+    """Szintetikus adatok írása batch-elt insert_many-vel."""
+    from app.core import versions
+    from app.core.db import db
+
+    ps = persona_docs(personas, seed=seed)
+    counts = {"personas": _insert(db.personas, ps, batch_size), "drafts": 0, "feed_posts": 0}
+    for draft_batch, post_batch in iter_content(ps, drafts, posts, seed=seed, days=days, anchor=anchor):
+        counts["drafts"] += _insert(db.drafts, draft_batch, batch_size)
+        counts["feed_posts"] += _insert(db.feed_posts, post_batch, batch_size)
+    versions.bump("personas", "drafts", "feed_posts")
+    return counts
+
+
+def purge() -> Dict[str, int]:
+    from app.core import versions
+    from app.core.db import db
+
+    names = ("personas", "drafts", "feed_posts")
+    out = {name: db[name].delete_many({"synthetic": True}).deleted_count for name in names}
+    versions.bump(*names)
+    return out
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Synthetic personas / drafts / feed_posts for benchmarks")
+    ap.add_argument("--personas", type=int, default=500)
+    ap.add_argument("--drafts", type=int, default=120_000)
+    ap.add_argument("--posts", type=int, default=100_000)
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--days", type=int, default=90)
+    ap.add_argument("--batch", type=int, default=10_000)
+    ap.add_argument("--anchor", default=ANCHOR.date().isoformat(),
+                    help='end of the time window (ISO date) or "now"; fixed by default')
+    ap.add_argument("--purge", action="store_true", help="delete earlier synthetic docs first")
+    args = ap.parse_args()
+
+    if args.purge:
+        print("purged:", purge())
+    anchor = (
+        datetime.now(timezone.utc) if args.anchor == "now"
+        else datetime.fromisoformat(args.anchor).replace(tzinfo=timezone.utc)
+    )
+    started = time.perf_counter()
+    counts = seed_database(
+        personas=args.personas, drafts=args.drafts, posts=args.posts,
+        seed=args.seed, days=args.days, batch_size=args.batch, anchor=anchor,
+    )
+    print("inserted:", counts, f"in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,7 +2,6 @@ from __future__ import annotations
 from typing import List, Dict
 from datetime import datetime, timezone
 import hashlib
-from pytrends.request import TrendReq
 from app.core.db import db
 from app.core.settings import settings
 
@@ -67,6 +66,8 @@ def _last_cached_keywords() -> List[str]:
 
 def _today_trending_keywords(geo: str, limit: int = 25) -> List[str]:
     """Napi 'trending searches' az adott országra."""
+    from pytrends.request import TrendReq  # pandas-t is behúzza, csak ha tényleg kell
+
     py = TrendReq(hl="en-US", tz=0)
     pn = _pn_for_geo(geo)
     try:
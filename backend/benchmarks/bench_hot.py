@@ -0,0 +1,164 @@
+# backend/benchmarks/bench_hot.py
+# Mikro-benchmarkok a tiszta (I/O nélküli) forró függvényekre, rögzített bemenettel,
+# hívásonkénti µs-ban (a körök minimuma: a legkevésbé zajos). Baseline mentése és összevetése:
+#
+#   python -m benchmarks.bench_hot --save              # benchmarks/baselines/hot.json
+#   python -m benchmarks.bench_hot --compare           # regresszió (> --threshold) → exit 1
+#   python -m benchmarks.bench_hot --only infer_category,guess_category
+#
+# A baseline gépfüggő: ugyanazon a gépen mentsd és hasonlítsd.
+from __future__ import annotations
+import argparse, io, json, platform, random, sys, tempfile
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+from benchmarks.common import BACKEND_DIR, emit, timeit_ms
+
+BASELINE = BACKEND_DIR / "benchmarks" / "baselines" / "hot.json"
+
+_WORDS = [
+    "leg day", "study", "thesis", "coffee", "budget", "crypto", "yoga", "trip", "porto", "routine",
+    "portfolio", "interview", "mindfulness", "sleep", "recipe", "python", "docker", "design", "focus",
+    "morning", "brunch", "gym", "invest", "tasks", "hotel", "snack", "minimalism", "etf", "app", "run",
+]
+
+
+def _texts(n: int, seed: int) -> List[dict]:
+    rnd = random.Random(seed)
+    out = []
+    for _ in range(n):
+        title = " ".join(rnd.sample(_WORDS, 3)).title()
+        caption = f"{title} — " + " ".join(rnd.sample(_WORDS, 8)) + " #ai_generated"
+        out.append({"title": title, "caption": caption, "hashtags": rnd.sample(_WORDS, 5) + ["ai_generated"]})
+    return out
+
+
+def _metrics(n: int, seed: int) -> List[dict]:
+    rnd = random.Random(seed)
+    out = []
+    for _ in range(n):
+        reach = rnd.randint(500, 20000)
+        out.append({"impressions": int(reach * 1.4), "reach": reach,
+                    "likes": int(reach * rnd.uniform(0.02, 0.06)), "comments": int(reach * rnd.uniform(0.002, 0.015))})
+    return out
+
+
+def _persona() -> dict:
+    return {"name": "Anna", "identity_hint": "female, 30s", "style": "photo_realistic",
+            "mood": "cheerful", "bg": "cafe"}
+
+
+def cases(n: int, seed: int) -> Dict[str, Tuple[Callable[[], object], int]]:
+    """név → (egy kör a rögzített bemeneten, hívások száma egy körben)."""
+    from app.api.routes.agent import _kpis
+    from app.api.routes.drafts import infer_category
+    from app.services.ai_image import _pad_to_portrait, _strip_forbidden, build_image_prompt_from_persona, build_prompt
+    from app.services.ai_text import guess_category
+
+    texts = _texts(n, seed)
+    metrics = _metrics(n, seed)
+    persona = _persona()
+    prompts = [f"poster with title text and logo, {t['title']}, banner layout, {t['caption']}" for t in texts]
+
+    def image_case():
+        from PIL import Image
+
+        rnd = random.Random(seed)
+        base = Image.frombytes("RGB", (1024, 1024), bytes(rnd.getrandbits(8) for _ in range(3 * 64 * 64)) * 256)
+
+        def run():
+            buf = io.BytesIO()
+            _pad_to_portrait(base).save(buf, format="JPEG", quality=92)   # ugyanaz, mint _save_jpeg
+            return buf
+
+        return run
+
+    def export_case():
+        from app.api.routes import drafts as drafts_route
+
+        tmp = Path(tempfile.mkdtemp(prefix="bench_export_"))
+        (tmp / "img.jpg").write_bytes(bytes(random.Random(seed).getrandbits(8) for _ in range(200_000)))
+        doc = {"_id": "bench", "caption": texts[0]["caption"], "hashtags": texts[0]["hashtags"],
+               "title": texts[0]["title"], "category": "fitness", "status": "draft", "filename": "img.jpg"}
+
+        class _Drafts:   # Mongo nélkül: egyetlen rögzített dokumentum
+            def find_one(self, q):
+                return doc
+
+        drafts_route.db = type("DB", (), {"drafts": _Drafts()})()
+        drafts_route.UPLOAD_DIR = str(tmp)
+        draft_id = "0" * 24
+        return lambda: [drafts_route.export_draft_zip(draft_id) for _ in range(50)]
+
+    return {
+        "infer_category": (lambda: [infer_category(t) for t in texts], n),
+        "guess_category": (lambda: [guess_category(t["title"], t["caption"]) for t in texts], n),
+        "kpis": (lambda: [_kpis(m) for m in metrics], n),
+        "build_prompt": (lambda: [build_prompt(persona_name="Anna", topic=t["title"], trend_tags=t["hashtags"])
+                                  for t in texts], n),
+        "strip_forbidden": (lambda: [_strip_forbidden(p) for p in prompts], n),
+        "build_image_prompt_from_persona": (
+            lambda: [build_image_prompt_from_persona(persona, topic=t["title"], trend_tags=t["hashtags"]) for t in texts], n),
+        "pad_and_jpeg_1024": (image_case(), 1),
+        "export_draft_zip": (export_case(), 50),
+    }
+
+
+def run(n: int, seed: int, repeat: int, only: List[str] | None) -> Dict[str, dict]:
+    results = {}
+    for name, (fn, calls) in cases(n, seed).items():
+        if only and name not in only:
+            continue
+        stats = timeit_ms(fn, repeat=repeat, warmup=1)
+        results[name] = {"usPerCall": round(stats["min"] * 1000 / calls, 3), "calls": calls, "ms": stats}
+    return results
+
+
+def compare(results: Dict[str, dict], baseline: dict, threshold: float) -> List[str]:
+    regressions = []
+    for name, r in results.items():
+        base = baseline["results"].get(name)
+        if not base:
+            continue
+        ratio = r["usPerCall"] / base["usPerCall"] if base["usPerCall"] else float("inf")
+        r["baselineUsPerCall"] = base["usPerCall"]
+        r["ratio"] = round(ratio, 2)
+        if ratio > threshold:
+            regressions.append(f"{name}: {base['usPerCall']} → {r['usPerCall']} µs/call ({ratio:.2f}x)")
+    return regressions
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--items", type=int, default=2000, help="fixed inputs per text case")
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--repeat", type=int, default=7)
+    ap.add_argument("--only", default="", help="comma separated case names")
+    ap.add_argument("--save", action="store_true", help=f"write the baseline ({BASELINE.relative_to(BACKEND_DIR)})")
+    ap.add_argument("--compare", action="store_true", help="compare against the baseline, exit 1 on regression")
+    ap.add_argument("--threshold", type=float, default=1.25, help="allowed slowdown ratio")
+    ap.add_argument("--baseline", type=Path, default=BASELINE)
+    args = ap.parse_args()
+
+    only = [s for s in args.only.split(",") if s] or None
+    results = run(args.items, args.seed, args.repeat, only)
+    meta = {"items": args.items, "seed": args.seed, "python": platform.python_version(),
+            "machine": f"{platform.system()} {platform.machine()}"}
+
+    regressions: List[str] = []
+    if args.compare:
+        baseline = json.loads(args.baseline.read_text())
+        if baseline["meta"]["items"] != args.items or baseline["meta"]["seed"] != args.seed:
+            sys.exit("baseline was recorded with different --items/--seed")
+        regressions = compare(results, baseline, args.threshold)
+    emit("hot_functions", {"meta": meta, "results": results, "regressions": regressions})
+
+    if args.save:
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.baseline.write_text(json.dumps({"meta": meta, "results": results}, indent=2) + "\n")
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+# backend/benchmarks/bench_serialization.py
+# Listaválaszok szerializálása: régi út (Draft modell + response_model validáció +
+# jsonable_encoder + json.dumps) vs. FastJSONResponse (vetítés + orjson), elemenkénti µs.
+#
+#   python -m benchmarks.bench_serialization --items 10000
+#
+# Az adatok a synth generátorból jönnek (Mongo nélkül), a feed postokhoz agent rekorddal.
+from __future__ import annotations
+import argparse, asyncio, copy, json
+from datetime import datetime
+from typing import List
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+
+from app.api.routes.drafts import Draft, _DRAFT_SHAPE, _serialize
+from app.core.serialization import FastJSONResponse, project_many
+from app.services import synth
+from app.services.kpi import post_kpis
+from benchmarks.common import emit, timeit_ms
+
+
+def _dataset(n: int, seed: int):
+    personas = synth.persona_docs(50, seed=seed)
+    drafts, posts = [], []
+    for d, p in synth.iter_content(personas, n, n, seed=seed):
+        drafts += d
+        posts += p
+    for p in posts:
+        p["_id"] = p["draftId"]
+        p["agent"] = {
+            "kpis": post_kpis(p["metrics"]),
+            "insights": ["Strong hook in the first line.", "Hashtags are on topic."],
+            "recommendations": [{"type": "caption", "text": "Add a question to drive comments."}],
+            "createdAt": datetime.utcnow(),
+        }
+    return drafts[:n], posts[:n]
+
+
+def _drafts_before(docs: List[dict]) -> bytes:
+    field = create_model_field(name="Response", type_=List[Draft], mode="serialization")
+    content = asyncio.run(serialize_response(
+        field=field, response_content=[Draft(**_serialize(d)) for d in docs], is_coroutine=True
+    ))
+    return JSONResponse(content).body
+
+
+def _drafts_after(docs: List[dict]) -> bytes:
+    return FastJSONResponse(project_many((_serialize(d) for d in docs), _DRAFT_SHAPE)).body
+
+
+def _feed_before(docs: List[dict]) -> bytes:
+    items = [{**{k: v for k, v in d.items() if k != "_id"}, "id": str(d["_id"])} for d in docs]
+    return JSONResponse(jsonable_encoder({"items": items})).body
+
+
+def _feed_after(docs: List[dict]) -> bytes:
+    items = [{**{k: v for k, v in d.items() if k != "_id"}, "id": str(d["_id"])} for d in docs]
+    return FastJSONResponse({"items": items}).body
+
+
+def _per_item(stats: dict, n: int) -> dict:
+    return {"totalMs": stats, "perItemUs": round(stats["median"] * 1000 / n, 2)}
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Per-item serialization cost of list responses")
+    ap.add_argument("--items", type=int, default=10_000)
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--seed", type=int, default=7)
+    args = ap.parse_args()
+
+    drafts, posts = _dataset(args.items, args.seed)
+    fresh = lambda docs: [copy.copy(d) for d in docs]   # _serialize módosítja a dokumentumot
+
+    # ugyanazt a JSON-t kell adniuk
+    assert json.loads(_drafts_before(fresh(drafts))) == json.loads(_drafts_after(fresh(drafts)))
+    assert json.loads(_feed_before(posts)) == json.loads(_feed_after(posts))
+
+    result = {"items": args.items}
+    for name, before, after, docs in (
+        ("drafts", _drafts_before, _drafts_after, drafts),
+        ("feed", _feed_before, _feed_after, posts),
+    ):
+        b = timeit_ms(lambda: before(fresh(docs)), repeat=args.repeat)
+        a = timeit_ms(lambda: after(fresh(docs)), repeat=args.repeat)
+        result[name] = {
+            "before": _per_item(b, args.items),
+            "after": _per_item(a, args.items),
+            "speedup": round(b["median"] / a["median"], 1),
+        }
+    emit("serialization", result)
+
+
+if __name__ == "__main__":
+    main()
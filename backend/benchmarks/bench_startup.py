@@ -0,0 +1,85 @@
+# backend/benchmarks/bench_startup.py
+# Hidegindítás: `import app.main` ideje + idő az első kiszolgált kérésig (uvicorn alprocesszben).
+#
+#   python -m benchmarks.bench_startup --runs 5
+#
+# Mongo nem kell hozzá: az import és a lifespan nem nyúl az adatbázishoz.
+from __future__ import annotations
+import argparse, socket, subprocess, sys, time
+import urllib.request
+
+from benchmarks.common import BACKEND_DIR, emit, run_python, summarize
+
+_IMPORT_CODE = """
+import time
+t = time.perf_counter()
+import app.main
+print((time.perf_counter() - t) * 1000)
+"""
+
+
+def _import_ms() -> float:
+    r = run_python(_IMPORT_CODE)
+    if r.returncode:
+        raise RuntimeError(r.stderr)
+    return float(r.stdout.strip().splitlines()[-1])
+
+
+def _top_imports(n: int) -> list:
+    """A legdrágább modulok (kumulált µs) a -X importtime kimenetéből."""
+    r = run_python("import app.main", "-X", "importtime")
+    rows = []
+    for line in r.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if cumulative.strip().isdigit():
+            rows.append((int(cumulative), name.strip()))
+    rows.sort(reverse=True)
+    return [{"module": name, "ms": round(us / 1000, 1)} for us, name in rows[:n]]
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _first_request_ms(path: str, timeout: float) -> float:
+    port = _free_port()
+    started = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}{path}", timeout=1) as r:
+                    if r.status == 200:
+                        return (time.perf_counter() - started) * 1000
+            except OSError:
+                time.sleep(0.01)
+        raise RuntimeError(f"no 200 from {path} within {timeout}s")
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Cold start: import time and time-to-first-request")
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--path", default="/api/healthz")
+    ap.add_argument("--top", type=int, default=10)
+    ap.add_argument("--timeout", type=float, default=60.0)
+    args = ap.parse_args()
+
+    emit("startup", {
+        "importMs": summarize([_import_ms() for _ in range(args.runs)]),
+        "firstRequestMs": summarize([_first_request_ms(args.path, args.timeout) for _ in range(args.runs)]),
+        "slowestImports": _top_imports(args.top),
+    })
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+# backend/benchmarks/common.py
+# Közös segédek a benchmark scriptekhez (futtatás a backend mappából:
+#   python -m benchmarks.bench_startup).
+from __future__ import annotations
+import json, os, statistics, subprocess, sys, time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    """min / median / p90 / max ms-ban (a mintákat ms-ban várjuk)."""
+    s = sorted(samples)
+    p90 = s[min(len(s) - 1, int(round(0.9 * (len(s) - 1))))]
+    return {
+        "n": len(s),
+        "min": round(s[0], 2),
+        "median": round(statistics.median(s), 2),
+        "p90": round(p90, 2),
+        "max": round(s[-1], 2),
+    }
+
+
+def timeit_ms(fn: Callable[[], object], *, repeat: int = 5, warmup: int = 1) -> Dict[str, float]:
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t) * 1000)
+    return summarize(samples)
+
+
+def run_python(code: str, *args: str, env: dict | None = None, timeout: float = 120) -> subprocess.CompletedProcess:
+    """Friss interpreter a backend mappában (hideg import méréshez)."""
+    return subprocess.run(
+        [sys.executable, *args, "-c", code],
+        cwd=BACKEND_DIR, env={**os.environ, **(env or {})},
+        capture_output=True, text=True, timeout=timeout,
+    )
+
+
+def emit(name: str, result: dict) -> None:
+    print(json.dumps({"benchmark": name, **result}, indent=2, ensure_ascii=False))
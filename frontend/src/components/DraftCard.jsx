@@ -38,8 +38,8 @@ export default function DraftCard({ d, workingId, setWorkingId, refresh }) {
           </div>
 
           <img
-            key={d.filename || d.previewUrl}
-            src={d.previewUrl}
+            key={d.filename || d.fullImageUrl || d.previewUrl}
+            src={d.fullImageUrl || d.previewUrl}
             alt={d.title || "preview"}
             className="insta-img"
             style={{
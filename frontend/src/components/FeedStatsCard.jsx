@@ -5,15 +5,23 @@ const fmt = (n) => (typeof n === "number" ? n.toLocaleString("en-US") : "-");
 
 export default function FeedStatsCard({ post, onRefresh }) {
   const m = post?.metrics || {};
-  const agent = post?.agent;
   const [busy, setBusy] = useState(false);
+  // elemzés közben az SSE-n érkező insightok / ajánlások; a "done" után a mentett rekord jön
+  const [streaming, setStreaming] = useState(null);
+  const agent = streaming || post?.agent;
 
   const analyze = async () => {
     setBusy(true);
+    setStreaming({ insights: [], recommendations: [] });
     try {
-      await api.agentCritique(post.id);
+      await api.agentCritiqueStream(post.id, (ev) => setStreaming((prev) => {
+        if (ev.event === "insight") return { ...prev, insights: [...prev.insights, ev.value] };
+        if (ev.event === "recommendation") return { ...prev, recommendations: [...prev.recommendations, ev.value] };
+        if (ev.event === "done") return ev.record;
+        return prev;
+      }));
       await onRefresh?.();
-    } finally { setBusy(false); }
+    } finally { setBusy(false); setStreaming(null); }
   };
 
   const applyNext = async () => {
@@ -1,6 +1,61 @@
 const BASE = import.meta.env.VITE_API_URL || "http://localhost:8000";
 async function json(r){ if(!r.ok) throw new Error(`${r.status} ${r.statusText}`); return r.json(); }
 
+// SSE over POST (EventSource csak GET-et tud): minden frame → onEvent({event, ...}); a "done" frame-et adja vissza
+async function sse(url, body, onEvent) {
+  const r = await fetch(url, {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: body ? JSON.stringify(body) : undefined,
+  });
+  if (!r.ok || !r.body) throw new Error(`${r.status} ${r.statusText}`);
+  const reader = r.body.pipeThrough(new TextDecoderStream()).getReader();
+  let buf = "", done = null;
+  for (;;) {
+    const { value, done: end } = await reader.read();
+    if (end) break;
+    buf += value;
+    let i;
+    while ((i = buf.indexOf("\n\n")) >= 0) {
+      const frame = buf.slice(0, i);
+      buf = buf.slice(i + 2);
+      const data = frame.split("\n").filter((l) => l.startsWith("data:")).map((l) => l.slice(5)).join("\n");
+      if (!data) continue;
+      const ev = JSON.parse(data);
+      if (ev.event === "error") throw new Error(ev.detail);
+      if (ev.event === "done") done = ev;
+      onEvent?.(ev);
+    }
+  }
+  return done;
+}
+
+// Élő változások (SSE): onEvent({event: "change"|"invalidate"|"reset", coll, ...}).
+// Az EventSource magától újracsatlakozik és a Last-Event-ID-vel folytat. Visszaad: leiratkozás.
+export function subscribeChanges(onEvent, collections = ["drafts", "feed_posts", "personas"]) {
+  const es = new EventSource(`${BASE}/api/changes/stream?collections=${collections.join(",")}`);
+  for (const name of ["change", "invalidate", "reset"]) {
+    es.addEventListener(name, (m) => onEvent(JSON.parse(m.data)));
+  }
+  return () => es.close();
+}
+
+// Van-e az eseményben alkalmazható delta? "change" insert/update → doc, delete → id.
+// invalidate (pollozó mód, nincs doc) és reset esetén újra kell tölteni a listát.
+export function hasDelta(ev) {
+  return ev.event === "change" && (ev.op === "delete" || !!ev.doc);
+}
+
+// A "change" esemény alkalmazása egy {id}-s listára (új elem előre: a listák legújabb elöl).
+export function applyChange(items, ev) {
+  if (ev.op === "delete") return items.filter((x) => x.id !== ev.id);
+  const i = items.findIndex((x) => x.id === ev.id);
+  if (i === -1) return [ev.doc, ...items];
+  const next = items.slice();
+  next[i] = { ...items[i], ...ev.doc };
+  return next;
+}
+
 const FRONTEND_SEED = [
   "AI tools for students","thesis writing tips","time management","note-taking apps","study motivation",
   "latest AI trends","blockchain news","startup ideas","green tech","digital marketing",
@@ -13,6 +68,8 @@ export const api = {
   getIdeas: () => fetch(`${BASE}/api/ideas`).then(json),
   getDrafts: () => fetch(`${BASE}/api/drafts`).then(json),
   getFeed: () => fetch(`${BASE}/api/feed`).then(json),
+  getFeedTop: (params = {}) =>
+    fetch(`${BASE}/api/feed/top?${new URLSearchParams(params)}`).then(json),
 
     deleteFeedPost: (id) =>
     fetch(`${BASE}/api/feed/${id}`, {
@@ -34,11 +91,18 @@ export const api = {
       body: JSON.stringify(patch),
     }).then(json),
 
+  // caption delta / hashtag események; a végén { caption, hashtags } → mehet a createDraft-ba
+  streamCaption: ({ title, category = "lifestyle", customText = "" }, onEvent) =>
+    sse(`${BASE}/api/drafts/caption/stream`, { title, category, customText }, onEvent),
+
   approveDraft: (id) => fetch(`${BASE}/api/drafts/${id}/approve`, { method: "POST" }).then(json),
   deleteDraft: (id) => fetch(`${BASE}/api/drafts/${id}`, { method: "DELETE" }).then(json),
 
   agentCritique: (postId) =>
     fetch(`${BASE}/api/agent/critique/${postId}`, { method: "POST" }).then(json),
+  // insight / recommendation események érkezés közben; a végén { record }
+  agentCritiqueStream: (postId, onEvent) =>
+    sse(`${BASE}/api/agent/critique/${postId}/stream`, null, onEvent),
   agentGet: (postId) =>
     fetch(`${BASE}/api/agent/insights/${postId}`).then(json),
   agentApply: (postId) =>
@@ -90,20 +154,25 @@ export const api = {
   deletePersona: (id) => fetch(`${BASE}/api/personas/${id}`, { method:"DELETE" }).then(json),
 
   // 🔒 Persona kötelező a draft generálásához – ha nincs, hibát dobunk
-  createDraftsFromKeywords: async ({ keywords = [], customText = "", personaId = ""}) => {
+  // onStream(kw, ev) megadásakor a caption előbb SSE-n jön (élő előnézet), és a kész
+  // caption+hashtags megy a POST /drafts-ba; ha a stream elhasal, a szerver generál
+  createDraftsFromKeywords: async ({ keywords = [], customText = "", personaId = "", onStream = null }) => {
     if (!personaId) throw new Error("personaId is required to generate drafts");
-    const payloads = keywords.map((kw) => ({
-      ideaId: null,
-      title: kw,
-      category: "lifestyle",
-      caption: "",
-      hashtags: [],
-      customText,
-      personaId,
-    }));
+    const withCaption = async (kw) => {
+      const p = { ideaId: null, title: kw, category: "lifestyle", caption: "", hashtags: [], customText, personaId };
+      if (!onStream) return p;
+      try {
+        const done = await api.streamCaption({ title: kw, category: p.category, customText }, (ev) => onStream(kw, ev));
+        if (done) { p.caption = done.caption || ""; p.hashtags = done.hashtags || []; }
+      } catch (e) {
+        console.debug("caption stream failed:", e);
+      }
+      return p;
+    };
     await Promise.all(
-      payloads.map((p) =>
-        fetch(`${BASE}/api/drafts`, {
+      keywords.map(async (kw) => {
+        const p = await withCaption(kw);
+        return fetch(`${BASE}/api/drafts`, {
           method: "POST",
           headers: { "Content-Type": "application/json" },
           body: JSON.stringify(p),
@@ -112,8 +181,8 @@ export const api = {
             const msg = await r.text().catch(()=>`${r.status} ${r.statusText}`);
             throw new Error(msg);
           }
-        })
-      )
+        });
+      })
     );
   },
 };
@@ -1,5 +1,5 @@
 import { useEffect, useState } from "react";
-import { api } from "../lib/api";
+import { api, applyChange, hasDelta, subscribeChanges } from "../lib/api";
 import DraftCard from "../components/DraftCard";
 import EmptyState from "../components/EmptyState";
 import TrendChips from "../components/TrendChips";
@@ -13,6 +13,7 @@ export default function Dashboard() {
   const [selected, setSelected] = useState([]);
   const [customText, setCustomText] = useState("");
   const [genBusy, setGenBusy] = useState(false);
+  const [live, setLive] = useState({});   // kw → { caption, hashtags } generálás közben (SSE)
 
   // personas
   const [personas, setPersonas] = useState([]);
@@ -28,6 +29,14 @@ export default function Dashboard() {
     api.getPersonas()
       .then(setPersonas)
       .catch(() => setPersonas([]));
+    // más fülön / workeren történt változás: a delta helyben, teljes újratöltés csak
+    // reset / invalidate (doc nélküli) eseményre
+    return subscribeChanges((ev) => {
+      if (ev.coll === "drafts" && hasDelta(ev)) setDrafts((prev) => applyChange(prev, ev));
+      else if (ev.event === "reset" || ev.coll === "drafts") refreshDrafts();
+      if (ev.coll === "personas" && hasDelta(ev)) setPersonas((prev) => applyChange(prev, ev));
+      else if (ev.event === "reset" || ev.coll === "personas") api.getPersonas().then(setPersonas).catch(() => {});
+    }, ["drafts", "personas"]);
   }, []);
 
   const toggleTrend = (t) => {
@@ -42,10 +51,18 @@ export default function Dashboard() {
     setGenBusy(true);
     try {
       const keywords = selected.length ? selected : (customText.trim() ? [customText.trim()] : []);
-      await api.createDraftsFromKeywords({ keywords, customText, personaId });
+      setLive(Object.fromEntries(keywords.map((kw) => [kw, { caption: "", hashtags: [] }])));
+      const onStream = (kw, ev) => setLive((prev) => {
+        const cur = prev[kw] || { caption: "", hashtags: [] };
+        if (ev.event === "caption") return { ...prev, [kw]: { ...cur, caption: cur.caption + ev.delta } };
+        if (ev.event === "hashtag") return { ...prev, [kw]: { ...cur, hashtags: [...cur.hashtags, ev.value] } };
+        if (ev.event === "done") return { ...prev, [kw]: { caption: ev.caption, hashtags: ev.hashtags || [] } };
+        return prev;
+      });
+      await api.createDraftsFromKeywords({ keywords, customText, personaId, onStream });
       setSelected([]); setCustomText("");
       refreshDrafts();
-    } finally { setGenBusy(false); }
+    } finally { setGenBusy(false); setLive({}); }
   };
 
   return (
@@ -118,6 +135,24 @@ export default function Dashboard() {
         </div>
       </div>
 
+      {/* Élő caption előnézet generálás közben */}
+      {genBusy && Object.keys(live).length > 0 && (
+        <div className="card">
+          <div className="card-pad space-y-3">
+            <div className="font-semibold">Writing captions…</div>
+            {Object.entries(live).map(([kw, c]) => (
+              <div key={kw} className="rounded-xl bg-white border p-3">
+                <div className="text-xs text-gray-500 mb-1">{kw}</div>
+                <div className="text-sm whitespace-pre-wrap">{c.caption || "…"}</div>
+                {c.hashtags.length > 0 && (
+                  <div className="text-xs text-indigo-600 mt-1">{c.hashtags.map((t) => `#${t}`).join(" ")}</div>
+                )}
+              </div>
+            ))}
+          </div>
+        </div>
+      )}
+
       {/* Drafts */}
       <div className="flex items-center justify-between">
         <h2 className="text-lg font-semibold">Drafts</h2>
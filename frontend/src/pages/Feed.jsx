@@ -1,5 +1,5 @@
 import { useEffect, useState } from "react";
-import { api } from "../lib/api";
+import { api, applyChange, hasDelta, subscribeChanges } from "../lib/api";
 import FeedStatsCard from "../components/FeedStatsCard";
 
 function PostPreview({ post, onDelete }) {
@@ -102,13 +102,18 @@ export default function Feed() {
 
   useEffect(() => {
     load();
+    // delta helyben; teljes újratöltés csak reset / invalidate (doc nélküli) eseményre
+    return subscribeChanges((ev) => {
+      if (hasDelta(ev)) setItems((prev) => applyChange(prev, ev));
+      else load();
+    }, ["feed_posts"]);
   }, []);
 
   const handleDelete = async (id) => {
     if (!window.confirm("Remove this post from the feed simulation?")) return;
     try {
       await api.deleteFeedPost(id);
-      await load();
+      setItems((prev) => prev.filter((p) => p.id !== id));
     } catch (e) {
       console.error(e);
       alert("Failed to delete post from feed.");